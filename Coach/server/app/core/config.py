@@ -2,9 +2,79 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
+    # unset -> SQLite file at server/app/data/app.db
+    DATABASE_URL: str | None = None
+    # PostgreSQL pool (per worker process)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_S: float = 30.0
+    DB_POOL_RECYCLE_S: int = 1800        # under typical proxy/idle cutoffs (Neon, pgbouncer)
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 15000
+    # serve users/workouts/sets/AI-task routes from async handlers on an
+    # AsyncSession (aiosqlite / asyncpg); DATABASE_ASYNC_URL overrides the
+    # driver derived from DATABASE_URL
+    DB_ASYNC: bool = False
+    DATABASE_ASYNC_URL: str | None = None
+    # SQLite
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHED_STATEMENTS: int = 256
+    SQLITE_POOL_SIZE: int = 40           # cheap connections: one per sync-handler thread
+    # create tables / apply pending migrations during app startup; turn off when
+    # deploys run `python -m server.app.db.migrations` beforehand
+    DB_AUTO_MIGRATE: bool = True
+
+    # /metrics (Prometheus text) + per-route latency / SQL counters; requests
+    # slower than METRICS_SLOW_REQUEST_MS are logged with their slowest SQL (0 = off)
+    METRICS_ENABLED: bool = True
+    METRICS_SLOW_REQUEST_MS: float = 0.0
+    # dev/test: check each request against its SQL statement budget and for
+    # repeated identical-shape queries (core/query_budget.py): off | warn | raise
+    QUERY_BUDGET_MODE: str = "off"
+    QUERY_REPEAT_THRESHOLD: int = 3
+
     GEMINI_API_KEY: str | None = None
     AI_MODEL: str = "gemini-1.5-flash"
     AI_MOCK: bool = True
+    AI_MAX_CONCURRENCY: int = 8          # worker threads for blocking Gemini calls
+    AI_TIMEOUT_S: float | None = 60.0
+    # GET /ai/models catalog (services/model_catalog.py): kept AI_MODELS_TTL_S,
+    # then served stale while one background refresh runs; failed refreshes are
+    # retried after AI_MODELS_RETRY_S. AI_MODEL_CHECK validates AI_MODEL against
+    # it at startup: off | warn | raise
+    AI_MODELS_TTL_S: float = 3600.0
+    AI_MODELS_RETRY_S: float = 30.0
+    AI_MODEL_CHECK: str = "warn"
+
+    # reply cache for /ai/chat (memory LRU, plus SQLite file if a path is set)
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_SIZE: int = 1024
+    AI_CACHE_TTL: float = 3600.0  # seconds
+    AI_CACHE_SQLITE_PATH: str | None = None
+    # coalesce identical in-flight /ai/chat calls across workers via this file
+    AI_SINGLEFLIGHT_SQLITE_PATH: str | None = None
+
+    # run approved AI tasks in the app process (services/task_executor.py);
+    # leave off when a separate executor process is deployed
+    AI_EXECUTOR_ENABLED: bool = False
+    AI_EXECUTOR_CONCURRENCY: int = 4     # users processed in parallel
+    AI_EXECUTOR_BATCH_SIZE: int = 50     # tasks per user per transaction
+    AI_EXECUTOR_POLL_S: float = 1.0
+
+    # read-through cache for the calendar views (services/week_cache.py):
+    # per-process LRU, or one SQLite file shared by all workers when a path is
+    # set (needed with several workers: each one's writes invalidate for all)
+    WEEK_CACHE_ENABLED: bool = True
+    WEEK_CACHE_SIZE: int = 4096
+    WEEK_CACHE_TTL_S: float = 300.0
+    WEEK_CACHE_SQLITE_PATH: str | None = None
+
+    # /ai/plan/interpret per-conversation parse cache
+    INTERPRET_CACHE_SIZE: int = 2048
+    INTERPRET_CACHE_TTL: float = 1800.0  # seconds
 
     # reads Coach/.env (relative to where you start uvicorn)
     model_config = SettingsConfigDict(
@@ -0,0 +1,326 @@
+# server/app/core/metrics.py
+"""
+Process-wide metrics in Prometheus text format, without extra dependencies.
+
+- `MetricsMiddleware` (pure ASGI) times every request under its route template
+  (`/workouts/{workout_id}`, not the raw path) and opens a per-request
+  `RequestStats` in a contextvar.
+- `instrument_engine` hooks SQLAlchemy cursor events, so every statement is
+  counted globally and against the current request (sync handlers run in
+  threadpool copies of the request context, so they see the same object).
+- `ai_client` reports Gemini latency and token counts through `observe_ai` /
+  `count_ai_tokens`; the calendar view cache (services/week_cache.py) its
+  hits, misses and invalidations through `count_week_cache`.
+- `GET /metrics` renders the registry; requests slower than
+  METRICS_SLOW_REQUEST_MS are logged with their slowest statements.
+- With QUERY_BUDGET_MODE on, every statement is kept and handed to the
+  per-route query budget / N+1 check in core/query_budget.py.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Iterable, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+__all__ = [
+    "Counter",
+    "Histogram",
+    "MetricsMiddleware",
+    "RequestStats",
+    "count_ai_tokens",
+    "count_week_cache",
+    "current_request",
+    "instrument_engine",
+    "observe_ai",
+    "registry",
+    "router",
+]
+
+slow_log = logging.getLogger("server.app.slow")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+AI_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+# ── metric types ───────────────────────────────────────────────────────────────
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v: float) -> str:
+    return "+Inf" if v == math.inf else repr(v)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, v in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_num(v)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, labels
+        self.buckets = tuple(buckets) + (math.inf,)
+        # labels -> [per-bucket counts..., sum, count]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = next(i for i, b in enumerate(self.buckets) if value <= b)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        s = self._series.get(labels)
+        return s[-1] if s else 0
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, s in items:
+            running = 0
+            for b, n in zip(self.buckets, s):
+                running += n
+                le = 'le="%s"' % _num(b)
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, le)} {running}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_num(s[-2])}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {s[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for m in self.metrics for line in m.render()) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.add(Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")))
+http_latency = registry.add(Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route")))
+http_db_queries = registry.add(Histogram(
+    "http_request_db_queries", "SQL statements executed per request.", ("method", "route"), COUNT_BUCKETS))
+http_db_time = registry.add(Histogram(
+    "http_request_db_seconds", "Time spent in SQL per request.", ("method", "route"), QUERY_BUCKETS))
+db_queries = registry.add(Histogram(
+    "db_query_duration_seconds", "SQL statement latency (all callers).", ("kind",), QUERY_BUCKETS))
+ai_latency = registry.add(Histogram(
+    "ai_request_duration_seconds", "Model call latency.", ("model", "kind", "outcome"), AI_BUCKETS))
+ai_tokens = registry.add(Counter(
+    "ai_tokens_total", "Model tokens reported by the provider.", ("model", "type")))
+week_cache_events = registry.add(Counter(
+    "week_cache_events_total", "Calendar view cache hits, misses, stores, refused stores and invalidated entries.",
+    ("view", "event")))
+
+
+# ── per-request state ──────────────────────────────────────────────────────────
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_s: float = 0.0
+    keep: int = 5                                      # slowest statements kept for the slow log
+    slowest: list[tuple[float, str]] = field(default_factory=list)
+    statements: Optional[list[str]] = None             # every statement, when a query budget check runs
+
+    def add_query(self, seconds: float, statement: str) -> None:
+        self.queries += 1
+        self.db_s += seconds
+        if self.statements is not None:
+            self.statements.append(statement)
+        if self.keep:
+            if len(self.slowest) < self.keep:
+                self.slowest.append((seconds, statement))
+            elif seconds > self.slowest[-1][0]:
+                self.slowest[-1] = (seconds, statement)
+            else:
+                return
+            self.slowest.sort(key=lambda x: -x[0])
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request() -> Optional[RequestStats]:
+    return _current.get()
+
+
+# ── SQLAlchemy hooks ───────────────────────────────────────────────────────────
+def _kind(statement: str) -> str:
+    head = statement.lstrip()[:6].upper()
+    return head if head in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    db_queries.observe(elapsed, _kind(statement))
+    req = _current.get()
+    if req is not None:
+        req.add_query(elapsed, statement)
+
+
+def _failed(ctx):
+    starts = ctx.connection.info.get("query_start") if ctx.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine) -> None:
+    """Count/time every statement on `engine` (a sync Engine or AsyncEngine.sync_engine)."""
+    from sqlalchemy import event
+
+    if event.contains(engine, "before_cursor_execute", _before):
+        return
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+    event.listen(engine, "handle_error", _failed)
+
+
+# ── model calls (services/ai_client.py) ────────────────────────────────────────
+def observe_ai(model: str, kind: str, seconds: float, ok: bool) -> None:
+    ai_latency.observe(seconds, model, kind, "ok" if ok else "error")
+
+
+def count_ai_tokens(model: str, usage) -> None:
+    """`usage` is Gemini's usage_metadata (prompt/candidates token counts) or None."""
+    if usage is None:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"), ("completion", "candidates_token_count")):
+        n = getattr(usage, attr, None)
+        if n:
+            ai_tokens.inc(model, kind, amount=n)
+
+
+# ── calendar view cache (services/week_cache.py) ───────────────────────────────
+def count_week_cache(view: str, event: str, n: int = 1) -> None:
+    week_cache_events.inc(view, event, amount=n)
+
+
+# ── middleware ─────────────────────────────────────────────────────────────────
+class MetricsMiddleware:
+    """
+    Per-route latency and DB usage; logs requests over `slow_ms` with their
+    slowest SQL. `check(method, route, stats)` runs after each request with
+    every statement recorded (core/query_budget.py); with it set, responses
+    also carry X-Query-Count.
+    """
+
+    def __init__(
+        self,
+        app,
+        slow_ms: float = 0.0,
+        skip: tuple[str, ...] = ("/metrics",),
+        check: Optional[Callable[[str, str, RequestStats], None]] = None,
+    ):
+        self.app = app
+        self.slow_ms = slow_ms
+        self.skip = skip
+        self.check = check
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(keep=5 if self.slow_ms else 0, statements=[] if self.check else None)
+        token = _current.set(stats)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.check is not None:
+                    # statements so far; a streaming body may still add more
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-query-count", str(stats.queries).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        failed = True
+        try:
+            await self.app(scope, receive, send_wrapper)
+            failed = False
+        finally:
+            elapsed = time.perf_counter() - t0
+            _current.reset(token)
+            # FastAPI puts the matched route in the scope; unmatched paths share
+            # one label so scanners can't blow up the series count
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            method = scope["method"]
+            http_requests.inc(method, route, str(status))
+            http_latency.observe(elapsed, method, route)
+            http_db_queries.observe(stats.queries, method, route)
+            http_db_time.observe(stats.db_s, method, route)
+            if self.slow_ms and elapsed * 1000 >= self.slow_ms:
+                _log_slow(method, scope["path"], route, status, elapsed, stats)
+        if self.check is not None and not failed:
+            self.check(method, route, stats)
+
+
+def _log_slow(method: str, path: str, route: str, status: int, elapsed: float, stats: RequestStats) -> None:
+    lines = [
+        f"slow request {method} {path} ({route}) -> {status} in {elapsed * 1000:.1f} ms; "
+        f"{stats.queries} queries, {stats.db_s * 1000:.1f} ms in SQL"
+    ]
+    for seconds, sql in stats.slowest:
+        lines.append(f"  {seconds * 1000:8.2f} ms  {' '.join(sql.split())[:500]}")
+    slow_log.warning("\n".join(lines))
+
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,180 @@
+# server/app/core/query_budget.py
+"""
+Query budgets and N+1 detection for development and tests.
+
+Every route has a maximum number of SQL statements per request (BUDGETS,
+keyed "METHOD /route/template"; sync and async routers share one budget).
+With QUERY_BUDGET_MODE=warn|raise, MetricsMiddleware hands each request's
+statements to `check_request`, which flags:
+  - more statements than the route's budget,
+  - routes with no budget at all,
+  - the same statement shape (literals/parameters stripped) run
+    QUERY_REPEAT_THRESHOLD or more times: the usual lazy-load-per-row N+1.
+"warn" logs the findings, "raise" raises QueryBudgetExceeded after the
+response (TestClient re-raises it in the test).
+
+Outside HTTP, `count_queries()` / `assert_max_queries(n)` wrap any block:
+
+    with assert_max_queries(2):
+        crud_workouts.range_with_sets(db, uid, start, end, 200)
+
+    python -m server.bench.query_budgets   # drive every route, check budgets
+"""
+from __future__ import annotations
+
+import logging
+import re
+from collections import Counter as Tally
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from .metrics import RequestStats, _current
+
+__all__ = [
+    "BUDGETS",
+    "QueryBudgetExceeded",
+    "assert_max_queries",
+    "check_request",
+    "count_queries",
+    "make_checker",
+    "repeated_shapes",
+    "shape",
+]
+
+log = logging.getLogger("server.app.query_budget")
+
+# statements per request on the success path (404s/409s only ever do less)
+BUDGETS: dict[str, int] = {
+    # users
+    "POST /users/": 3,                                    # username check, INSERT, refresh
+    "GET /users/": 1,
+    # workouts
+    "POST /workouts/": 3,                                 # INSERT, version bump, refresh
+    "GET /workouts/": 1,
+    "GET /workouts/by_user/{user_id}": 1,
+    "GET /workouts/{workout_id}/detail": 1,               # workout joined to its sets
+    "GET /workouts/by_user/{user_id}/with_sets": 2,       # page, selectin sets
+    "GET /workouts/by_user/{user_id}/range": 2,           # data version (ETag; a 304 stops here), page
+    "GET /workouts/by_user/{user_id}/on/{day}": 1,
+    "GET /workouts/by_user/{user_id}/range_with_sets": 3, # data version, page, sets
+    "PATCH /workouts/{workout_id}": 7,                    # load, UPDATE, version bump, refresh; +3 rollups when it changes week
+    "PATCH /workouts/{workout_id}/": 7,
+    "DELETE /workouts/{workout_id}": 7,                   # load, sets for cascade, 2 DELETEs, +2 rollups, version bump
+    # sets
+    "POST /sets/": 5,                                     # workout check, INSERT, rollup upsert, version bump, refresh
+    "GET /sets/": 1,
+    "GET /sets/by_workout/{workout_id}": 1,
+    "GET /sets/{set_id}": 1,
+    "PATCH /sets/{set_id}": 8,                            # load, workout, UPDATE, week's sets, rollup DELETE+INSERT, bump, refresh
+    "DELETE /sets/{set_id}": 7,                           # load, workout, DELETE, week's sets, rollup DELETE+INSERT, bump
+    "POST /sets/bulk": 4,                                 # workout check, INSERT ... RETURNING, rollup upsert, bump
+    # AI tasks
+    "POST /ai/tasks/queue": 2,                            # upsert ... RETURNING, fetch deduped
+    "GET /ai/tasks": 1,
+    "POST /ai/tasks/{task_id}/approve": 3,                # load, UPDATE, refresh
+    "POST /ai/tasks/{task_id}/reject": 3,
+    "POST /ai/proposals/apply": 14,                       # user, 2 per add, 3 per upsert (+rollups), version bump, 2 for the result
+    # analytics
+    "GET /analytics/by_user/{user_id}/summary": 2,        # workouts in window, their sets
+    "GET /analytics/by_user/{user_id}/weekly": 1,         # rollup rows
+    # history
+    "GET /history/by_user/{user_id}/export": 2,           # user, one streamed workouts-join-sets query
+    "POST /history/by_user/{user_id}/import": 5,          # user, per chunk: workouts INSERT ... RETURNING, sets INSERT, rollup upsert; bump
+    # AI (no database)
+    "POST /ai/chat": 0,
+    "POST /ai/chat/stream": 0,
+    "GET /ai/stats": 0,
+    "GET /ai/models": 0,
+    "POST /ai/plan/interpret": 0,
+    "GET /": 0,
+}
+
+_PARAM_RE = re.compile(r"%\(\w+\)s|\$\d+|\?")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS_RE = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+_NUM_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request (or block) ran more statements than allowed, or repeated one shape."""
+
+
+def shape(statement: str) -> str:
+    """Statement with parameters, IN lists, VALUES rows and numbers collapsed."""
+    s = _PARAM_RE.sub("?", statement)
+    s = _LIST_RE.sub("(?...)", s)
+    s = _ROWS_RE.sub("(?...)", s)
+    s = _NUM_RE.sub("N", s)
+    return _SPACE_RE.sub(" ", s).strip()
+
+
+def repeated_shapes(statements: list[str], threshold: int) -> list[tuple[str, int]]:
+    """Shapes run `threshold`+ times, most frequent first."""
+    if threshold <= 1:
+        return []
+    tally = Tally(shape(s) for s in statements)
+    return [(sql, n) for sql, n in tally.most_common() if n >= threshold]
+
+
+def check_request(
+    key: str,
+    stats: RequestStats,
+    budgets: dict[str, int] = BUDGETS,
+    repeat_threshold: int = 3,
+) -> list[str]:
+    """Problems with one request's statements ([] when within budget)."""
+    problems: list[str] = []
+    budget = budgets.get(key)
+    if budget is None:
+        problems.append(f"{key}: no query budget ({stats.queries} statements)")
+    elif stats.queries > budget:
+        problems.append(f"{key}: {stats.queries} statements, budget {budget}")
+    for sql, n in repeated_shapes(stats.statements or [], repeat_threshold):
+        problems.append(f"{key}: same query {n}x (N+1?): {sql[:300]}")
+    return problems
+
+
+def make_checker(
+    mode: str,
+    repeat_threshold: int = 3,
+    budgets: dict[str, int] = BUDGETS,
+) -> Optional[Callable[[str, str, RequestStats], None]]:
+    """MetricsMiddleware `check` for QUERY_BUDGET_MODE ("off" -> None)."""
+    if mode == "off":
+        return None
+    if mode not in ("warn", "raise"):
+        raise ValueError(f"QUERY_BUDGET_MODE must be off, warn or raise, not {mode!r}")
+
+    def check(method: str, route: str, stats: RequestStats) -> None:
+        if route == "<unmatched>":
+            return
+        problems = check_request(f"{method} {route}", stats, budgets, repeat_threshold)
+        if not problems:
+            return
+        if mode == "raise":
+            raise QueryBudgetExceeded("; ".join(problems))
+        for p in problems:
+            log.warning(p)
+
+    return check
+
+
+@contextmanager
+def count_queries() -> Iterator[RequestStats]:
+    """Count the statements run inside the block (on instrumented engines)."""
+    stats = RequestStats(keep=0, statements=[])
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(n: int, repeat_threshold: int = 3) -> Iterator[RequestStats]:
+    with count_queries() as stats:
+        yield stats
+    problems = check_request("block", stats, {"block": n}, repeat_threshold)
+    if problems:
+        raise QueryBudgetExceeded("; ".join(problems) + "\n" + "\n".join(stats.statements))
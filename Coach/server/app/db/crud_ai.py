@@ -1,9 +1,22 @@
+from __future__ import annotations
+
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 from . import models
 
-def create_ai_task(
-    db: Session,
+if TYPE_CHECKING:  # async driver stack only loads with DB_ASYNC
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+TASK_DEFAULTS = {
+    "summary": "",
+    "confidence": 0.7,
+    "requires_confirmation": True,
+    "requires_super_confirmation": False,
+    "dedupe_key": None,
+}
+
+def _new_task(
     *,
     user_id: int,
     intent: str,
@@ -13,8 +26,8 @@ def create_ai_task(
     requires_confirmation: bool = True,
     requires_super_confirmation: bool = False,
     dedupe_key: Optional[str] = None,
-):
-    task = models.AITask(
+) -> models.AITask:
+    return models.AITask(
         user_id=user_id,
         intent=intent,
         payload=payload,
@@ -25,26 +38,126 @@ def create_ai_task(
         status="queued",
         dedupe_key=dedupe_key,
     )
+
+def create_ai_task(db: Session, **fields):
+    task = _new_task(**fields)
     db.add(task)
     db.commit()
     db.refresh(task)
     return task
 
-def list_ai_tasks(db: Session, *, user_id: int, status: Optional[str] = None) -> List[models.AITask]:
-    q = db.query(models.AITask).filter(models.AITask.user_id == user_id)
+# ── batch queueing ────────────────────────────────────────────────────────────
+# One INSERT for the whole batch; rows whose (user_id, dedupe_key) already
+# exists (ux_ai_tasks_user_dedupe) are skipped by ON CONFLICT DO NOTHING and
+# the existing task is returned in their place, so resubmitting a proposal is
+# idempotent. Rows without a dedupe_key are always inserted.
+
+def _task_rows(items: List[dict]) -> List[dict]:
+    return [{**TASK_DEFAULTS, **it, "status": "queued"} for it in items]
+
+def _queue_stmt(dialect_name: str):
+    table = models.AITask.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return (
+        dialect_insert(table)
+        .on_conflict_do_nothing(index_elements=["user_id", "dedupe_key"])
+        .returning(*table.c)
+    )
+
+def _existing_stmt(keys: set):
+    t = models.AITask.__table__
+    by_user: dict = {}
+    for user_id, key in keys:
+        by_user.setdefault(user_id, []).append(key)
+    return select(*t.c).where(or_(*(
+        and_(t.c.user_id == u, t.c.dedupe_key.in_(ks)) for u, ks in by_user.items()
+    )))
+
+def _key(row) -> Optional[tuple]:
+    return (row["user_id"], row["dedupe_key"]) if row["dedupe_key"] is not None else None
+
+def _in_input_order(rows: List[dict], inserted: List[dict], existing: List[dict]) -> List[dict]:
+    # keyed rows are matched by key (in-batch repeats share one task); unkeyed
+    # rows get their ids in VALUES order, so id order is input order
+    inserted = sorted(inserted, key=lambda r: r["id"])
+    by_key = {_key(r): r for r in existing}
+    by_key.update((_key(r), r) for r in inserted if _key(r))
+    fresh = iter(r for r in inserted if not _key(r))
+    return [by_key[_key(r)] if _key(r) else next(fresh) for r in rows]
+
+def _missing_keys(rows: List[dict], inserted: List[dict]) -> set:
+    got = {_key(r) for r in inserted}
+    return {_key(r) for r in rows if _key(r) and _key(r) not in got}
+
+def queue_ai_tasks(db: Session, items: List[dict]) -> List[dict]:
+    """
+    Queue many tasks in one transaction (commits). `items` are AITaskCreate
+    dicts; returns one task dict per item, in order -- the existing task where
+    (user_id, dedupe_key) was already queued.
+    """
+    rows = _task_rows(items)
+    if not rows:
+        return []
+    inserted = [dict(r._mapping) for r in db.execute(_queue_stmt(db.get_bind().dialect.name), rows)]
+    missing = _missing_keys(rows, inserted)
+    existing = [dict(r._mapping) for r in db.execute(_existing_stmt(missing))] if missing else []
+    db.commit()
+    return _in_input_order(rows, inserted, existing)
+
+def _tasks_stmt(user_id: int, status: Optional[str]):
+    q = select(models.AITask).where(models.AITask.user_id == user_id)
     if status:
-        q = q.filter(models.AITask.status == status)
-    return q.order_by(models.AITask.created_at.desc()).all()
+        q = q.where(models.AITask.status == status)
+    return q.order_by(models.AITask.created_at.desc())
+
+def list_ai_tasks(db: Session, *, user_id: int, status: Optional[str] = None) -> List[models.AITask]:
+    return db.scalars(_tasks_stmt(user_id, status)).all()
 
 def get_ai_task(db: Session, task_id: int) -> models.AITask | None:
-    return db.query(models.AITask).filter(models.AITask.id == task_id).first()
+    return db.get(models.AITask, task_id)
+
+def set_ai_task_status(db: Session, t: models.AITask, new_status: str) -> models.AITask:
+    """Status change on an already-loaded task (no second lookup)."""
+    t.status = new_status  # 'approved' or 'rejected'
+    db.commit()
+    db.refresh(t)
+    return t
 
 def update_ai_task_status(db: Session, task_id: int, new_status: str) -> models.AITask:
     t = get_ai_task(db, task_id)
     if not t:
         raise ValueError("task not found")
-    t.status = new_status  # 'approved' or 'rejected'
-    db.add(t)
-    db.commit()
-    db.refresh(t)
-    return t
\ No newline at end of file
+    return set_ai_task_status(db, t, new_status)
+
+# ── async variants (DB_ASYNC routers) ──────────────────────────────────────────
+async def list_ai_tasks_async(db: AsyncSession, *, user_id: int, status: Optional[str] = None) -> List[models.AITask]:
+    return (await db.scalars(_tasks_stmt(user_id, status))).all()
+
+async def get_ai_task_async(db: AsyncSession, task_id: int) -> models.AITask | None:
+    return await db.get(models.AITask, task_id)
+
+async def set_ai_task_status_async(db: AsyncSession, t: models.AITask, new_status: str) -> models.AITask:
+    t.status = new_status
+    await db.commit()
+    await db.refresh(t)
+    return t
+
+async def update_ai_task_status_async(db: AsyncSession, task_id: int, new_status: str) -> models.AITask:
+    t = await get_ai_task_async(db, task_id)
+    if not t:
+        raise ValueError("task not found")
+    return await set_ai_task_status_async(db, t, new_status)
+
+async def queue_ai_tasks_async(db: AsyncSession, items: List[dict]) -> List[dict]:
+    """queue_ai_tasks on an AsyncSession."""
+    rows = _task_rows(items)
+    if not rows:
+        return []
+    inserted = [dict(r._mapping) for r in await db.execute(_queue_stmt(db.get_bind().dialect.name), rows)]
+    missing = _missing_keys(rows, inserted)
+    existing = [dict(r._mapping) for r in await db.execute(_existing_stmt(missing))] if missing else []
+    await db.commit()
+    return _in_input_order(rows, inserted, existing)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+if TYPE_CHECKING:  # async driver stack only loads with DB_ASYNC
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+SET_COLUMNS = (
+    models.ExerciseSet.id,
+    models.ExerciseSet.workout_id,
+    models.ExerciseSet.exercise,
+    models.ExerciseSet.reps,
+    models.ExerciseSet.weight,
+    models.ExerciseSet.rpe,
+)
+
+
+def bulk_insert_sets(db: Session, rows: List[dict]) -> List[dict]:
+    """
+    Insert many exercise_sets rows and return them (with ids) as plain dicts.
+
+    Where the dialect can do it (PostgreSQL, SQLite >= 3.35) this is a single
+    multi-row INSERT ... RETURNING; otherwise the rows are flushed as ORM
+    objects, which still gets ids back without a SELECT per row. Does not commit.
+    """
+    if not rows:
+        return []
+    if _returning(db):
+        return _sorted_rows(db.execute(_insert_returning(), rows))
+
+    objs = [models.ExerciseSet(**r) for r in rows]
+    db.add_all(objs)
+    db.flush()
+    return [{c.key: getattr(o, c.key) for c in SET_COLUMNS} for o in objs]
+
+
+async def bulk_insert_sets_async(db: AsyncSession, rows: List[dict]) -> List[dict]:
+    """bulk_insert_sets on an AsyncSession."""
+    if not rows:
+        return []
+    if _returning(db):
+        return _sorted_rows(await db.execute(_insert_returning(), rows))
+
+    objs = [models.ExerciseSet(**r) for r in rows]
+    db.add_all(objs)
+    await db.flush()
+    return [{c.key: getattr(o, c.key) for c in SET_COLUMNS} for o in objs]
+
+
+def _returning(db) -> bool:
+    dialect = db.get_bind().dialect
+    return dialect.insert_returning and dialect.use_insertmanyvalues
+
+
+def _insert_returning():
+    # Core insert on the table: the ORM bulk path splits batches whenever a
+    # nullable column is None in some rows and not others
+    table = models.ExerciseSet.__table__
+    return insert(table).returning(*(table.c[c.key] for c in SET_COLUMNS))
+
+
+def _sorted_rows(result) -> List[dict]:
+    # ids are assigned in VALUES order, so sorting restores the input order
+    # without forcing SQLAlchemy into one-row-per-statement ordering mode
+    return sorted((dict(r._mapping) for r in result), key=lambda r: r["id"])
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+if TYPE_CHECKING:  # async driver stack only loads with DB_ASYNC
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .crud_sets import SET_COLUMNS
+from .pagination import encode_cursor, keyset
+
+WORKOUT_COLUMNS = (
+    models.WorkoutSession.id,
+    models.WorkoutSession.user_id,
+    models.WorkoutSession.title,
+    models.WorkoutSession.notes,
+    models.WorkoutSession.scheduled_for,
+    models.WorkoutSession.status,
+    models.WorkoutSession.started_at,
+)
+SCHEDULE_KEYS = (models.WorkoutSession.scheduled_for, models.WorkoutSession.id)
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _range_stmt(user_id: int, start: date, end: date, limit: int, cursor: Optional[str]):
+    W = models.WorkoutSession
+    stmt = (
+        select(*WORKOUT_COLUMNS)
+        .where(W.user_id == user_id)
+        .where(W.scheduled_for >= start)
+        .where(W.scheduled_for <= end)
+    )
+    return keyset(stmt, SCHEDULE_KEYS, cursor).limit(limit + 1)
+
+
+def _sets_stmt(workout_ids: List[int]):
+    S = models.ExerciseSet
+    return select(*SET_COLUMNS).where(S.workout_id.in_(workout_ids)).order_by(S.workout_id, S.id)
+
+
+def _workout_dicts(rows, limit: int) -> Tuple[List[dict], dict, Optional[str]]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].scheduled_for, rows[-1].id)
+
+    out: List[dict] = []
+    by_id = {}
+    for wid, uid, title, notes, scheduled_for, status, started_at in rows:
+        sets: List[dict] = []
+        by_id[wid] = sets
+        out.append({
+            "title": title,
+            "notes": notes,
+            "scheduled_for": _iso(scheduled_for),
+            "status": status,
+            "id": wid,
+            "user_id": uid,
+            "started_at": _iso(started_at),
+            "sets": sets,
+        })
+    return out, by_id, next_cursor
+
+
+def _attach_sets(by_id: dict, set_rows) -> None:
+    for sid, wid, exercise, reps, weight, rpe in set_rows:
+        by_id[wid].append({
+            "exercise": exercise,
+            "reps": reps,
+            "weight": weight,
+            "rpe": rpe,
+            "id": sid,
+            "workout_id": wid,
+        })
+
+
+def range_with_sets(
+    db: Session,
+    user_id: int,
+    start: date,
+    end: date,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of a user's scheduled workouts in [start, end], each with its sets,
+    as JSON-ready dicts (dates already ISO strings) plus the next cursor.
+
+    Two column-only queries -- the workout page off (user_id, scheduled_for, id)
+    and its sets off workout_id -- stitched together from row tuples. No ORM
+    identity map, no join fan-out, no per-object validation.
+    """
+    rows = db.execute(_range_stmt(user_id, start, end, limit, cursor)).all()
+    out, by_id, next_cursor = _workout_dicts(rows, limit)
+    if by_id:
+        _attach_sets(by_id, db.execute(_sets_stmt(list(by_id))))
+    return out, next_cursor
+
+
+def _by_ids_stmt(workout_ids: List[int]):
+    return select(*WORKOUT_COLUMNS).where(models.WorkoutSession.id.in_(workout_ids))
+
+
+def _in_order(out: List[dict], workout_ids: List[int]) -> List[dict]:
+    pos = {wid: i for i, wid in enumerate(workout_ids)}
+    return sorted(out, key=lambda w: pos[w["id"]])
+
+
+def workouts_with_sets(db: Session, workout_ids: List[int]) -> List[dict]:
+    """The given workouts with their sets, as range_with_sets dicts, in `workout_ids` order."""
+    if not workout_ids:
+        return []
+    rows = db.execute(_by_ids_stmt(workout_ids)).all()
+    out, by_id, _ = _workout_dicts(rows, len(rows))
+    if by_id:
+        _attach_sets(by_id, db.execute(_sets_stmt(list(by_id))))
+    return _in_order(out, workout_ids)
+
+
+async def range_with_sets_async(
+    db: AsyncSession,
+    user_id: int,
+    start: date,
+    end: date,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """range_with_sets on an AsyncSession."""
+    rows = (await db.execute(_range_stmt(user_id, start, end, limit, cursor))).all()
+    out, by_id, next_cursor = _workout_dicts(rows, limit)
+    if by_id:
+        _attach_sets(by_id, await db.execute(_sets_stmt(list(by_id))))
+    return out, next_cursor
+
+
+async def workouts_with_sets_async(db: AsyncSession, workout_ids: List[int]) -> List[dict]:
+    """workouts_with_sets on an AsyncSession."""
+    if not workout_ids:
+        return []
+    rows = (await db.execute(_by_ids_stmt(workout_ids))).all()
+    out, by_id, _ = _workout_dicts(rows, len(rows))
+    if by_id:
+        _attach_sets(by_id, await db.execute(_sets_stmt(list(by_id))))
+    return _in_order(out, workout_ids)
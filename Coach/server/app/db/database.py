@@ -1,24 +1,149 @@
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
+
+from ..core.config import Settings, settings
+from ..core.metrics import instrument_engine
 
 # --- Paths ---
 BASE_DIR = Path(__file__).resolve().parent.parent  # .../server/app
-DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
+DATA_DIR = BASE_DIR / "data"  # created by make_engine when the SQLite file lives there
 
 DB_PATH = DATA_DIR / "app.db"
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+DATABASE_URL = settings.DATABASE_URL or f"sqlite:///{DB_PATH}"
+
+# --- Engine profiles (picked by URL) ---
+def _sqlite_file(url) -> None:
+    if url.database not in (None, "", ":memory:") and not url.database.startswith("file:"):
+        Path(url.database).parent.mkdir(parents=True, exist_ok=True)
+
+
+def _sqlite_args(url, cfg: Settings) -> dict:
+    if url.database in (None, "", ":memory:"):
+        # one shared connection (SingletonThreadPool / StaticPool); no sizing
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "connect_args": {
+            "check_same_thread": False,  # required for SQLite + threads (uvicorn reload)
+            "timeout": cfg.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            "cached_statements": cfg.SQLITE_CACHED_STATEMENTS,
+        },
+        "pool_size": cfg.SQLITE_POOL_SIZE,
+        "max_overflow": cfg.DB_MAX_OVERFLOW,
+        "pool_timeout": cfg.DB_POOL_TIMEOUT_S,
+    }
+
+
+def _sqlite_pragmas(engine: Engine, url, cfg: Settings) -> None:
+    memory = url.database in (None, "", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        if not memory:
+            # WAL: readers don't block the writer; NORMAL is durable in WAL
+            # except for the last transactions on power loss
+            cur.execute(f"PRAGMA journal_mode={cfg.SQLITE_JOURNAL_MODE}")
+            cur.execute(f"PRAGMA mmap_size={int(cfg.SQLITE_MMAP_SIZE)}")
+        cur.execute(f"PRAGMA synchronous={cfg.SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA busy_timeout={int(cfg.SQLITE_BUSY_TIMEOUT_MS)}")
+        cur.close()
+
+
+def _postgres_args(url, cfg: Settings) -> dict:
+    connect_args = {}
+    if cfg.DB_STATEMENT_TIMEOUT_MS:
+        if url.get_driver_name() == "asyncpg":
+            connect_args["server_settings"] = {"statement_timeout": str(int(cfg.DB_STATEMENT_TIMEOUT_MS))}
+        else:
+            # libpq startup option, so it holds for every pooled connection (psycopg / psycopg2)
+            connect_args["options"] = f"-c statement_timeout={int(cfg.DB_STATEMENT_TIMEOUT_MS)}"
+    return {
+        "pool_size": cfg.DB_POOL_SIZE,
+        "max_overflow": cfg.DB_MAX_OVERFLOW,
+        "pool_timeout": cfg.DB_POOL_TIMEOUT_S,
+        "pool_recycle": cfg.DB_POOL_RECYCLE_S,
+        "pool_pre_ping": cfg.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def _engine_args(url, cfg: Settings) -> dict:
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return _sqlite_args(url, cfg)
+    if backend == "postgresql":
+        return _postgres_args(url, cfg)
+    return {"pool_pre_ping": cfg.DB_POOL_PRE_PING}
+
+
+def make_engine(url: Optional[str] = None, cfg: Settings = settings) -> Engine:
+    """Engine for `url` (default DATABASE_URL) with the SQLite or PostgreSQL profile."""
+    url = make_url(url or DATABASE_URL)
+    engine = create_engine(url, **_engine_args(url, cfg))
+    if url.get_backend_name() == "sqlite":
+        _sqlite_file(url)
+        _sqlite_pragmas(engine, url, cfg)
+    if cfg.METRICS_ENABLED or cfg.QUERY_BUDGET_MODE != "off":
+        instrument_engine(engine)
+    return engine
+
+
+def async_url(url: Optional[str] = None, cfg: Settings = settings) -> str:
+    """DATABASE_ASYNC_URL, or `url` / DATABASE_URL with an async driver swapped in."""
+    if url is None and cfg.DATABASE_ASYNC_URL:
+        return cfg.DATABASE_ASYNC_URL
+    u = make_url(url or DATABASE_URL)
+    driver = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}.get(u.get_backend_name())
+    if driver and u.get_driver_name() not in (driver, "psycopg"):  # psycopg 3 does both
+        u = u.set(drivername=f"{u.get_backend_name()}+{driver}")
+    return u.render_as_string(hide_password=False)
+
+
+def make_async_engine(url: Optional[str] = None, cfg: Settings = settings):
+    """AsyncEngine with the same profile as make_engine()."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(async_url(url, cfg))
+    engine = create_async_engine(url, **_engine_args(url, cfg))
+    if url.get_backend_name() == "sqlite":
+        _sqlite_file(url)
+        _sqlite_pragmas(engine.sync_engine, url, cfg)
+    if cfg.METRICS_ENABLED or cfg.QUERY_BUDGET_MODE != "off":
+        instrument_engine(engine.sync_engine)
+    return engine
 
 # --- SQLAlchemy core ---
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # required for SQLite + threads (uvicorn reload)
-)
+engine = make_engine()
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# async engine/sessions are created on first use so the sync path never
+# imports the async drivers
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def get_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_engine = make_async_engine()
+        # no expire on commit: attribute access after commit would be an
+        # implicit (and, under asyncio, illegal) lazy load
+        _AsyncSessionLocal = async_sessionmaker(bind=_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = _AsyncSessionLocal = None
+
 class Base(DeclarativeBase):
     pass
 
@@ -29,3 +154,9 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+# --- async variant (DB_ASYNC) ---
+async def get_async_db() -> AsyncGenerator:
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
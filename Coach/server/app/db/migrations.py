@@ -0,0 +1,115 @@
+# server/app/db/migrations.py
+"""
+Minimal forward-only schema migrations.
+
+`Base.metadata.create_all` only creates missing tables, so anything added to an
+existing table (indexes, columns) needs a step here. Each step runs once per
+database, in order, and is recorded in `schema_migrations`. Steps must be
+idempotent: on a fresh database create_all has usually built the object already.
+
+    python -m server.app.db.migrations          # apply pending steps
+    python -m server.app.db.migrations --list   # show applied / pending
+"""
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, inspect, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from . import models, rollups
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _meta,
+    Column("version", String(64), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_index(name: str) -> Callable[[Connection], None]:
+    def step(conn: Connection) -> None:
+        index = next(ix for t in models.Base.metadata.tables.values() for ix in t.indexes if ix.name == name)
+        index.create(conn, checkfirst=True)
+    return step
+
+
+def _add_column(table: str, name: str) -> Callable[[Connection], None]:
+    def step(conn: Connection) -> None:
+        if name in {c["name"] for c in inspect(conn).get_columns(table)}:
+            return
+        col = models.Base.metadata.tables[table].c[name]
+        ddl = f"ALTER TABLE {table} ADD COLUMN {name} {col.type.compile(dialect=conn.dialect)}"
+        conn.exec_driver_sql(ddl)
+    return step
+
+
+def _dedupe_ai_tasks(conn: Connection) -> None:
+    # rows queued before the unique index may repeat a key: keep the oldest
+    # task's key and clear it on the rest so the index can be built
+    t = models.AITask.__table__
+    keep = (
+        select(func.min(t.c.id))
+        .where(t.c.dedupe_key.isnot(None))
+        .group_by(t.c.user_id, t.c.dedupe_key)
+    )
+    conn.execute(
+        update(t)
+        .where(t.c.dedupe_key.isnot(None), t.c.id.not_in(keep))
+        .values(dedupe_key=None)
+    )
+    _create_index("ux_ai_tasks_user_dedupe")(conn)
+
+
+def _backfill_rollups(conn: Connection) -> None:
+    # create_all has made the table; fill it from the sets already there
+    rollups.rebuild(conn)
+
+
+# (version, step) — append only; never edit a step that has shipped
+MIGRATIONS: list[tuple[str, Callable[[Connection], None]]] = [
+    ("0001_workout_sessions_user_scheduled", _create_index("ix_workout_sessions_user_scheduled")),
+    ("0002_workout_sessions_user_started", _create_index("ix_workout_sessions_user_started")),
+    ("0003_exercise_sets_workout_exercise", _create_index("ix_exercise_sets_workout_exercise")),
+    ("0004_ai_tasks_user_dedupe_unique", _dedupe_ai_tasks),
+    ("0005_ai_tasks_result", _add_column("ai_tasks", "result")),
+    ("0006_weekly_exercise_rollups_backfill", _backfill_rollups),
+]
+
+
+def applied_versions(conn: Connection) -> set[str]:
+    _meta.create_all(conn, checkfirst=True)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(engine: Engine) -> list[str]:
+    """Create tables, then apply pending steps. Returns the versions applied now."""
+    models.Base.metadata.create_all(bind=engine)
+    done: list[str] = []
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+        for version, step in MIGRATIONS:
+            if version in applied:
+                continue
+            step(conn)
+            conn.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+            done.append(version)
+    return done
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import engine
+
+    ap = argparse.ArgumentParser(description="apply pending schema migrations")
+    ap.add_argument("--list", action="store_true", help="only show migration status")
+    args = ap.parse_args()
+    if args.list:
+        with engine.begin() as conn:
+            applied = applied_versions(conn)
+        for version, _ in MIGRATIONS:
+            print(("applied " if version in applied else "pending ") + version)
+    else:
+        for version in run_migrations(engine):
+            print("applied", version)
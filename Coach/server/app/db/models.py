@@ -48,6 +48,28 @@ class ExerciseSet(Base):
 
     workout: Mapped["WorkoutSession"] = relationship(back_populates="sets")
 
+class WeeklyExerciseRollup(Base):
+    """Weekly totals per user and exercise, maintained by db/rollups.py."""
+    __tablename__ = "weekly_exercise_rollups"
+
+    # primary key doubles as the (user, week range) access path
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    week: Mapped[date] = mapped_column(Date, primary_key=True)             # Monday
+    exercise: Mapped[str] = mapped_column(String(100), primary_key=True)   # rollups.canonical_exercise
+    sets: Mapped[int] = mapped_column(Integer, default=0)
+    reps: Mapped[int] = mapped_column(Integer, default=0)
+    tonnage: Mapped[float] = mapped_column(Float, default=0.0)              # sum of reps x weight
+    best_e1rm: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    rpe_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    rpe_n: Mapped[int] = mapped_column(Integer, default=0)                  # sets with RPE logged
+
+class UserDataVersion(Base):
+    """Per-user counter bumped by every write to workouts/sets (db/versions.py)."""
+    __tablename__ = "user_data_versions"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+
 class AITask(Base):
     __tablename__ = "ai_tasks"
 
@@ -62,8 +84,11 @@ class AITask(Base):
     requires_confirmation = Column(Boolean, default=True)
     requires_super_confirmation = Column(Boolean, default=False)
 
-    # queue state machine (no execution yet)
-    status = Column(String(20), nullable=False, default="queued")  # queued|confirmed|executed|canceled
+    # queue state machine: queued -> approved -> executed | failed (rejected any time
+    # before execution); approved tasks are run by services/task_executor.py
+    status = Column(String(20), nullable=False, default="queued")
+    # what execution did ({"workout_ids": [...]}) or why it failed ({"error": ...})
+    result = Column(JSON, nullable=True)
 
     # optional dedupe key if the UI resubmits the same thing
     dedupe_key = Column(String(64), nullable=True)
@@ -71,4 +96,13 @@ class AITask(Base):
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
-Index("ix_ai_tasks_user_status", AITask.user_id, AITask.status)
\ No newline at end of file
+Index("ix_ai_tasks_user_status", AITask.user_id, AITask.status)
+# a resubmitted proposal maps to the task already queued (crud_ai.queue_ai_tasks);
+# NULL keys never collide
+Index("ux_ai_tasks_user_dedupe", AITask.user_id, AITask.dedupe_key, unique=True)
+
+# calendar / history access paths (see routers/workouts.py); id last so keyset
+# pages (sort column, id) come straight off the index
+Index("ix_workout_sessions_user_scheduled", WorkoutSession.user_id, WorkoutSession.scheduled_for, WorkoutSession.id)
+Index("ix_workout_sessions_user_started", WorkoutSession.user_id, WorkoutSession.started_at, WorkoutSession.id)
+Index("ix_exercise_sets_workout_exercise", ExerciseSet.workout_id, ExerciseSet.exercise)
\ No newline at end of file
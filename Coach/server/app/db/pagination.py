@@ -0,0 +1,142 @@
+# server/app/db/pagination.py
+"""
+Keyset (cursor) pagination and column projection for list endpoints.
+
+Pages are ordered by (sort column, id) and the cursor is the last row's pair,
+so every page is an index range scan instead of an ever-growing OFFSET. The
+body stays a plain JSON list; the cursor for the next page comes back in the
+`X-Next-Cursor` header (absent on the last page).
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Query as ORMQuery, Session
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """Shared query params: ?limit=&cursor=&fields=a,b,c"""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description=f"value of {NEXT_CURSOR_HEADER} from the previous page"),
+        fields: Optional[str] = Query(None, description="comma-separated columns to return"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+
+def _encode(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _decode(value: Any, column) -> Any:
+    py = column.type.python_type
+    if value is None:
+        return None
+    if py is datetime:
+        return datetime.fromisoformat(value)
+    if py is date:
+        return date.fromisoformat(value)
+    return py(value)
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([_encode(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [_decode(v, c) for v, c in zip(values, columns)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def projected_query(db: Session, model, fields: Optional[list[str]], allowed: Sequence[str], keys: Sequence):
+    """
+    db.query(model) normally; with ?fields= only the requested columns (plus
+    the keyset columns, needed to build the next cursor) are selected.
+    """
+    if not fields:
+        return db.query(model)
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown field(s): {', '.join(unknown)}; allowed: {', '.join(allowed)}")
+    cols = [getattr(model, f) for f in fields]
+    cols += [k for k in keys if k.key not in fields]
+    return db.query(*cols)
+
+
+def projected_select(model, fields: Optional[list[str]], allowed: Sequence[str], keys: Sequence):
+    """select() counterpart of projected_query, for AsyncSession routes."""
+    if not fields:
+        return select(model)
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown field(s): {', '.join(unknown)}; allowed: {', '.join(allowed)}")
+    cols = [getattr(model, f) for f in fields]
+    cols += [k for k in keys if k.key not in fields]
+    return select(*cols)
+
+
+def keyset(q: ORMQuery, keys: Sequence, cursor: Optional[str], *, descending: bool = False) -> ORMQuery:
+    """Order by `keys` (sort column(s) then id) and start after `cursor`. Works on Query and Select."""
+    if cursor:
+        after = decode_cursor(cursor, keys)
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y); spelled out so every
+        # backend can use the (user_id, a, b) index for it
+        clauses = []
+        for i, col in enumerate(keys):
+            prefix = [keys[j] == after[j] for j in range(i)]
+            cmp = col < after[i] if descending else col > after[i]
+            clauses.append(and_(*prefix, cmp))
+        q = q.filter(or_(*clauses))
+    return q.order_by(*(k.desc() if descending else k.asc() for k in keys))
+
+
+def paginate(q: ORMQuery, page: PageParams, keys: Sequence, response=None):
+    """
+    Run one page. Returns ORM rows (for the route's response_model) and sets
+    the next-cursor header on `response`; with ?fields= returns a JSONResponse
+    with only the requested columns, skipping entity loading and validation.
+    """
+    return _page(q.limit(page.limit + 1).all(), page, keys, response)
+
+
+async def apaginate(db, stmt, page: PageParams, keys: Sequence, response=None):
+    """paginate() for a select() on an AsyncSession."""
+    result = await db.execute(stmt.limit(page.limit + 1))
+    rows = result.all() if page.fields else result.scalars().all()
+    return _page(rows, page, keys, response)
+
+
+def _page(rows: list, page: PageParams, keys: Sequence, response):
+    more = len(rows) > page.limit
+    rows = rows[: page.limit]
+    next_cursor = encode_cursor(*(getattr(rows[-1], k.key) for k in keys)) if more and rows else None
+
+    if page.fields:
+        body = [{f: getattr(r, f) for f in page.fields} for r in rows]
+        out = JSONResponse(jsonable_encoder(body))
+        if next_cursor:
+            out.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return out
+    if next_cursor and response is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
@@ -0,0 +1,276 @@
+# server/app/db/rollups.py
+"""
+weekly_exercise_rollups: per-user, per-week (Monday), per-exercise training
+totals -- sets, reps, tonnage, best estimated 1RM, RPE sum/count -- so weekly
+dashboards read a few hundred small rows instead of every raw set.
+
+Only sets of workouts with a scheduled_for date are counted. Exercise names
+are normalized (`canonical_exercise`), as in services/analytics.py.
+
+Kept in step by every write path, inside the writer's transaction:
+  - new sets (POST /sets/, /sets/bulk, upsert_sets proposals): `add_sets`
+    upserts the deltas in one statement, and best_e1rm only ever grows
+    (`add_rows` does the same for sets of many workouts: history imports);
+  - anything that can lower a total or the best (set patch/delete, workout
+    move/delete, replace-mode upserts): `refresh_weeks` recomputes just the
+    touched (user, week) buckets from raw sets (one SELECT, DELETE, INSERT).
+
+Both take a per-user transaction lock first (`_lock_user`). On PostgreSQL's
+READ COMMITTED a recompute can't see a concurrent writer's uncommitted set,
+and would otherwise delete the bucket that writer's delta lands in (or two
+recomputes would both INSERT it). SQLite already runs one writer at a time.
+
+    python -m server.app.db.rollups rebuild [--user ID]   # backfill from raw sets
+    python -m server.app.db.rollups check [--user ID]     # exit 1 on any drift
+"""
+from __future__ import annotations
+
+import math
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import case, delete, distinct, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+__all__ = [
+    "E1RM_MAX_REPS",
+    "add_rows",
+    "add_sets",
+    "canonical_exercise",
+    "check",
+    "e1rm",
+    "move_workout",
+    "rebuild",
+    "refresh_weeks",
+    "week_of",
+]
+
+# Epley gets unreliable past ~12 reps; those sets count for volume but not 1RM
+E1RM_MAX_REPS = 12
+
+R = models.WeeklyExerciseRollup
+T = R.__table__
+W, S = models.WorkoutSession, models.ExerciseSet
+
+# cell = [sets, reps, tonnage, best_e1rm, rpe_sum, rpe_n]
+Cells = dict[tuple[date, str], list]
+
+
+def canonical_exercise(name: str) -> str:
+    return " ".join(name.split()).lower()
+
+
+def week_of(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def e1rm(weight: Optional[float], reps: int) -> Optional[float]:
+    """Epley (w * (1 + reps/30); a single is its own weight); None where it doesn't apply."""
+    if weight is None or weight <= 0 or not 1 <= reps <= E1RM_MAX_REPS:
+        return None
+    return weight if reps == 1 else weight * (1.0 + reps / 30.0)
+
+
+def _aggregate(rows: Iterable[tuple], cells: Optional[Cells] = None) -> Cells:
+    """(day, exercise, reps, weight, rpe) rows -> cells keyed (week, canonical exercise)."""
+    cells = {} if cells is None else cells
+    for day, exercise, reps, weight, rpe in rows:
+        key = (week_of(day), canonical_exercise(exercise))
+        c = cells.get(key)
+        if c is None:
+            c = cells[key] = [0, 0, 0.0, None, 0.0, 0]
+        c[0] += 1
+        c[1] += reps
+        if weight is not None:
+            c[2] += reps * weight
+        best = e1rm(weight, reps)
+        if best is not None and (c[3] is None or best > c[3]):
+            c[3] = best
+        if rpe is not None:
+            c[4] += rpe
+            c[5] += 1
+    return cells
+
+
+def _values(user_id: int, cells: Cells) -> list[dict]:
+    return [
+        {"user_id": user_id, "week": week, "exercise": ex, "sets": c[0], "reps": c[1], "tonnage": c[2],
+         "best_e1rm": c[3], "rpe_sum": c[4], "rpe_n": c[5]}
+        for (week, ex), c in cells.items()
+    ]
+
+
+def _upsert_deltas(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(T)
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[T.c.user_id, T.c.week, T.c.exercise],
+        set_={
+            "sets": T.c.sets + new.sets,
+            "reps": T.c.reps + new.reps,
+            "tonnage": T.c.tonnage + new.tonnage,
+            "best_e1rm": case(
+                (new.best_e1rm.is_(None), T.c.best_e1rm),
+                (T.c.best_e1rm.is_(None) | (new.best_e1rm > T.c.best_e1rm), new.best_e1rm),
+                else_=T.c.best_e1rm,
+            ),
+            "rpe_sum": T.c.rpe_sum + new.rpe_sum,
+            "rpe_n": T.c.rpe_n + new.rpe_n,
+        },
+    )
+
+
+# pg_advisory_xact_lock key: "roll" in the high half keeps it apart from other advisory locks
+_LOCK_CLASS = 0x726F6C6C << 32
+
+
+def _lock_user(db: Session, user_id: int) -> None:
+    """Serialize rollup writes per user until the transaction ends."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(_LOCK_CLASS + user_id)))
+    # SQLite: the writer already holds the database write lock (its own sets
+    # are written before the rollups), so no other writer can interleave
+
+
+def add_sets(db: Session, user_id: int, day: Optional[date], rows: Iterable) -> None:
+    """
+    Count new sets of one workout (user_id, scheduled_for = day). `rows` are
+    dicts or objects with exercise/reps/weight/rpe. One upsert; doesn't commit.
+    """
+    if day is None:
+        return
+    add_rows(db, user_id, (
+        (day, r["exercise"], r["reps"], r["weight"], r["rpe"]) if isinstance(r, dict)
+        else (day, r.exercise, r.reps, r.weight, r.rpe)
+        for r in rows
+    ))
+
+
+def add_rows(db: Session, user_id: int, rows: Iterable[tuple]) -> None:
+    """Count new sets given as (day, exercise, reps, weight, rpe) rows, any workouts. One upsert."""
+    cells = _aggregate(rows)
+    if cells:
+        _lock_user(db, user_id)
+        db.execute(_upsert_deltas(db.get_bind().dialect.name), _values(user_id, cells))
+
+
+def _raw_stmt(user_id: Optional[int], weeks: Optional[Iterable[date]] = None):
+    stmt = select(W.scheduled_for, S.exercise, S.reps, S.weight, S.rpe).join(W, S.workout_id == W.id)
+    stmt = stmt.where(W.scheduled_for.isnot(None))
+    if user_id is not None:
+        stmt = stmt.where(W.user_id == user_id)
+    if weeks is not None:
+        stmt = stmt.where(or_(*(W.scheduled_for.between(wk, wk + timedelta(days=6)) for wk in weeks)))
+    return stmt
+
+
+def refresh_weeks(db: Session, user_id: int, days: Iterable[Optional[date]]) -> None:
+    """
+    Recompute the user's buckets for the weeks containing `days` (None is
+    skipped) from raw sets. Flushes pending ORM changes first; doesn't commit.
+    """
+    weeks = sorted({week_of(d) for d in days if d is not None})
+    if not weeks:
+        return
+    db.flush()
+    _lock_user(db, user_id)     # before reading: see the module docstring
+    cells = _aggregate(db.execute(_raw_stmt(user_id, weeks)))
+    db.execute(delete(T).where(T.c.user_id == user_id, T.c.week.in_(weeks)))
+    if cells:
+        db.execute(insert(T), _values(user_id, cells))
+
+
+def move_workout(db: Session, user_id: int, old_day: Optional[date], new_day: Optional[date]) -> None:
+    """A workout's date changed: recompute both weeks, unless it stayed in the same one."""
+    if old_day == new_day or (old_day and new_day and week_of(old_day) == week_of(new_day)):
+        return
+    refresh_weeks(db, user_id, [old_day, new_day])
+
+
+# ── backfill / consistency ─────────────────────────────────────────────────────
+def _users(db, user_id: Optional[int]) -> list[int]:
+    if user_id is not None:
+        return [user_id]
+    return list(db.execute(select(distinct(W.user_id)).order_by(W.user_id)).scalars())
+
+
+def rebuild(db, user_id: Optional[int] = None) -> int:
+    """
+    Replace the rollups (all users, or one) with totals recomputed from raw
+    sets, one user at a time. `db` is a Session or Connection; doesn't commit.
+    Returns rows written.
+    """
+    written = 0
+    if user_id is None:
+        db.execute(delete(T))
+    for uid in _users(db, user_id):
+        if user_id is not None:
+            db.execute(delete(T).where(T.c.user_id == uid))
+        cells = _aggregate(db.execute(_raw_stmt(uid)))
+        if cells:
+            db.execute(insert(T), _values(uid, cells))
+            written += len(cells)
+    return written
+
+
+def _close(a: float, b: float) -> bool:
+    # float totals built up by deltas can differ from a fresh sum in the last bits
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+
+
+def check(db, user_id: Optional[int] = None, limit: int = 50) -> list[str]:
+    """Differences between stored rollups and raw sets (at most `limit`); [] when consistent."""
+    problems: list[str] = []
+    users = set(_users(db, user_id))
+    stored_users = select(distinct(T.c.user_id))
+    if user_id is None:
+        users |= set(db.execute(stored_users).scalars())  # rollups left behind for users with no workouts
+
+    names = ("sets", "reps", "tonnage", "best_e1rm", "rpe_sum", "rpe_n")
+    for uid in sorted(users):
+        want = _aggregate(db.execute(_raw_stmt(uid)))
+        have = {
+            (r.week, r.exercise): [r.sets, r.reps, r.tonnage, r.best_e1rm, r.rpe_sum, r.rpe_n]
+            for r in db.execute(select(T).where(T.c.user_id == uid))
+        }
+        for key in sorted(want.keys() | have.keys()):
+            w, h = want.get(key), have.get(key)
+            label = f"user {uid} week {key[0]} {key[1]!r}"
+            if h is None:
+                problems.append(f"{label}: missing ({w[0]} sets)")
+            elif w is None:
+                problems.append(f"{label}: stale row ({h[0]} sets, no raw sets)")
+            else:
+                for name, a, b in zip(names, h, w):
+                    if (a is None) != (b is None) or (a is not None and not _close(a, b)):
+                        problems.append(f"{label}: {name} {a} != {b}")
+            if len(problems) >= limit:
+                return problems[:limit]
+    return problems
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from .database import engine
+
+    ap = argparse.ArgumentParser(description="rebuild or check weekly_exercise_rollups")
+    ap.add_argument("command", choices=("rebuild", "check"))
+    ap.add_argument("--user", type=int, help="only this user")
+    args = ap.parse_args()
+    with engine.begin() as conn:
+        if args.command == "rebuild":
+            print("rows written:", rebuild(conn, args.user))
+        else:
+            found = check(conn, args.user)
+            for p in found:
+                print(p)
+            print("OK" if not found else f"{len(found)} problem(s)")
+            sys.exit(1 if found else 0)
@@ -0,0 +1,51 @@
+# server/app/db/versions.py
+"""
+user_data_versions: one counter per user, bumped in the same transaction as
+every write to that user's workouts or sets (routers, proposal apply, task
+executor). Readers compare it instead of the data itself: the calendar range
+endpoints turn it into an ETag and answer If-None-Match with 304 after one
+primary-key lookup, without touching workout_sessions / exercise_sets.
+
+A user with no row is at version 0; the first bump inserts it.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+if TYPE_CHECKING:  # async driver stack only loads with DB_ASYNC
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+__all__ = ["bump", "current", "current_async"]
+
+T = models.UserDataVersion.__table__
+
+
+def _bump_stmt(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(T)
+    return stmt.on_conflict_do_update(index_elements=[T.c.user_id], set_={"version": T.c.version + 1})
+
+
+def bump(db: Session, user_id: int) -> None:
+    """Mark the user's data changed. One upsert; doesn't commit."""
+    db.execute(_bump_stmt(db.get_bind().dialect.name), {"user_id": user_id, "version": 1})
+
+
+def _current_stmt(user_id: int):
+    return select(T.c.version).where(T.c.user_id == user_id)
+
+
+def current(db: Session, user_id: int) -> int:
+    return db.execute(_current_stmt(user_id)).scalar() or 0
+
+
+async def current_async(db: AsyncSession, user_id: int) -> int:
+    return (await db.execute(_current_stmt(user_id))).scalar() or 0
@@ -1,32 +1,99 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .db.database import engine
-from .db import models
-from .routers import users, workouts, sets, ai
+from .core import metrics, query_budget
+from .core.config import Settings, settings
+from .db.database import dispose_async_engine, engine
+from .db.migrations import run_migrations
+from .routers import ai
+from .services.ai_client import init_ai_client, shutdown_ai_client
+from .services.model_catalog import check_model, init_model_catalog, shutdown_model_catalog
+from .services.task_executor import start_executor, stop_executor
+from .services.week_cache import init_week_cache, shutdown_week_cache
+
+log = logging.getLogger("server.app")
 
 
-app = FastAPI()
+def include_routers(app: FastAPI, use_async: bool = False) -> None:
+    """Mount the API; use_async swaps in the AsyncSession handlers (routers/aio)."""
+    if use_async:
+        from .routers.aio import ai_tasks, analytics, history, sets, users, workouts
+    else:
+        from .routers import ai_tasks, analytics, history, sets, users, workouts
+    app.include_router(users.router)
+    app.include_router(workouts.router)
+    app.include_router(sets.router)
+    app.include_router(ai.router)
+    app.include_router(ai_tasks.router)
+    app.include_router(analytics.router)
+    app.include_router(history.router)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cfg: Settings = app.state.settings
+    # importing the app touches nothing on disk; the schema is brought up to
+    # date here (or ahead of deploys with `python -m server.app.db.migrations`)
+    if cfg.DB_AUTO_MIGRATE:
+        applied = await asyncio.to_thread(run_migrations, engine)
+        if applied:
+            log.info("applied migrations: %s", ", ".join(applied))
+    # before the executor: its writes must invalidate too
+    init_week_cache(cfg)
+    # one shared Gemini client for the whole process
+    init_ai_client()
+    log.info("AI key present: %s; model %s; mock %s", bool(cfg.GEMINI_API_KEY), cfg.AI_MODEL, cfg.AI_MOCK)
+    catalog = init_model_catalog(cfg=cfg)
+    if cfg.AI_MODEL_CHECK != "off":
+        # warms the catalog; raises (aborting startup) only in "raise" mode
+        # when the listing loaded and AI_MODEL isn't in it
+        try:
+            await asyncio.wait_for(
+                asyncio.to_thread(check_model, catalog, cfg.AI_MODEL, cfg.AI_MODEL_CHECK),
+                cfg.AI_TIMEOUT_S,
+            )
+        except asyncio.TimeoutError:
+            log.warning("model catalog didn't load within %ss; AI_MODEL not checked", cfg.AI_TIMEOUT_S)
+    if cfg.AI_EXECUTOR_ENABLED:
+        start_executor()
+    yield
+    await stop_executor()
+    shutdown_model_catalog()
+    shutdown_ai_client()
+    shutdown_week_cache()
+    await dispose_async_engine()
 
-app.include_router(users.router)
-app.include_router(workouts.router)
-app.include_router(sets.router)
-app.include_router(ai.router)
 
-@app.get("/")
 def read_root():
     return {"message": "FastAPI backend is running"}
 
-from .core.config import settings
-print("AI key present?", bool(settings.GEMINI_API_KEY))
-print("AI model:", settings.AI_MODEL, "mock:", settings.AI_MOCK)
\ No newline at end of file
+
+def create_app(cfg: Settings = settings) -> FastAPI:
+    """Build the API: middleware and routers only; I/O waits for the lifespan."""
+    app = FastAPI(lifespan=lifespan)
+    app.state.settings = cfg
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag", "Content-Disposition"],
+    )
+    budget_check = query_budget.make_checker(cfg.QUERY_BUDGET_MODE, cfg.QUERY_REPEAT_THRESHOLD)
+    if cfg.METRICS_ENABLED or budget_check:
+        app.add_middleware(metrics.MetricsMiddleware, slow_ms=cfg.METRICS_SLOW_REQUEST_MS, check=budget_check)
+    if cfg.METRICS_ENABLED:
+        app.include_router(metrics.router)
+
+    include_routers(app, cfg.DB_ASYNC)
+    app.add_api_route("/", read_root, methods=["GET"])
+    return app
+
+
+app = create_app()
@@ -1,26 +1,33 @@
 # server/app/routers/ai.py
 
 # ── Standard library ────────────────────────────────────────────────────────────
+from contextlib import aclosing
 from datetime import date, datetime, timedelta
-from typing import Literal, Optional
+from typing import AsyncIterator, Literal, Optional
+import asyncio
+import json
 import re
 
 # ── Third-party ────────────────────────────────────────────────────────────────
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
 
 # ── Local imports ──────────────────────────────────────────────────────────────
-from ..core.config import settings
-from ..db.database import get_db
-from ..db.crud_ai import create_ai_task, list_ai_tasks, update_ai_task_status, get_ai_task
-from ..services.ai_client import chat_with_gemini
+from ..services.ai_client import get_ai_client, split_chunks
+from ..services.model_catalog import CatalogUnavailable, get_model_catalog
+from ..services.task_executor import get_executor
+from ..services.plan_parser import (
+    PLAN_TEMPLATE,
+    conversation_cache_stats,
+    parse_plan_block,
+    parse_sets_spec,
+    scan_conversation,
+)
 from ..schemas.ai_actions import (
     AIProposal,
     InterpretResponse,
     AddWorkoutPayload,
-    AITaskCreate,
-    AITaskOut,
 )
 
 # Router
@@ -94,10 +101,12 @@ PROMPTS: dict[str, str] = {
     "nutrition": NUTRITION_PROMPT,
 }
 # ── Helpers ────────────────────────────────────────────────────────────────────
-def _mock_reply(messages: list[ChatMessage]) -> str:
+def _mock_reply(messages: list[ChatMessage], scope: str = "planning") -> str:
     """Very small heuristic for mock mode."""
     last_user = next((m.content for m in reversed(messages) if m.role == "user"), "")
     lu = last_user.lower()
+    if scope == "nutrition":
+        return "nice — share today’s meals or your goal and i’ll suggest a protein target and easy swaps."
     if "plan" in lu:
         return "cool — tell me your goal and how many days/week, and i’ll draft a plan."
     if "bench" in lu:
@@ -105,6 +114,18 @@ def _mock_reply(messages: list[ChatMessage]) -> str:
     return "got it! what do you want to work on — strength, hypertrophy, or general fitness?"
 
 
+# --- interpret() lookups, compiled once ---
+# split label (see plan_parser.SPLIT_WORDS) -> default title, in priority order
+SPLIT_TITLES: tuple[tuple[str, str], ...] = (
+    ("pull", "Pull Day"),
+    ("push", "Push Day"),
+    ("legs", "Leg Day"),
+    ("upper", "Upper Day"),
+    ("lower", "Lower Day"),
+)
+CALL_IT_RE = re.compile(r"(call it|name it|title it)\s+([^\n.,;]+)", re.I)
+
+
 # --- lightweight date parsing for interpret() ---
 WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
 
@@ -117,11 +138,17 @@ def _next_weekday(start: date, weekday_idx: int) -> date:
     return start + timedelta(days=delta)
 
 
+ISO_DATE_RE = re.compile(r"\b(20\d{2})-(\d{2})-(\d{2})\b")
+MONTH_DAY_RE = re.compile(r"\b(\d{1,2})[/-](\d{1,2})\b")
+IN_DAYS_RE = re.compile(r"\bin\s+(\d{1,2})\s+days?\b")
+WEEKDAY_RES = tuple((idx, name, re.compile(rf"\b(next\s+)?{name}\b")) for idx, name in enumerate(WEEKDAYS))
+
+
 def _parse_date_from_text(text: str, today: date) -> Optional[date]:
     t = text.lower().strip()
 
     # 1) explicit ISO yyyy-mm-dd
-    m = re.search(r"\b(20\d{2})-(\d{2})-(\d{2})\b", t)
+    m = ISO_DATE_RE.search(t)
     if m:
         y, mo, d = map(int, m.groups())
         try:
@@ -130,7 +157,7 @@ def _parse_date_from_text(text: str, today: date) -> Optional[date]:
             pass
 
     # 2) mm/dd or mm-dd (assume current year)
-    m = re.search(r"\b(\d{1,2})[/-](\d{1,2})\b", t)
+    m = MONTH_DAY_RE.search(t)
     if m:
         mo, d = map(int, m.groups())
         try:
@@ -145,14 +172,14 @@ def _parse_date_from_text(text: str, today: date) -> Optional[date]:
         return today + timedelta(days=1)
 
     # 4) "in N days"
-    m = re.search(r"\bin\s+(\d{1,2})\s+days?\b", t)
+    m = IN_DAYS_RE.search(t)
     if m:
         n = int(m.group(1))
         return today + timedelta(days=n)
 
     # 5) weekday names: "friday", "next tuesday"
-    for idx, name in enumerate(WEEKDAYS):
-        if re.search(rf"\b(next\s+)?{name}\b", t):
+    for idx, name, weekday_re in WEEKDAY_RES:
+        if weekday_re.search(t):
             if f"next {name}" in t:
                 base = today + timedelta(days=7)
                 return _next_weekday(base, idx)
@@ -170,31 +197,108 @@ async def chat(req: ChatRequest) -> ChatReply:
     scope = (req.scope or "planning").lower()
     system_prompt = PROMPTS.get(scope, SYSTEM_PROMPT)
 
-    if settings.AI_MOCK or not settings.GEMINI_API_KEY:
+    client = get_ai_client()
+    if client is None:
         return ChatReply(content=_mock_reply(req.messages, scope))
 
+    messages = [{"role": "system", "content": system_prompt}]
+    messages += [m.model_dump() for m in req.messages]
     try:
-        messages = [{"role": "system", "content": system_prompt}]
-        messages += [m.model_dump() for m in req.messages]
-        content = chat_with_gemini(messages, settings.GEMINI_API_KEY, settings.AI_MODEL)
-        return ChatReply(content=content)
+        content = await client.chat(messages)
+    except asyncio.TimeoutError as e:
+        raise HTTPException(status_code=504, detail="gemini timed out") from e
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"gemini error: {e}") from e
+    return ChatReply(content=content)
 
 
-@router.get("/models")
-def list_models():
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest, request: Request) -> StreamingResponse:
     """
-    Convenience endpoint: list text-capable Gemini models (supports generateContent).
+    Streaming variant of /chat as Server-Sent Events:
+      data: {"delta": "..."}                     one per chunk
+      event: done / data: {"content": "..."}     full reply at the end
+      event: error / data: {"detail": "..."}     upstream failure mid-stream
+    Disconnecting stops the upstream generation.
     """
-    import google.generativeai as genai
+    scope = (req.scope or "planning").lower()
+    system_prompt = PROMPTS.get(scope, SYSTEM_PROMPT)
+    client = get_ai_client()
+
+    async def chunks() -> AsyncIterator[str]:
+        if client is None:
+            for piece in split_chunks(_mock_reply(req.messages, scope)):
+                yield piece
+            return
+        messages = [{"role": "system", "content": system_prompt}]
+        messages += [m.model_dump() for m in req.messages]
+        # `async for` leaves the generator it's suspended in open: close it
+        # ourselves, or the upstream call runs on until garbage collection
+        async with aclosing(client.stream(messages)) as upstream:
+            async for piece in upstream:
+                yield piece
+
+    async def events() -> AsyncIterator[str]:
+        parts: list[str] = []
+        gen = chunks()
+        try:
+            async for piece in gen:
+                if await request.is_disconnected():
+                    return
+                parts.append(piece)
+                yield _sse({"delta": piece})
+            yield _sse({"content": "".join(parts).strip()}, event="done")
+        except asyncio.TimeoutError:
+            yield _sse({"detail": "gemini timed out"}, event="error")
+        except Exception as e:
+            yield _sse({"detail": f"gemini error: {e}"}, event="error")
+        finally:
+            # closes chunks(), which closes client.stream() and so cancels the upstream call
+            await gen.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    genai.configure(api_key=settings.GEMINI_API_KEY)
-    out: list[str] = []
-    for m in genai.list_models():
-        if "generateContent" in getattr(m, "supported_generation_methods", []):
-            out.append(m.name)
-    return {"models": out}
+
+@router.get("/stats")
+def ai_stats():
+    """Per-call Gemini latency, reply-cache / interpret parse-cache counters, model catalog, task executor throughput."""
+    client = get_ai_client()
+    return {
+        "model": client.model_name if client else None,
+        "mock": client is None,
+        "chat": client.stats.snapshot() if client else None,
+        "stream_first_chunk": client.first_chunk.snapshot() if client else None,
+        "response_cache": client.cache.stats() if client and client.cache else None,
+        "singleflight": client.flights.stats() if client else None,
+        "interpret_cache": conversation_cache_stats(),
+        "model_catalog": catalog.stats() if (catalog := get_model_catalog()) else None,
+        "executor": executor.stats.snapshot() if (executor := get_executor()) else None,
+    }
+
+
+@router.get("/models")
+async def list_models():
+    """
+    Convenience endpoint: list text-capable Gemini models (supports generateContent)
+    from the cached catalog; `stale` is true while a background refresh is due.
+    """
+    catalog = get_model_catalog()
+    if catalog is None:
+        raise HTTPException(status_code=503, detail="model catalog not started")
+    try:
+        snap = await asyncio.to_thread(catalog.get)  # only blocks before the first load
+    except CatalogUnavailable as e:
+        raise HTTPException(status_code=502, detail=f"model listing failed: {e}") from e
+    return {"models": list(snap.models), "stale": snap.stale}
 
 
 @router.post("/plan/interpret", response_model=InterpretResponse)
@@ -206,81 +310,17 @@ async def interpret(req: ChatRequest) -> InterpretResponse:
     - If something essential is missing, ask for the template.
     """
     # --------------------------
-    # Collect text
+    # Collect text (only messages not seen on an earlier turn are scanned)
     # --------------------------
-    all_msgs = [m.content for m in req.messages]  # include user and assistant
     user_msgs = [m.content for m in req.messages if m.role == "user"]
     last_user = user_msgs[-1] if user_msgs else ""
-    full_text = "\n".join(all_msgs)
     lu_last = last_user.lower()
-    lu_full = full_text.lower()
-
-    # --------------------------
-    # Utilities
-    # --------------------------
-    PLAN_TEMPLATE = (
-        "<coach_plan>\n"
-        "name: <workout title>\n"
-        "date: YYYY-MM-DD\n"
-        "workouts:\n"
-        "1. <exercise>\n"
-        "2. <exercise>\n"
-        "</coach_plan>"
-    )
-
-    def _safe_date(y: int, m: int, d: int) -> Optional[str]:
-        try:
-            return date(y, m, d).isoformat()
-        except ValueError:
-            return None
-
-    def _iso_from_any(s: str) -> Optional[str]:
-        s = s.strip()
-        # yyyy-mm-dd or yyyy/mm/dd
-        m = re.match(r"^\s*(\d{4})[-/](\d{2})[-/](\d{2})\s*$", s)
-        if m:
-            y, mm, dd = map(int, m.groups())
-            return _safe_date(y, mm, dd)
-        # mm-dd-yyyy or mm/dd/[yy|yyyy]
-        m = re.match(r"^\s*(\d{1,2})[-/](\d{1,2})[-/](\d{2,4})\s*$", s)
-        if m:
-            mm, dd, yy = m.groups()
-            mm, dd = int(mm), int(dd)
-            yy = int(yy)
-            if yy < 100:
-                yy += 2000
-            return _safe_date(yy, mm, dd)
-        return None
-
-    def _extract_plan_block(text: str) -> Optional[str]:
-        blocks = re.findall(r"<coach_plan>(.*?)</coach_plan>", text, flags=re.I | re.S)
-        return blocks[-1] if blocks else None
-
-    def _parse_plan_block(block: str) -> dict:
-        s = block.replace("\r\n", "\n")
-
-        m = re.search(r"(?im)^\s*name\s*:\s*(.+)\s*$", s)
-        name = m.group(1).strip() if m else None
-
-        m = re.search(r"(?im)^\s*date\s*:\s*(.+?)\s*$", s)
-        iso_date = _iso_from_any(m.group(1)) if m else None
-
-        items: list[str] = []
-        after = re.split(r"(?im)^\s*workouts\s*:\s*$", s, maxsplit=1)
-        search_region = after[1] if len(after) == 2 else s
-        for line in search_region.split("\n"):
-            mnum = re.match(r"^\s*\d+[\.)]\s*(.+?)\s*$", line)
-            if mnum:
-                txt = mnum.group(1).strip()
-                if txt:
-                    items.append(txt)
-
-        return {"name": name, "iso_date": iso_date, "items": items}
+    scan = scan_conversation([m.content for m in req.messages])  # include user and assistant
 
     # Extract structured plan if present (from user or assistant)
-    block = _extract_plan_block(full_text)
+    block = scan.plan_block
     if block:
-        parsed = _parse_plan_block(block)
+        parsed = parse_plan_block(block)
         missing = []
         if not parsed["name"]:
             missing.append("name")
@@ -307,21 +347,7 @@ async def interpret(req: ChatRequest) -> InterpretResponse:
         # Parse natural language
         # --------------------------
         # Date: prefer last mentioned date in the whole convo
-        iso_date: Optional[str] = None
-        # yyyy-mm-dd or yyyy/mm/dd
-        for m in re.finditer(r"\b(\d{4})[-/](\d{2})[-/](\d{2})\b", lu_full):
-            y, mm, dd = map(int, m.groups())
-            iso = _safe_date(y, mm, dd)
-            if iso:
-                iso_date = iso  # last wins
-        # mm-dd-yyyy or mm/dd/[yy|yyyy]
-        for m in re.finditer(r"\b(\d{1,2})[-/](\d{1,2})[-/](\d{2,4})\b", lu_full):
-            mm, dd, yy = m.groups()
-            mm, dd = int(mm), int(dd); yy = int(yy)
-            if yy < 100: yy += 2000
-            iso = _safe_date(yy, mm, dd)
-            if iso:
-                iso_date = iso  # last wins
+        iso_date: Optional[str] = scan.date
         if not iso_date and "tomorrow" in lu_last:
             iso_date = (date.today() + timedelta(days=1)).isoformat()
         if not iso_date and "today" in lu_last:
@@ -329,50 +355,25 @@ async def interpret(req: ChatRequest) -> InterpretResponse:
 
         # Title from common splits or “call it …”
         title = "Workout"
-        if re.search(r"\bpull\b", lu_last) or re.search(r"\bpull\b", lu_full):
-            title = "Pull Day"
-        elif re.search(r"\bpush\b", lu_last) or re.search(r"\bpush\b", lu_full):
-            title = "Push Day"
-        elif re.search(r"\bleg(s)?\b", lu_last) or re.search(r"\bleg(s)?\b", lu_full):
-            title = "Leg Day"
-        elif re.search(r"\bupper\b", lu_full):
-            title = "Upper Day"
-        elif re.search(r"\blower\b", lu_full):
-            title = "Lower Day"
-        m = re.search(r"(call it|name it|title it)\s+([^\n.,;]+)", last_user, flags=re.I)
+        for split, label in SPLIT_TITLES:
+            if split in scan.splits:
+                title = label
+                break
+        m = CALL_IT_RE.search(last_user)
         if m:
             custom = m.group(2).strip()
             if custom:
                 title = custom
 
-        # Exercises (canonical names + aliases)
-        CANONICAL = {
-            "bench press": [r"\bbench( press)?\b"],
-            "incline dumbbell press": [r"\bincline( dumbbell)? press\b", r"\bincline\b"],
-            "overhead press": [r"\bohp\b", r"\boverhead press\b", r"\bshoulder press\b"],
-            "lateral raise": [r"\blateral raise(s)?\b"],
-            "barbell row": [r"\bbarbell row(s)?\b", r"\brows?\b"],
-            "dumbbell row": [r"\bdumbbell row(s)?\b"],
-            "lat pulldown": [r"\blat pull ?down(s)?\b", r"\bpull ?down(s)?\b", r"\bpulldown(s)?\b"],
-            "curl": [r"\bcurl(s)?\b", r"\bbiceps?\b"],
-            "triceps pushdown": [r"\b(triceps )?pushdown(s)?\b"],
-            "squat": [r"\bsquat(s)?\b"],
-            "deadlift": [r"\bdeadlift(s)?\b"],
-            "dip": [r"\bdip(s)?\b"],
-        }
-
-        found: list[str] = []
-        for name, pats in CANONICAL.items():
-            for pat in pats:
-                if re.search(pat, lu_full, flags=re.I):
-                    found.append(name); break
+        # Exercises (canonical names + aliases, see plan_parser.CANONICAL)
+        found = scan.ordered_exercises()
 
         # Defaults if user implied a split
-        if not found and "pull" in lu_full:
+        if not found and scan.mentions_pull:
             found = ["lat pulldown", "barbell row", "curl"]
-        if not found and "push" in lu_full:
+        if not found and scan.mentions_push:
             found = ["bench press", "overhead press", "lateral raise"]
-        if not found and re.search(r"\bleg(s)?\b", lu_full):
+        if not found and "legs" in scan.splits:
             found = ["squat", "deadlift"]
 
         items = found
@@ -407,24 +408,9 @@ async def interpret(req: ChatRequest) -> InterpretResponse:
     )
 
     # upsert_sets with defaults when reps/sets not given
-    def _parse_sets_spec(item: str) -> tuple[str, Optional[int], Optional[int]]:
-        t = item.strip()
-        m = re.search(r"(\d+)\s*[xX]\s*(\d+)", t)
-        if m:
-            a, b = map(int, m.groups())
-            sets, reps = (a, b) if a <= 8 else (b, a)
-            ex = re.sub(r"\d+\s*[xX]\s*\d+", "", t).strip(" -–—")
-            return ex or t, int(reps), int(sets)
-        m = re.search(r"(\d+)\s*sets?\s*of\s*(\d+)", t, flags=re.I)
-        if m:
-            sets, reps = map(int, m.groups())
-            ex = re.sub(r"(\d+)\s*sets?\s*of\s*(\d+)", "", t, flags=re.I).strip(" -–—")
-            return ex or t, int(reps), int(sets)
-        return t, None, None
-
     sets_payload = []
     for raw in items:
-        ex, reps, sets_ct = _parse_sets_spec(raw)
+        ex, reps, sets_ct = parse_sets_spec(raw)
         sets_payload.append(
             {
                 "exercise": ex,
@@ -451,64 +437,3 @@ async def interpret(req: ChatRequest) -> InterpretResponse:
         assistant_text=f"I can add **{title}** on {iso_date}. Want me to queue that?",
         proposals=proposals,
     )
-
-@router.post("/tasks/queue", response_model=list[AITaskOut])
-def queue_tasks(items: list[AITaskCreate], db: Session = Depends(get_db)) -> list[AITaskOut]:
-    """
-    Accept one or more proposals and store them in the queue as AITask rows.
-    Returns the queued tasks.
-    """
-    out: list[AITaskOut] = []
-    for it in items:
-        task = create_ai_task(
-            db,
-            user_id=it.user_id,
-            intent=it.intent,
-            payload=it.payload,
-            summary=it.summary,
-            confidence=it.confidence,
-            requires_confirmation=it.requires_confirmation,
-            requires_super_confirmation=it.requires_super_confirmation,
-            dedupe_key=it.dedupe_key,
-        )
-        out.append(AITaskOut.model_validate(task, from_attributes=True))
-    return out
-
-
-@router.get("/tasks", response_model=list[AITaskOut])
-def list_tasks(
-    user_id: int,
-    status: str | None = None,
-    db: Session = Depends(get_db),
-) -> list[AITaskOut]:
-    """
-    List queued tasks for a user (optionally filter by status).
-    """
-    tasks = list_ai_tasks(db, user_id=user_id, status=status)
-    return [AITaskOut.model_validate(t, from_attributes=True) for t in tasks]
-
-
-@router.post("/tasks/{task_id}/approve", response_model=AITaskOut)
-def approve_task(
-    task_id: int = Path(..., ge=1),
-    db: Session = Depends(get_db),
-): 
-    t = get_ai_task(db, task_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="task not found")
-    if t.status not in ("queued", "rejected"):
-        raise HTTPException(status_code=409, detail=f"cannot approve from status '{t.status}'")
-    return update_ai_task_status(db, task_id, "approved")
-
-
-@router.post("/tasks/{task_id}/reject", response_model=AITaskOut)
-def reject_task(
-    task_id: int = Path(..., ge=1),
-    db: Session = Depends(get_db),
-):
-    t = get_ai_task(db, task_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="task not found")
-    if t.status not in ("queued", "approved"):
-        raise HTTPException(status_code=409, detail=f"cannot reject from status '{t.status}'")
-    return update_ai_task_status(db, task_id, "rejected")
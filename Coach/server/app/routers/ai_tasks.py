@@ -0,0 +1,84 @@
+# server/app/routers/ai_tasks.py
+# queue of AI proposals the user confirms before anything touches their plan
+
+# ── Third-party ────────────────────────────────────────────────────────────────
+from fastapi import APIRouter, Depends, HTTPException, Path
+from sqlalchemy.orm import Session
+
+# ── Local imports ──────────────────────────────────────────────────────────────
+from ..db.database import get_db
+from ..db import models
+from ..db.crud_ai import queue_ai_tasks, list_ai_tasks, set_ai_task_status, get_ai_task
+from ..db.crud_workouts import workouts_with_sets
+from ..schemas.ai_actions import AITaskCreate, AITaskOut, ApplyProposalsRequest
+from ..schemas.workout import WorkoutWithSets
+from ..services.task_executor import TaskError, apply_proposals
+
+router = APIRouter(prefix="/ai", tags=["AI"])
+
+@router.post("/tasks/queue", response_model=list[AITaskOut])
+def queue_tasks(items: list[AITaskCreate], db: Session = Depends(get_db)) -> list[AITaskOut]:
+    """
+    Accept one or more proposals and store them in the queue as AITask rows,
+    in one transaction. Returns one task per item; an item whose dedupe_key
+    the user already queued returns that task instead of a new one.
+    """
+    tasks = queue_ai_tasks(db, [it.model_dump() for it in items])
+    return [AITaskOut.model_validate(t) for t in tasks]
+
+
+@router.get("/tasks", response_model=list[AITaskOut])
+def list_tasks(
+    user_id: int,
+    status: str | None = None,
+    db: Session = Depends(get_db),
+) -> list[AITaskOut]:
+    """
+    List queued tasks for a user (optionally filter by status).
+    """
+    tasks = list_ai_tasks(db, user_id=user_id, status=status)
+    return [AITaskOut.model_validate(t, from_attributes=True) for t in tasks]
+
+
+@router.post("/tasks/{task_id}/approve", response_model=AITaskOut)
+def approve_task(
+    task_id: int = Path(..., ge=1),
+    db: Session = Depends(get_db),
+): 
+    t = get_ai_task(db, task_id)
+    if not t:
+        raise HTTPException(status_code=404, detail="task not found")
+    if t.status not in ("queued", "rejected", "failed"):  # failed: approve again to retry
+        raise HTTPException(status_code=409, detail=f"cannot approve from status '{t.status}'")
+    return set_ai_task_status(db, t, "approved")
+
+
+@router.post("/tasks/{task_id}/reject", response_model=AITaskOut)
+def reject_task(
+    task_id: int = Path(..., ge=1),
+    db: Session = Depends(get_db),
+):
+    t = get_ai_task(db, task_id)
+    if not t:
+        raise HTTPException(status_code=404, detail="task not found")
+    if t.status not in ("queued", "approved"):
+        raise HTTPException(status_code=409, detail=f"cannot reject from status '{t.status}'")
+    return set_ai_task_status(db, t, "rejected")
+
+
+@router.post("/proposals/apply", response_model=list[WorkoutWithSets])
+def apply_confirmed_proposals(body: ApplyProposalsRequest, db: Session = Depends(get_db)):
+    """
+    Apply confirmed proposals (e.g. add_workout + upsert_sets from interpret)
+    all-or-nothing in one transaction; an upsert_sets with workout_id 0 gets the
+    workout added just before it. Returns the created/changed workouts with sets.
+    """
+    if db.get(models.User, body.user_id) is None:
+        raise HTTPException(status_code=404, detail="user not found")
+    try:
+        ids = apply_proposals(db, body.user_id, [p.model_dump() for p in body.proposals])
+        db.commit()
+    except TaskError as e:
+        db.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
+    return workouts_with_sets(db, ids)
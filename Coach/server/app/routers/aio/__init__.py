@@ -0,0 +1,4 @@
+# server/app/routers/aio
+# async twins of the users/workouts/sets/AI-task routers, served when
+# settings.DB_ASYNC is on. Same paths, schemas and behaviour; handlers await an
+# AsyncSession instead of holding a threadpool slot for their DB time.
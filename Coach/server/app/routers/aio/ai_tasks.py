@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, HTTPException, Path
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...db import models
+from ...db.database import get_async_db
+from ...db.crud_ai import (
+    get_ai_task_async,
+    list_ai_tasks_async,
+    queue_ai_tasks_async,
+    set_ai_task_status_async,
+)
+from ...db.crud_workouts import workouts_with_sets_async
+from ...schemas.ai_actions import AITaskCreate, AITaskOut, ApplyProposalsRequest
+from ...schemas.workout import WorkoutWithSets
+from ...services import week_cache
+from ...services.task_executor import TaskError, apply_proposals
+
+router = APIRouter(prefix="/ai", tags=["AI"])
+
+
+@router.post("/tasks/queue", response_model=list[AITaskOut])
+async def queue_tasks(items: list[AITaskCreate], db: AsyncSession = Depends(get_async_db)) -> list[AITaskOut]:
+    tasks = await queue_ai_tasks_async(db, [it.model_dump() for it in items])
+    return [AITaskOut.model_validate(t) for t in tasks]
+
+
+@router.get("/tasks", response_model=list[AITaskOut])
+async def list_tasks(
+    user_id: int,
+    status: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+) -> list[AITaskOut]:
+    tasks = await list_ai_tasks_async(db, user_id=user_id, status=status)
+    return [AITaskOut.model_validate(t, from_attributes=True) for t in tasks]
+
+
+@router.post("/tasks/{task_id}/approve", response_model=AITaskOut)
+async def approve_task(task_id: int = Path(..., ge=1), db: AsyncSession = Depends(get_async_db)):
+    t = await get_ai_task_async(db, task_id)
+    if not t:
+        raise HTTPException(status_code=404, detail="task not found")
+    if t.status not in ("queued", "rejected", "failed"):  # failed: approve again to retry
+        raise HTTPException(status_code=409, detail=f"cannot approve from status '{t.status}'")
+    return await set_ai_task_status_async(db, t, "approved")
+
+
+@router.post("/tasks/{task_id}/reject", response_model=AITaskOut)
+async def reject_task(task_id: int = Path(..., ge=1), db: AsyncSession = Depends(get_async_db)):
+    t = await get_ai_task_async(db, task_id)
+    if not t:
+        raise HTTPException(status_code=404, detail="task not found")
+    if t.status not in ("queued", "approved"):
+        raise HTTPException(status_code=409, detail=f"cannot reject from status '{t.status}'")
+    return await set_ai_task_status_async(db, t, "rejected")
+
+
+@router.post("/proposals/apply", response_model=list[WorkoutWithSets])
+async def apply_confirmed_proposals(body: ApplyProposalsRequest, db: AsyncSession = Depends(get_async_db)):
+    if await db.get(models.User, body.user_id) is None:
+        raise HTTPException(status_code=404, detail="user not found")
+    try:
+        # apply_proposals is Session code; run_sync gives it this connection
+        ids = await db.run_sync(apply_proposals, body.user_id, [p.model_dump() for p in body.proposals])
+        await week_cache.acommit(db)
+    except TaskError as e:
+        await db.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
+    return await workouts_with_sets_async(db, ids)
@@ -0,0 +1,45 @@
+# ── stdlib ─────────────────────────────────────────────────────────────────────
+from datetime import date
+from typing import List, Optional
+
+# ── third-party ────────────────────────────────────────────────────────────────
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+# ── local ─────────────────────────────────────────────────────────────────────
+from ...db.database import get_async_db
+from ...schemas.analytics import AnalyticsSummary, WeeklyAnalytics
+from ...services import analytics
+from ..analytics import check_window, compute
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# the fetch awaits the driver; building the arrays (in load_sets_async) and the
+# NumPy math are CPU work, so they run in worker threads, not on the event loop.
+# weekly reads a few rollup rows and builds the body inline
+
+@router.get("/by_user/{user_id}/summary", response_model=AnalyticsSummary)
+async def exercise_summary(
+    user_id: int,
+    start: date = Query(..., description="YYYY-MM-DD"),
+    end: date = Query(..., description="YYYY-MM-DD"),
+    exercise: Optional[List[str]] = Query(None, description="only these exercises (repeatable)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    check_window(start, end)
+    sets = await analytics.load_sets_async(db, user_id, start, end)
+    return await run_in_threadpool(compute, analytics.summary, sets, start, end, exercise)
+
+@router.get("/by_user/{user_id}/weekly", response_model=WeeklyAnalytics)
+async def exercise_weekly(
+    user_id: int,
+    start: date = Query(..., description="YYYY-MM-DD"),
+    end: date = Query(..., description="YYYY-MM-DD"),
+    exercise: Optional[List[str]] = Query(None, description="only these exercises (repeatable)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    check_window(start, end)
+    rows = await analytics.load_weekly_rollups_async(db, user_id, start, end, exercise)
+    return JSONResponse(analytics.weekly_from_rollups(rows, start, end))
@@ -0,0 +1,52 @@
+# ── stdlib ─────────────────────────────────────────────────────────────────────
+from datetime import date
+from typing import Optional
+
+# ── third-party ────────────────────────────────────────────────────────────────
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# ── local ─────────────────────────────────────────────────────────────────────
+from ...db import models
+from ...db.database import get_async_db
+from ...schemas.history import HistoryImportResult
+from ...services import history, week_cache
+from ..history import Format, export_response
+
+router = APIRouter(prefix="/history", tags=["History"])
+
+# export streams off AsyncConnection.stream(); import awaits the body and
+# writes each chunk with run_sync (the same Importer as the sync router)
+
+@router.get("/by_user/{user_id}/export")
+async def export_history(
+    user_id: int,
+    format: Format = Query("ndjson"),
+    start: Optional[date] = Query(None, description="YYYY-MM-DD"),
+    end: Optional[date] = Query(None, description="YYYY-MM-DD"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if await db.get(models.User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return export_response(history.export_chunks_async(db.bind, format, user_id, start, end), user_id, format)
+
+@router.post("/by_user/{user_id}/import", response_model=HistoryImportResult)
+async def import_history(
+    user_id: int,
+    request: Request,
+    format: Format = Query("ndjson"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if await db.get(models.User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    decoder, importer = history.Decoder(format), history.Importer(user_id)
+    try:
+        async for data in request.stream():
+            if importer.add(decoder.feed(data)):
+                await db.run_sync(importer.flush)
+        importer.add(decoder.close())
+    except history.HistoryFormatError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    result = await db.run_sync(importer.finish)
+    await week_cache.acommit(db)
+    return result
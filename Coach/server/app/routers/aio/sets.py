@@ -0,0 +1,99 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...db import models, rollups, versions
+from ...db.crud_sets import bulk_insert_sets_async
+from ...db.database import get_async_db
+from ...db.pagination import PageParams, apaginate, keyset, projected_select
+from ...schemas.set import SetCreate, SetRead, SetUpdate, SetBulkCreate
+from ...services import week_cache
+from ..sets import SET_FIELDS, bulk_rows
+
+
+router = APIRouter(prefix="/sets", tags=["Sets"])
+
+@router.post("/", response_model=SetRead)
+async def create_set(payload: SetCreate, db: AsyncSession = Depends(get_async_db)):
+    # ensure workout exists
+    workout = await db.get(models.WorkoutSession, payload.workout_id)
+    if not workout:
+        raise HTTPException(status_code=404, detail="Workout not found")
+
+    new_set = models.ExerciseSet(**payload.model_dump())
+    db.add(new_set)
+    await db.run_sync(rollups.add_sets, workout.user_id, workout.scheduled_for, [new_set])
+    await db.run_sync(versions.bump, workout.user_id)
+    week_cache.touch(db, workout.user_id, [workout.scheduled_for], sets_only=True)
+    await week_cache.acommit(db)
+    await db.refresh(new_set)
+    return new_set
+
+@router.get("/", response_model=list[SetRead])
+async def list_sets(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_db)):
+    keys = (models.ExerciseSet.id,)
+    stmt = projected_select(models.ExerciseSet, page.fields, SET_FIELDS, keys)
+    stmt = keyset(stmt, keys, page.cursor)
+    return await apaginate(db, stmt, page, keys, response)
+
+@router.get("/by_workout/{workout_id}", response_model=list[SetRead])
+async def list_sets_by_workout(workout_id: int, db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(
+        select(models.ExerciseSet).where(models.ExerciseSet.workout_id == workout_id)
+    )).all()
+
+@router.get("/{set_id}", response_model=SetRead)
+async def get_set(set_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_set = await db.get(models.ExerciseSet, set_id)
+    if not db_set:
+        raise HTTPException(status_code=404, detail="Set not found")
+    return db_set
+
+@router.patch("/{set_id}", response_model=SetRead)
+async def update_set(set_id: int, payload: SetUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_set = await db.get(models.ExerciseSet, set_id)
+    if not db_set:
+        raise HTTPException(status_code=404, detail="Set not found")
+
+    for field, value in payload.model_dump(exclude_unset=True).items():
+        setattr(db_set, field, value)
+
+    # a patch can lower totals or the best e1RM: recompute the set's week
+    workout = await db.get(models.WorkoutSession, db_set.workout_id)
+    await db.run_sync(rollups.refresh_weeks, workout.user_id, [workout.scheduled_for])
+    await db.run_sync(versions.bump, workout.user_id)
+    week_cache.touch(db, workout.user_id, [workout.scheduled_for], sets_only=True)
+    await week_cache.acommit(db)
+    await db.refresh(db_set)
+    return db_set
+
+@router.delete("/{set_id}", status_code=204)
+async def delete_set(set_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_set = await db.get(models.ExerciseSet, set_id)
+    if not db_set:
+        raise HTTPException(status_code=404, detail="Set not found")
+    workout = await db.get(models.WorkoutSession, db_set.workout_id)
+    await db.delete(db_set)
+    await db.run_sync(rollups.refresh_weeks, workout.user_id, [workout.scheduled_for])
+    await db.run_sync(versions.bump, workout.user_id)
+    week_cache.touch(db, workout.user_id, [workout.scheduled_for], sets_only=True)
+    await week_cache.acommit(db)
+    return  # 204 No Content
+
+@router.post("/bulk", response_model=list[SetRead])
+async def create_sets_bulk(payload: SetBulkCreate, db: AsyncSession = Depends(get_async_db)):
+    rows = bulk_rows(payload)
+    workout = (await db.execute(
+        select(models.WorkoutSession.user_id, models.WorkoutSession.scheduled_for)
+        .where(models.WorkoutSession.id == payload.workout_id)
+    )).first()
+    if not workout:
+        raise HTTPException(status_code=404, detail="Workout not found")
+
+    # one multi-row INSERT ... RETURNING; no per-row refresh afterwards
+    made = await bulk_insert_sets_async(db, rows)
+    await db.run_sync(rollups.add_sets, workout.user_id, workout.scheduled_for, rows)
+    await db.run_sync(versions.bump, workout.user_id)
+    week_cache.touch(db, workout.user_id, [workout.scheduled_for], sets_only=True)
+    await week_cache.acommit(db)
+    return made
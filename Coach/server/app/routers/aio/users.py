@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...db import models
+from ...db.database import get_async_db
+from ...db.pagination import PageParams, apaginate, keyset, projected_select
+from ...schemas.user import UserCreate, UserRead
+from ..users import USER_FIELDS
+router = APIRouter(prefix="/users", tags=["Users"])
+
+@router.post("/", response_model=UserRead)
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(models.User.id).where(models.User.username == user.username).limit(1))
+    if db_user:
+        raise HTTPException(status_code=400, detail="Username already exists")
+    new_user = models.User(username=user.username)
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+@router.get("/", response_model=list[UserRead])
+async def list_users(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_db)):
+    keys = (models.User.id,)
+    stmt = projected_select(models.User, page.fields, USER_FIELDS, keys)
+    stmt = keyset(stmt, keys, page.cursor)
+    return await apaginate(db, stmt, page, keys, response)
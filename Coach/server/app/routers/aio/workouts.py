@@ -0,0 +1,172 @@
+# ── stdlib ─────────────────────────────────────────────────────────────────────
+from datetime import date
+
+# ── third-party ────────────────────────────────────────────────────────────────
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+# ── local ─────────────────────────────────────────────────────────────────────
+from ...db import crud_workouts, models, rollups, versions
+from ...db.database import get_async_db
+from ...db.pagination import NEXT_CURSOR_HEADER, PageParams, apaginate, keyset, projected_select
+from ...schemas.workout import WorkoutCreate, WorkoutRead, WorkoutWithSets
+from ...services import week_cache
+from ...services.week_cache import Entry
+from ..workouts import (
+    CACHE_CONTROL, RECENT_KEYS, SCHEDULE_KEYS, WORKOUT_FIELDS, WorkoutPatch, _no_fields, apply_patch, entry_response,
+    etag_for, not_modified, page_entry, rows_entry, view_key,
+)
+
+router = APIRouter(prefix="/workouts", tags=["Workouts"])
+
+W = models.WorkoutSession
+
+async def read_view(view: str, user_id: int, first: date, last: date, key: str, build) -> Entry:
+    cache = week_cache.get_week_cache()
+    return await cache.aread(view, user_id, first, last, key, build) if cache is not None else await build()
+
+@router.post("/", response_model=WorkoutRead)
+async def create_workout(workout: WorkoutCreate, db: AsyncSession = Depends(get_async_db)):
+    new_workout = W(**workout.model_dump())
+    db.add(new_workout)
+    await db.run_sync(versions.bump, new_workout.user_id)
+    week_cache.touch(db, new_workout.user_id, [new_workout.scheduled_for])
+    await week_cache.acommit(db)
+    await db.refresh(new_workout)
+    return new_workout
+
+@router.get("/", response_model=list[WorkoutRead])
+async def list_workouts(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_db)):
+    keys = (W.id,)
+    stmt = projected_select(W, page.fields, WORKOUT_FIELDS, keys)
+    stmt = keyset(stmt, keys, page.cursor)
+    return await apaginate(db, stmt, page, keys, response)
+
+@router.get("/by_user/{user_id}", response_model=list[WorkoutRead])
+async def list_workouts_by_user(
+    user_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    stmt = projected_select(W, page.fields, WORKOUT_FIELDS, RECENT_KEYS).where(W.user_id == user_id)
+    stmt = keyset(stmt, RECENT_KEYS, page.cursor, descending=True)
+    return await apaginate(db, stmt, page, RECENT_KEYS, response)
+
+@router.get("/{workout_id}/detail", response_model=WorkoutWithSets)
+async def get_workout_detail(workout_id: int, db: AsyncSession = Depends(get_async_db)):
+    workout = await db.get(W, workout_id, options=[joinedload(W.sets)])
+    if not workout:
+        raise HTTPException(status_code=404, detail="Workout not found")
+    return workout
+
+@router.get("/by_user/{user_id}/with_sets", response_model=list[WorkoutWithSets])
+async def list_user_workouts_with_sets(
+    user_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    _no_fields(page)
+    stmt = select(W).options(selectinload(W.sets)).where(W.user_id == user_id)
+    stmt = keyset(stmt, RECENT_KEYS, page.cursor, descending=True)
+    return await apaginate(db, stmt, page, RECENT_KEYS, response)
+
+@router.get("/by_user/{user_id}/range", response_model=list[WorkoutRead])
+async def list_workouts_in_range(
+    user_id: int,
+    request: Request,
+    start: date = Query(..., description="YYYY-MM-DD"),
+    end: date = Query(..., description="YYYY-MM-DD"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    version = await versions.current_async(db, user_id)
+    tag = etag_for(request, version)
+    if (cached := not_modified(request, tag)) is not None:
+        return cached
+
+    async def build() -> Entry:
+        stmt = (
+            projected_select(W, page.fields, WORKOUT_FIELDS, SCHEDULE_KEYS)
+            .where(W.user_id == user_id)
+            .where(W.scheduled_for >= start)
+            .where(W.scheduled_for <= end)
+        )
+        stmt = keyset(stmt, SCHEDULE_KEYS, page.cursor)
+        scratch = Response()
+        return page_entry(await apaginate(db, stmt, page, SCHEDULE_KEYS, scratch), scratch)
+
+    key = view_key("range", user_id, version, start, end, page.limit, page.cursor, ",".join(page.fields or ()))
+    entry = await read_view("range", user_id, start, end, key, build)
+    return entry_response(entry, {"ETag": tag, "Cache-Control": CACHE_CONTROL})
+
+@router.get("/by_user/{user_id}/on/{day}", response_model=list[WorkoutRead])
+async def list_workouts_on_day(user_id: int, day: date, db: AsyncSession = Depends(get_async_db)):
+    async def build() -> Entry:
+        return rows_entry((await db.scalars(
+            select(W)
+            .where(W.user_id == user_id)
+            .where(W.scheduled_for == day)
+            .order_by(W.started_at.asc())
+        )).all())
+
+    return entry_response(await read_view("on_day", user_id, day, day, view_key("on_day", user_id, day), build))
+
+@router.get("/by_user/{user_id}/range_with_sets", response_model=list[WorkoutWithSets])
+async def list_workouts_in_range_with_sets(
+    user_id: int,
+    request: Request,
+    start: date = Query(..., description="YYYY-MM-DD"),
+    end: date = Query(..., description="YYYY-MM-DD"),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    _no_fields(page)
+    version = await versions.current_async(db, user_id)
+    tag = etag_for(request, version)
+    if (cached := not_modified(request, tag)) is not None:
+        return cached
+
+    async def build() -> Entry:
+        body, next_cursor = await crud_workouts.range_with_sets_async(db, user_id, start, end, page.limit, page.cursor)
+        return Entry(JSONResponse(body).body, next_cursor)
+
+    key = view_key("range_with_sets", user_id, version, start, end, page.limit, page.cursor)
+    entry = await read_view("range_with_sets", user_id, start, end, key, build)
+    return entry_response(entry, {"ETag": tag, "Cache-Control": CACHE_CONTROL})
+
+@router.patch("/{workout_id}", response_model=WorkoutRead)
+@router.patch("/{workout_id}/", response_model=WorkoutRead)
+async def update_workout(
+    workout_id: int = Path(..., ge=1),
+    patch: WorkoutPatch = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    w = await db.get(W, workout_id)
+    if not w:
+        raise HTTPException(status_code=404, detail="Workout not found")
+    old_day = w.scheduled_for
+    if apply_patch(w, patch):
+        await db.run_sync(rollups.move_workout, w.user_id, old_day, w.scheduled_for)
+        await db.run_sync(versions.bump, w.user_id)
+        week_cache.touch(db, w.user_id, [old_day, w.scheduled_for])
+        await week_cache.acommit(db)
+        await db.refresh(w)
+    return w
+
+@router.delete("/{workout_id}", status_code=204)
+async def delete_workout(workout_id: int = Path(..., ge=1), db: AsyncSession = Depends(get_async_db)):
+    # sets loaded up front: the delete-orphan cascade can't lazy-load under asyncio
+    w = await db.get(W, workout_id, options=[selectinload(W.sets)])
+    if not w:
+        raise HTTPException(status_code=404, detail="Workout not found")
+    await db.delete(w)
+    await db.run_sync(rollups.refresh_weeks, w.user_id, [w.scheduled_for])
+    await db.run_sync(versions.bump, w.user_id)
+    week_cache.touch(db, w.user_id, [w.scheduled_for])
+    await week_cache.acommit(db)
+    return Response(status_code=204)
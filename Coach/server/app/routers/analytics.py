@@ -0,0 +1,59 @@
+# server/app/routers/analytics.py
+
+# ── stdlib ─────────────────────────────────────────────────────────────────────
+from datetime import date
+from typing import List, Optional
+
+# ── third-party ────────────────────────────────────────────────────────────────
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+# ── local ─────────────────────────────────────────────────────────────────────
+from ..db.database import get_db
+from ..schemas.analytics import AnalyticsSummary, WeeklyAnalytics
+from ..services import analytics
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+def check_window(start: date, end: date) -> None:
+    if end < start:
+        raise HTTPException(status_code=422, detail="end is before start")
+
+
+def compute(report, sets: analytics.SetArrays, start: date, end: date, exercise: Optional[List[str]]) -> JSONResponse:
+    if exercise:
+        sets = sets.only(exercise)
+    return JSONResponse(report(sets, start, end))
+
+
+# per-exercise totals over the window: sets, reps, tonnage, best set, best
+# e1RM, average RPE and week-over-week e1RM / RPE trends. Computed over NumPy
+# columns (services/analytics.py); response_model only documents the shape.
+@router.get("/by_user/{user_id}/summary", response_model=AnalyticsSummary)
+def exercise_summary(
+    user_id: int,
+    start: date = Query(..., description="YYYY-MM-DD"),
+    end: date = Query(..., description="YYYY-MM-DD"),
+    exercise: Optional[List[str]] = Query(None, description="only these exercises (repeatable)"),
+    db: Session = Depends(get_db),
+):
+    check_window(start, end)
+    return compute(analytics.summary, analytics.load_sets(db, user_id, start, end), start, end, exercise)
+
+
+# per exercise, one point per trained week: sets, reps, tonnage, best e1RM,
+# mean RPE. Read from the weekly_exercise_rollups table (db/rollups.py), so
+# weeks are whole: every Monday-dated week overlapping [start, end].
+@router.get("/by_user/{user_id}/weekly", response_model=WeeklyAnalytics)
+def exercise_weekly(
+    user_id: int,
+    start: date = Query(..., description="YYYY-MM-DD"),
+    end: date = Query(..., description="YYYY-MM-DD"),
+    exercise: Optional[List[str]] = Query(None, description="only these exercises (repeatable)"),
+    db: Session = Depends(get_db),
+):
+    check_window(start, end)
+    rows = analytics.load_weekly_rollups(db, user_id, start, end, exercise)
+    return JSONResponse(analytics.weekly_from_rollups(rows, start, end))
@@ -0,0 +1,70 @@
+# server/app/routers/history.py
+
+# ── stdlib ─────────────────────────────────────────────────────────────────────
+from datetime import date
+from typing import Literal, Optional
+
+# ── third-party ────────────────────────────────────────────────────────────────
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+# ── local ─────────────────────────────────────────────────────────────────────
+from ..db import models
+from ..db.database import get_db
+from ..schemas.history import HistoryImportResult
+from ..services import history
+
+router = APIRouter(prefix="/history", tags=["History"])
+
+Format = Literal["ndjson", "csv"]
+
+
+def export_response(chunks, user_id: int, fmt: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=history.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="history-{user_id}.{fmt}"'},
+    )
+
+
+# the user's whole history (or the workouts scheduled in [start, end]) as
+# NDJSON (a workout per line, with its sets) or CSV (a row per set), streamed
+# from a server-side cursor; memory stays flat however long the history is
+@router.get("/by_user/{user_id}/export")
+def export_history(
+    user_id: int,
+    format: Format = Query("ndjson"),
+    start: Optional[date] = Query(None, description="YYYY-MM-DD"),
+    end: Optional[date] = Query(None, description="YYYY-MM-DD"),
+    db: Session = Depends(get_db),
+):
+    if db.get(models.User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return export_response(history.export_chunks(db.get_bind(), format, user_id, start, end), user_id, format)
+
+
+# an export (this user's or anyone's) added to the user's history as new
+# workouts. The body is parsed as it streams in and written in chunks, all in
+# one transaction; a bad line is a 422 and nothing is kept
+@router.post("/by_user/{user_id}/import", response_model=HistoryImportResult)
+async def import_history(
+    user_id: int,
+    request: Request,
+    format: Format = Query("ndjson"),
+    db: Session = Depends(get_db),
+):
+    if await run_in_threadpool(db.get, models.User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    decoder, importer = history.Decoder(format), history.Importer(user_id)
+    try:
+        async for data in request.stream():
+            if importer.add(decoder.feed(data)):
+                await run_in_threadpool(importer.flush, db)
+        importer.add(decoder.close())
+    except history.HistoryFormatError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    result = await run_in_threadpool(importer.finish, db)
+    await run_in_threadpool(db.commit)
+    return result
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 
-from ..db import models
+from ..db import models, rollups, versions
+from ..db.crud_sets import bulk_insert_sets
 from ..db.database import get_db
+from ..db.pagination import PageParams, keyset, paginate, projected_query
 from ..schemas.set import SetCreate, SetRead, SetUpdate, SetBulkCreate
+from ..services import week_cache
 
 
 router = APIRouter(prefix="/sets", tags=["Sets"])
@@ -17,13 +20,21 @@ def create_set(payload: SetCreate, db: Session = Depends(get_db)):
 
     new_set = models.ExerciseSet(**payload.dict())
     db.add(new_set)
+    rollups.add_sets(db, workout.user_id, workout.scheduled_for, [new_set])
+    versions.bump(db, workout.user_id)
+    week_cache.touch(db, workout.user_id, [workout.scheduled_for], sets_only=True)
     db.commit()
     db.refresh(new_set)
     return new_set
 
+SET_FIELDS = ("id", "workout_id", "exercise", "reps", "weight", "rpe")
+
 @router.get("/", response_model=list[SetRead])
-def list_sets(db: Session = Depends(get_db)):
-    return db.query(models.ExerciseSet).all()
+def list_sets(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    keys = (models.ExerciseSet.id,)
+    q = projected_query(db, models.ExerciseSet, page.fields, SET_FIELDS, keys)
+    q = keyset(q, keys, page.cursor)
+    return paginate(q, page, keys, response)
 
 @router.get("/by_workout/{workout_id}", response_model=list[SetRead])
 def list_sets_by_workout(workout_id: int, db: Session = Depends(get_db)):
@@ -50,6 +61,11 @@ def update_set(set_id: int, payload: SetUpdate, db: Session = Depends(get_db)):
     for field, value in data.items():
         setattr(db_set, field, value)
 
+    # a patch can lower totals or the best e1RM: recompute the set's week
+    workout = db.get(models.WorkoutSession, db_set.workout_id)
+    rollups.refresh_weeks(db, workout.user_id, [workout.scheduled_for])
+    versions.bump(db, workout.user_id)
+    week_cache.touch(db, workout.user_id, [workout.scheduled_for], sets_only=True)
     db.commit()
     db.refresh(db_set)
     return db_set
@@ -61,32 +77,53 @@ def delete_set(set_id: int, db: Session = Depends(get_db)):
     db_set = db.query(models.ExerciseSet).get(set_id)
     if not db_set:
         raise HTTPException(status_code=404, detail="Set not found")
+    workout = db.get(models.WorkoutSession, db_set.workout_id)
     db.delete(db_set)
+    rollups.refresh_weeks(db, workout.user_id, [workout.scheduled_for])
+    versions.bump(db, workout.user_id)
+    week_cache.touch(db, workout.user_id, [workout.scheduled_for], sets_only=True)
     db.commit()
     return  # 204 No Content
 
 
+MAX_BULK_SETS = 100
+
+def bulk_rows(payload: SetBulkCreate) -> list[dict]:
+    """Expand a bulk request into exercise_sets rows, enforcing MAX_BULK_SETS."""
+    if payload.items is None and (payload.count < 1 or payload.count > MAX_BULK_SETS):
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {MAX_BULK_SETS}")
+    items = payload.expand()
+    # summed before expanding: one item with count=10**9 must not build the rows first
+    if not 1 <= sum(it.count for it in items) <= MAX_BULK_SETS:
+        raise HTTPException(status_code=400, detail=f"total sets must be between 1 and {MAX_BULK_SETS}")
+
+    return [
+        {
+            "workout_id": payload.workout_id,
+            "exercise": it.exercise,
+            "reps": it.reps,
+            "weight": it.weight,  # may be None
+            "rpe": it.rpe,
+        }
+        for it in items
+        for _ in range(it.count)
+    ]
+
 @router.post("/bulk", response_model=list[SetRead])
 def create_sets_bulk(payload: SetBulkCreate, db: Session = Depends(get_db)):
-    if payload.count < 1 or payload.count > 100:
-        raise HTTPException(status_code=400, detail="count must be between 1 and 100")
-
-    workout = db.query(models.WorkoutSession).get(payload.workout_id)
+    rows = bulk_rows(payload)
+    workout = (
+        db.query(models.WorkoutSession.user_id, models.WorkoutSession.scheduled_for)
+        .filter(models.WorkoutSession.id == payload.workout_id)
+        .first()
+    )
     if not workout:
         raise HTTPException(status_code=404, detail="Workout not found")
 
-    made = []
-    for _ in range(payload.count):
-        row = models.ExerciseSet(
-            workout_id=payload.workout_id,
-            exercise=payload.exercise,
-            reps=payload.reps,
-            weight=payload.weight,  # may be None
-        )
-        db.add(row)
-        made.append(row)
-
+    # one multi-row INSERT ... RETURNING; no per-row refresh afterwards
+    made = bulk_insert_sets(db, rows)
+    rollups.add_sets(db, workout.user_id, workout.scheduled_for, rows)
+    versions.bump(db, workout.user_id)
+    week_cache.touch(db, workout.user_id, [workout.scheduled_for], sets_only=True)
     db.commit()
-    for r in made:
-        db.refresh(r)
-    return made
\ No newline at end of file
+    return made
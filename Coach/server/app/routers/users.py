@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from ..db import models
 from ..db.database import get_db
+from ..db.pagination import PageParams, keyset, paginate, projected_query
 from ..schemas.user import UserCreate, UserRead
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -16,6 +17,12 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     db.refresh(new_user)
     return new_user
 
+USER_FIELDS = ("id", "username", "created_at")
+
 @router.get("/", response_model=list[UserRead])
-def list_users(db: Session = Depends(get_db)):
-    return db.query(models.User).all()
+def list_users(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    keys = (models.User.id,)
+    q = projected_query(db, models.User, page.fields, USER_FIELDS, keys)
+    q = keyset(q, keys, page.cursor)
+    return paginate(q, page, keys, response)
+
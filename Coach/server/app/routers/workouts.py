@@ -1,17 +1,23 @@
 # server/app/routers/workouts.py
 
 # ── stdlib ─────────────────────────────────────────────────────────────────────
+import hashlib
 from datetime import date
+from typing import Optional
 
 # ── third-party ────────────────────────────────────────────────────────────────
-from fastapi import APIRouter, Depends, HTTPException, Query, Path, Response
-from pydantic import BaseModel
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 # ── local ─────────────────────────────────────────────────────────────────────
-from ..db import models
+from ..db import crud_workouts, models, rollups, versions
 from ..db.database import get_db
+from ..db.pagination import NEXT_CURSOR_HEADER, PageParams, keyset, paginate, projected_query
 from ..schemas.workout import WorkoutCreate, WorkoutRead, WorkoutWithSets
+from ..services import week_cache
+from ..services.week_cache import Entry
 
 router = APIRouter(prefix="/workouts", tags=["Workouts"])
 
@@ -22,66 +28,168 @@ class WorkoutPatch(BaseModel):
     status: str | None = None           # e.g. "planned" | "done" | "rest"
     scheduled_for: date | None = None   # YYYY-MM-DD
 
+def apply_patch(w: models.WorkoutSession, patch: WorkoutPatch | None) -> bool:
+    """Copy the non-null patch fields onto `w`; True if anything changed."""
+    changed = False
+    if patch:
+        if patch.title is not None:
+            w.title = patch.title; changed = True
+        if patch.notes is not None:
+            w.notes = patch.notes; changed = True
+        if patch.status is not None:
+            w.status = patch.status; changed = True
+        if patch.scheduled_for is not None:
+            w.scheduled_for = patch.scheduled_for; changed = True
+    return changed
+
 # create a workout
 @router.post("/", response_model=WorkoutRead)
 def create_workout(workout: WorkoutCreate, db: Session = Depends(get_db)):
     new_workout = models.WorkoutSession(**workout.dict())
     db.add(new_workout)
+    versions.bump(db, new_workout.user_id)
+    week_cache.touch(db, new_workout.user_id, [new_workout.scheduled_for])
     db.commit()
     db.refresh(new_workout)
     return new_workout
 
+# list pages are keyset-paginated (?limit=&cursor=, next cursor in X-Next-Cursor)
+# and most accept ?fields= to select only some columns
+WORKOUT_FIELDS = ("id", "user_id", "title", "notes", "scheduled_for", "status", "started_at")
+RECENT_KEYS = (models.WorkoutSession.started_at, models.WorkoutSession.id)
+SCHEDULE_KEYS = (models.WorkoutSession.scheduled_for, models.WorkoutSession.id)
+
+def _no_fields(page: PageParams) -> None:
+    if page.fields:
+        raise HTTPException(status_code=400, detail="fields= is not supported on endpoints that include sets")
+
+# the calendar range views are polled. Their ETag is the user's data version
+# (db/versions.py) plus a digest of the path and query, so an unchanged
+# calendar costs one primary-key lookup and a 304. The version is read before
+# the data: a write landing in between leaves newer data under the older tag,
+# and the next poll replaces it. The week cache keys these views by the same
+# version, so a cached body is never older than the tag it goes out with (one
+# left behind by another worker's write, or stored before an invalidation
+# ran, just isn't found).
+CACHE_CONTROL = "private, no-cache"   # browsers may keep it, but must revalidate
+
+def etag_for(request: Request, version: int) -> str:
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    digest = hashlib.blake2b(f"{request.url.path}?{query}".encode(), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+def not_modified(request: Request, tag: str) -> Optional[Response]:
+    """A 304 for `tag` if If-None-Match already names it, else None."""
+    header = request.headers.get("if-none-match")
+    if header and (header.strip() == "*" or tag in (t.strip().removeprefix("W/") for t in header.split(","))):
+        return Response(status_code=304, headers={"ETag": tag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+# the week views (range, range_with_sets, on/{day}) are read through
+# services/week_cache.py as finished JSON; every write here, in sets.py and in
+# the task executor touch()es the days it changes, and the cached windows
+# covering them are dropped once it commits
+WORKOUT_LIST = TypeAdapter(list[WorkoutRead])
+
+def rows_entry(rows, next_cursor: Optional[str] = None) -> Entry:
+    return Entry(WORKOUT_LIST.dump_json(WORKOUT_LIST.validate_python(rows, from_attributes=True)), next_cursor)
+
+def page_entry(result, scratch: Response) -> Entry:
+    """What paginate() returned (rows, or a JSONResponse for ?fields=) as a cache entry."""
+    if isinstance(result, Response):
+        return Entry(result.body, result.headers.get(NEXT_CURSOR_HEADER))
+    return rows_entry(result, scratch.headers.get(NEXT_CURSOR_HEADER))
+
+def view_key(view: str, user_id: int, *params) -> str:
+    return ":".join(str(p) for p in (view, user_id, *params))
+
+def entry_response(entry: Entry, headers: Optional[dict] = None) -> Response:
+    out = Response(entry.body, media_type="application/json", headers=headers)
+    if entry.next_cursor:
+        out.headers[NEXT_CURSOR_HEADER] = entry.next_cursor
+    return out
+
+def read_view(view: str, user_id: int, first: date, last: date, key: str, build) -> Entry:
+    cache = week_cache.get_week_cache()
+    return cache.read(view, user_id, first, last, key, build) if cache is not None else build()
+
 # list all workouts (admin/dev convenience)
 @router.get("/", response_model=list[WorkoutRead])
-def list_workouts(db: Session = Depends(get_db)):
-    return db.query(models.WorkoutSession).all()
+def list_workouts(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    keys = (models.WorkoutSession.id,)
+    q = projected_query(db, models.WorkoutSession, page.fields, WORKOUT_FIELDS, keys)
+    q = keyset(q, keys, page.cursor)
+    return paginate(q, page, keys, response)
 
 # list workouts by user (recent first)
 @router.get("/by_user/{user_id}", response_model=list[WorkoutRead])
-def list_workouts_by_user(user_id: int, db: Session = Depends(get_db)):
-    return (
-        db.query(models.WorkoutSession)
-        .filter(models.WorkoutSession.user_id == user_id)
-        .order_by(models.WorkoutSession.started_at.desc())
-        .all()
-    )
+def list_workouts_by_user(
+    user_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+):
+    q = projected_query(db, models.WorkoutSession, page.fields, WORKOUT_FIELDS, RECENT_KEYS)
+    q = q.filter(models.WorkoutSession.user_id == user_id)
+    q = keyset(q, RECENT_KEYS, page.cursor, descending=True)
+    return paginate(q, page, RECENT_KEYS, response)
 
 # get a single workout with sets
 @router.get("/{workout_id}/detail", response_model=WorkoutWithSets)
 def get_workout_detail(workout_id: int, db: Session = Depends(get_db)):
-    # use session.get (sa 1.4+/2.0) instead of legacy query(...).get(...)
-    workout = db.get(models.WorkoutSession, workout_id)
+    # use session.get (sa 1.4+/2.0) instead of legacy query(...).get(...);
+    # sets joined in so serialization doesn't lazy-load them
+    workout = db.get(models.WorkoutSession, workout_id, options=[joinedload(models.WorkoutSession.sets)])
     if not workout:
         raise HTTPException(status_code=404, detail="Workout not found")
     return workout
 
 # list all workouts (with sets) for a user (recent first)
 @router.get("/by_user/{user_id}/with_sets", response_model=list[WorkoutWithSets])
-def list_user_workouts_with_sets(user_id: int, db: Session = Depends(get_db)):
-    return (
+def list_user_workouts_with_sets(
+    user_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    db: Session = Depends(get_db),
+):
+    _no_fields(page)
+    q = (
         db.query(models.WorkoutSession)
-        .options(joinedload(models.WorkoutSession.sets))
+        .options(selectinload(models.WorkoutSession.sets))
         .filter(models.WorkoutSession.user_id == user_id)
-        .order_by(models.WorkoutSession.started_at.desc())
-        .all()
     )
+    q = keyset(q, RECENT_KEYS, page.cursor, descending=True)
+    return paginate(q, page, RECENT_KEYS, response)
 
-# list workouts in a date range (inclusive), minimal fields
+# list workouts in a date range (inclusive), minimal fields; conditional (ETag)
 @router.get("/by_user/{user_id}/range", response_model=list[WorkoutRead])
 def list_workouts_in_range(
     user_id: int,
+    request: Request,
     start: date = Query(..., description="YYYY-MM-DD"),
     end: date = Query(..., description="YYYY-MM-DD"),
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
 ):
-    return (
-        db.query(models.WorkoutSession)
-        .filter(models.WorkoutSession.user_id == user_id)
-        .filter(models.WorkoutSession.scheduled_for >= start)
-        .filter(models.WorkoutSession.scheduled_for <= end)
-        .order_by(models.WorkoutSession.scheduled_for.asc())
-        .all()
-    )
+    version = versions.current(db, user_id)
+    tag = etag_for(request, version)
+    if (cached := not_modified(request, tag)) is not None:
+        return cached
+
+    def build() -> Entry:
+        q = (
+            projected_query(db, models.WorkoutSession, page.fields, WORKOUT_FIELDS, SCHEDULE_KEYS)
+            .filter(models.WorkoutSession.user_id == user_id)
+            .filter(models.WorkoutSession.scheduled_for >= start)
+            .filter(models.WorkoutSession.scheduled_for <= end)
+        )
+        q = keyset(q, SCHEDULE_KEYS, page.cursor)
+        scratch = Response()
+        return page_entry(paginate(q, page, SCHEDULE_KEYS, scratch), scratch)
+
+    key = view_key("range", user_id, version, start, end, page.limit, page.cursor, ",".join(page.fields or ()))
+    entry = read_view("range", user_id, start, end, key, build)
+    return entry_response(entry, {"ETag": tag, "Cache-Control": CACHE_CONTROL})
 
 # list workouts on a specific day
 @router.get("/by_user/{user_id}/on/{day}", response_model=list[WorkoutRead])
@@ -90,31 +198,42 @@ def list_workouts_on_day(
     day: date,
     db: Session = Depends(get_db),
 ):
-    return (
-        db.query(models.WorkoutSession)
-        .filter(models.WorkoutSession.user_id == user_id)
-        .filter(models.WorkoutSession.scheduled_for == day)
-        .order_by(models.WorkoutSession.started_at.asc())
-        .all()
-    )
+    def build() -> Entry:
+        return rows_entry(
+            db.query(models.WorkoutSession)
+            .filter(models.WorkoutSession.user_id == user_id)
+            .filter(models.WorkoutSession.scheduled_for == day)
+            .order_by(models.WorkoutSession.started_at.asc())
+            .all()
+        )
 
-# list workouts in a date range (inclusive) with sets joined
+    return entry_response(read_view("on_day", user_id, day, day, view_key("on_day", user_id, day), build))
+
+# list workouts in a date range (inclusive) with their sets -- the week/month
+# calendar view. Built straight from row tuples (see crud_workouts) and returned
+# as a JSONResponse; response_model only documents the shape. Conditional (ETag).
 @router.get("/by_user/{user_id}/range_with_sets", response_model=list[WorkoutWithSets])
 def list_workouts_in_range_with_sets(
     user_id: int,
+    request: Request,
     start: date = Query(..., description="YYYY-MM-DD"),
     end: date = Query(..., description="YYYY-MM-DD"),
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
 ):
-    return (
-        db.query(models.WorkoutSession)
-        .options(joinedload(models.WorkoutSession.sets))
-        .filter(models.WorkoutSession.user_id == user_id)
-        .filter(models.WorkoutSession.scheduled_for >= start)
-        .filter(models.WorkoutSession.scheduled_for <= end)
-        .order_by(models.WorkoutSession.scheduled_for.asc())
-        .all()
-    )
+    _no_fields(page)
+    version = versions.current(db, user_id)
+    tag = etag_for(request, version)
+    if (cached := not_modified(request, tag)) is not None:
+        return cached
+
+    def build() -> Entry:
+        body, next_cursor = crud_workouts.range_with_sets(db, user_id, start, end, page.limit, page.cursor)
+        return Entry(JSONResponse(body).body, next_cursor)
+
+    key = view_key("range_with_sets", user_id, version, start, end, page.limit, page.cursor)
+    entry = read_view("range_with_sets", user_id, start, end, key, build)
+    return entry_response(entry, {"ETag": tag, "Cache-Control": CACHE_CONTROL})
 
 # patch a workout (supports trailing slash too)
 # - lets the tracker mark "done", change title/notes, or move the day
@@ -129,19 +248,12 @@ def update_workout(
     if not w:
         raise HTTPException(status_code=404, detail="Workout not found")
 
-    changed = False
-    if patch:
-        if patch.title is not None:
-            w.title = patch.title; changed = True
-        if patch.notes is not None:
-            w.notes = patch.notes; changed = True
-        if patch.status is not None:
-            w.status = patch.status; changed = True
-        if patch.scheduled_for is not None:
-            w.scheduled_for = patch.scheduled_for; changed = True
-
-    if changed:
+    old_day = w.scheduled_for
+    if apply_patch(w, patch):
         db.add(w)
+        rollups.move_workout(db, w.user_id, old_day, w.scheduled_for)
+        versions.bump(db, w.user_id)
+        week_cache.touch(db, w.user_id, [old_day, w.scheduled_for])
         db.commit()
         db.refresh(w)
 
@@ -165,5 +277,8 @@ def delete_workout(
         pass
 
     db.delete(w)
+    rollups.refresh_weeks(db, w.user_id, [w.scheduled_for])
+    versions.bump(db, w.user_id)
+    week_cache.touch(db, w.user_id, [w.scheduled_for])
     db.commit()
     return Response(status_code=204)
@@ -114,6 +114,12 @@ class InterpretResponse(BaseModel):
     proposals: List[AIProposal] = []
 
 
+class ApplyProposalsRequest(BaseModel):
+    """Confirmed proposals to apply together; workout_id 0 means the workout added just before."""
+    user_id: int
+    proposals: List[AIProposal] = Field(min_length=1, max_length=50)
+
+
 # ===================== Task queue (what we actually store) =====================
 
 class AITaskCreate(BaseModel):
@@ -138,6 +144,7 @@ class AITaskOut(BaseModel):
     requires_super_confirmation: bool
     status: str
     dedupe_key: Optional[str] = None
+    result: Optional[dict] = None
     created_at: datetime 
     updated_at: datetime   
 
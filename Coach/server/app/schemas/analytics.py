@@ -0,0 +1,54 @@
+# server/app/schemas/analytics.py
+# shapes of /analytics responses (services/analytics.py builds them as dicts)
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class BestSet(BaseModel):
+    date: str
+    weight: float
+    reps: int
+    rpe: Optional[float] = None
+    e1rm: float
+
+
+class ExerciseSummary(BaseModel):
+    exercise: str
+    sets: int
+    reps: int
+    tonnage: float                       # sum of reps x weight
+    weeks_trained: int
+    best_set: Optional[BestSet] = None   # highest estimated 1RM
+    e1rm: Optional[float] = None
+    e1rm_trend: Optional[float] = None   # change in weekly best e1RM per week
+    rpe_avg: Optional[float] = None
+    rpe_trend: Optional[float] = None    # change in weekly mean RPE per week
+
+
+class AnalyticsSummary(BaseModel):
+    start: str
+    end: str
+    sets: int
+    exercises: List[ExerciseSummary]
+
+
+class WeekPoint(BaseModel):
+    week: str                            # Monday
+    sets: int
+    reps: int
+    tonnage: float
+    e1rm: Optional[float] = None
+    rpe: Optional[float] = None
+
+
+class ExerciseWeeks(BaseModel):
+    exercise: str
+    weeks: List[WeekPoint]
+
+
+class WeeklyAnalytics(BaseModel):
+    start: str
+    end: str
+    sets: int
+    exercises: List[ExerciseWeeks]
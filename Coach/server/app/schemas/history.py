@@ -0,0 +1,21 @@
+# server/app/schemas/history.py
+# one workout of a history export/import (services/history.py); ids and
+# user_id in an export are ignored on import
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from .set import SetBase
+from .workout import WorkoutBase
+
+
+class HistoryWorkout(WorkoutBase):
+    started_at: Optional[datetime] = None   # import: now when missing
+    sets: List[SetBase] = []
+
+
+class HistoryImportResult(BaseModel):
+    workouts: int
+    sets: int
+    chunks: int                             # insert batches
@@ -1,5 +1,5 @@
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
 
 # shared fields for a set
 class SetBase(BaseModel):
@@ -7,6 +7,7 @@ class SetBase(BaseModel):
     reps: int
     # weight is optional so users can leave it blank
     weight: Optional[float] = None
+    rpe: Optional[float] = None
 
 # create a single set
 class SetCreate(SetBase):
@@ -24,11 +25,34 @@ class SetUpdate(BaseModel):
     exercise: Optional[str] = None
     reps: Optional[int] = None
     weight: Optional[float] = None
+    rpe: Optional[float] = None
 
-# NEW: bulk create N sets for one exercise
-class SetBulkCreate(BaseModel):
-    workout_id: int
+# one line of a heterogeneous bulk request: `count` identical sets
+class SetBulkItem(BaseModel):
     exercise: str
     reps: int
-    count: int               # how many sets to create
+    count: int = Field(default=1, ge=1)
+    weight: Optional[float] = None
+    rpe: Optional[float] = None
+
+# bulk create: N sets for one exercise (exercise/reps/count), or any mix via `items`
+class SetBulkCreate(BaseModel):
+    workout_id: int
+    exercise: Optional[str] = None
+    reps: Optional[int] = None
+    count: Optional[int] = None      # how many sets to create
     weight: Optional[float] = None
+    rpe: Optional[float] = None
+    items: Optional[List[SetBulkItem]] = None
+
+    @model_validator(mode="after")
+    def _one_shape(self):
+        if self.items is None and (self.exercise is None or self.reps is None or self.count is None):
+            raise ValueError("give either items, or exercise + reps + count")
+        return self
+
+    def expand(self) -> List[SetBulkItem]:
+        if self.items is not None:
+            return self.items
+        return [SetBulkItem(exercise=self.exercise, reps=self.reps, count=self.count,
+                            weight=self.weight, rpe=self.rpe)]
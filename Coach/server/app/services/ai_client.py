@@ -1,16 +1,50 @@
 # server/app/services/ai_client.py
-from typing import List, Optional
+"""
+Gemini access for the /ai routes.
 
-__all__ = ["chat_with_gemini"]  # not required, but clarifies export
+`AIClient` is built once at startup (see main.py lifespan) and shared by every
+request: the SDK is imported and configured once, `GenerativeModel` handles are
+reused per system prompt, and blocking SDK calls run on a bounded thread pool
+so the event loop keeps serving other requests while Gemini thinks.
+`AIClient.stream` forwards chunks as the SDK yields them and stops the
+upstream generation as soon as the consumer goes away. Replies are served from
+an optional `ResponseCache` when an equivalent conversation was answered
+recently, and identical calls already in flight are coalesced (`SingleFlight`).
+"""
+from __future__ import annotations
 
-def chat_with_gemini(messages: List[dict], api_key: str, model_name: str) -> str:
-    # import inside to avoid import-time errors
-    import google.generativeai as genai
+import asyncio
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from threading import Event, Lock
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Protocol, Union
+
+from ..core.metrics import count_ai_tokens, observe_ai
+from .response_cache import ResponseCache, cache_key
+from .singleflight import SingleFlight, SQLiteFlightStore
+
+__all__ = [
+    "AIClient",
+    "ChatBackend",
+    "FakeBackend",
+    "GeminiBackend",
+    "LatencyStats",
+    "chat_with_gemini",
+    "get_ai_client",
+    "init_ai_client",
+    "shutdown_ai_client",
+]
+
+FALLBACK_REPLY = "sorry, i couldn’t generate a reply."
 
-    genai.configure(api_key=api_key)
 
+def split_messages(messages: List[dict]) -> tuple[Optional[str], list[dict]]:
+    """First system message -> system instruction; the rest -> Gemini `contents`."""
     system_instruction: Optional[str] = None
-    rest: list[dict] = []
+    contents: list[dict] = []
     for m in messages:
         role = m.get("role", "")
         content = (m.get("content") or "").strip()
@@ -19,20 +53,388 @@ def chat_with_gemini(messages: List[dict], api_key: str, model_name: str) -> str
                 system_instruction = content
             continue
         if content:
-            rest.append({"role": role, "content": content})
+            r = "user" if role == "user" else "model"
+            contents.append({"role": r, "parts": [{"text": content}]})
+    return system_instruction, contents
 
-    contents = []
-    for m in rest:
-        r = "user" if m["role"] == "user" else "model"
-        contents.append({"role": r, "parts": [{"text": m["content"]}]})
 
-    model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
-    resp = model.generate_content(contents)
+_CHUNK_RE = re.compile(r"\S+\s*|\s+")
 
+
+def split_chunks(text: str) -> list[str]:
+    """Word-sized pieces (with trailing whitespace) for streaming canned text."""
+    return _CHUNK_RE.findall(text)
+
+
+def _reply_text(resp) -> str:
     if getattr(resp, "text", None):
         return resp.text.strip()
     if getattr(resp, "candidates", None):
         parts = resp.candidates[0].content.parts if resp.candidates else []
         if parts and getattr(parts[0], "text", None):
             return parts[0].text.strip()
-    return "sorry, i couldn’t generate a reply."
+    return FALLBACK_REPLY
+
+
+# ── Backends (blocking; AIClient moves them off the event loop) ─────────────────
+class ChatBackend(Protocol):
+    model_name: str
+
+    def generate(self, system_instruction: Optional[str], contents: list[dict]) -> str: ...
+
+    # optional: backends without it are streamed as a single chunk
+    def stream(self, system_instruction: Optional[str], contents: list[dict], cancel: Event) -> Iterator[str]: ...
+
+
+class GeminiBackend:
+    """
+    google-generativeai, configured once; model handles cached per system prompt.
+    The SDK (grpc, protobuf, ...) is imported on the first call rather than at
+    startup, so mock/dev runs never need it and cold starts don't pay for it.
+    """
+
+    def __init__(self, api_key: str, model_name: str):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._genai = None
+        self._models: dict[Optional[str], object] = {}
+        self._lock = Lock()
+
+    def _sdk(self):
+        if self._genai is None:
+            with self._lock:
+                if self._genai is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=self.api_key)
+                    self._genai = genai
+        return self._genai
+
+    def _model(self, system_instruction: Optional[str]):
+        model = self._models.get(system_instruction)
+        if model is None:
+            genai = self._sdk()
+            with self._lock:
+                model = self._models.get(system_instruction)
+                if model is None:
+                    model = genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+                    self._models[system_instruction] = model
+        return model
+
+    def list_models(self) -> list[str]:
+        """Models that support generateContent."""
+        return [
+            m.name
+            for m in self._sdk().list_models()
+            if "generateContent" in getattr(m, "supported_generation_methods", [])
+        ]
+
+    def generate(self, system_instruction: Optional[str], contents: list[dict]) -> str:
+        resp = self._model(system_instruction).generate_content(contents)
+        count_ai_tokens(self.model_name, getattr(resp, "usage_metadata", None))
+        return _reply_text(resp)
+
+    def stream(self, system_instruction: Optional[str], contents: list[dict], cancel: Event) -> Iterator[str]:
+        resp = self._model(system_instruction).generate_content(contents, stream=True)
+        # stop pulling as soon as the caller is gone; dropping `resp` ends the
+        # underlying response stream instead of reading it to completion
+        usage = None
+        try:
+            for chunk in resp:
+                if cancel.is_set():
+                    break
+                # running totals; the last chunk carries the final counts
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                text = getattr(chunk, "text", None)
+                if text:
+                    yield text
+        finally:
+            count_ai_tokens(self.model_name, usage)
+
+
+class FakeBackend:
+    """Local stand-in for tests/benchmarks: fixed (or computed) reply after `latency` seconds."""
+
+    def __init__(
+        self,
+        reply: Union[str, Callable[[Optional[str], list[dict]], str]] = "ok",
+        latency: float = 0.0,
+        model_name: str = "fake",
+        chunk_latency: float = 0.0,
+    ):
+        self.reply = reply
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.model_name = model_name
+        self.calls = 0
+
+    def generate(self, system_instruction: Optional[str], contents: list[dict]) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if callable(self.reply):
+            return self.reply(system_instruction, contents)
+        return self.reply
+
+    def stream(self, system_instruction: Optional[str], contents: list[dict], cancel: Event) -> Iterator[str]:
+        """`latency` is time to first chunk; later words follow every `chunk_latency` seconds."""
+        self.calls += 1
+        text = self.reply(system_instruction, contents) if callable(self.reply) else self.reply
+        for i, word in enumerate(split_chunks(text)):
+            delay = self.latency if i == 0 else self.chunk_latency
+            if delay and cancel.wait(delay):
+                return
+            if cancel.is_set():
+                return
+            yield word
+
+
+# ── Metrics ────────────────────────────────────────────────────────────────────
+class LatencyStats:
+    """Call counters plus a rolling window of recent latencies (seconds)."""
+
+    def __init__(self, window: int = 512):
+        self.calls = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self._recent: deque[float] = deque(maxlen=window)
+        self._lock = Lock()
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self.total_s += seconds
+            self.max_s = max(self.max_s, seconds)
+            self._recent.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            calls, errors, total, mx = self.calls, self.errors, self.total_s, self.max_s
+
+        def pct(p: float) -> Optional[float]:
+            if not recent:
+                return None
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 2)
+
+        return {
+            "calls": calls,
+            "errors": errors,
+            "avg_ms": round(total / calls * 1000, 2) if calls else None,
+            "max_ms": round(mx * 1000, 2),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+        }
+
+
+# ── Client ─────────────────────────────────────────────────────────────────────
+class AIClient:
+    def __init__(
+        self,
+        backend: ChatBackend,
+        *,
+        max_concurrency: int = 8,
+        timeout: Optional[float] = None,
+        cache: Optional[ResponseCache] = None,
+        flights: Optional[SingleFlight] = None,
+    ):
+        self.backend = backend
+        self.timeout = timeout
+        self.cache = cache
+        self.flights = flights if flights is not None else SingleFlight()
+        self.stats = LatencyStats()
+        self.first_chunk = LatencyStats()  # streaming: time to first chunk
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ai-client")
+
+    @property
+    def model_name(self) -> str:
+        return self.backend.model_name
+
+    def _cache_key(self, messages: List[dict]) -> Optional[str]:
+        return cache_key(self.model_name, messages) if self.cache is not None else None
+
+    async def _remember(self, key: Optional[str], reply: str) -> None:
+        if self.cache is not None and key is not None and reply and reply != FALLBACK_REPLY:
+            await self.cache.aset(key, reply)
+
+    async def chat(self, messages: List[dict]) -> str:
+        """
+        Cached reply if we have one, else one completion off the event loop.
+        Identical conversations already in flight share that call.
+        """
+        key = cache_key(self.model_name, messages)
+        if self.cache is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                return cached
+
+        async def call() -> str:
+            reply = await self._generate(messages)
+            await self._remember(key, reply)
+            return reply
+
+        return await self.flights.do(key, call)
+
+    async def _generate(self, messages: List[dict]) -> str:
+        system_instruction, contents = split_messages(messages)
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            fut = loop.run_in_executor(self._executor, self.backend.generate, system_instruction, contents)
+            reply = await asyncio.wait_for(fut, self.timeout) if self.timeout else await fut
+            ok = True
+            return reply
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.stats.record(elapsed, ok=ok)
+            observe_ai(self.model_name, "chat", elapsed, ok)
+
+    async def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        """Like chat(), chunk by chunk. Only fully streamed replies are cached."""
+        key = self._cache_key(messages)
+        if key is not None:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                for piece in split_chunks(cached):
+                    yield piece
+                return
+        parts: list[str] = []
+        # closing stream() must close _stream_backend() too: that's what stops the worker
+        async with aclosing(self._stream_backend(messages)) as pieces:
+            async for piece in pieces:
+                parts.append(piece)
+                yield piece
+        await self._remember(key, "".join(parts).strip())
+
+    async def _stream_backend(self, messages: List[dict]) -> AsyncIterator[str]:
+        """
+        Yield reply chunks as the backend produces them. Closing the generator
+        (client disconnect, cancellation) signals the worker thread to stop
+        pulling from the backend.
+        """
+        system_instruction, contents = split_messages(messages)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancel = Event()
+        backend_stream = getattr(self.backend, "stream", None)
+
+        def put(item) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:  # loop already closed
+                cancel.set()
+
+        def pump() -> None:
+            try:
+                if backend_stream is None:
+                    put((self.backend.generate(system_instruction, contents), None))
+                else:
+                    for chunk in backend_stream(system_instruction, contents, cancel):
+                        if cancel.is_set():
+                            break
+                        put((chunk, None))
+                put((None, None))
+            except BaseException as e:  # surfaced on the loop side
+                put((None, e))
+
+        t0 = time.perf_counter()
+        ok = False
+        first = True
+        loop.run_in_executor(self._executor, pump)
+        try:
+            while True:
+                get = queue.get()
+                chunk, err = await (asyncio.wait_for(get, self.timeout) if self.timeout else get)
+                if err is not None:
+                    raise err
+                if chunk is None:
+                    break
+                if first:
+                    self.first_chunk.record(time.perf_counter() - t0)
+                    first = False
+                yield chunk
+            ok = True
+        except (GeneratorExit, asyncio.CancelledError):
+            ok = True  # consumer went away; not an upstream failure
+            raise
+        finally:
+            cancel.set()
+            elapsed = time.perf_counter() - t0
+            self.stats.record(elapsed, ok=ok)
+            observe_ai(self.model_name, "stream", elapsed, ok)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.flights.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+_client: Optional[AIClient] = None
+
+
+def init_ai_client(
+    backend: Optional[ChatBackend] = None,
+    cache: Optional[ResponseCache] = None,
+) -> Optional[AIClient]:
+    """
+    Build the shared client. Without an explicit backend this uses Gemini, or
+    nothing at all when AI_MOCK is set / no key is configured (routes then fall
+    back to their mock replies). The reply cache comes from AI_CACHE_* settings
+    unless one is passed in.
+    """
+    global _client
+    from ..core.config import settings
+
+    shutdown_ai_client()
+    if backend is None:
+        if settings.AI_MOCK or not settings.GEMINI_API_KEY:
+            return None
+        backend = GeminiBackend(settings.GEMINI_API_KEY, settings.AI_MODEL)
+    if cache is None and settings.AI_CACHE_ENABLED:
+        cache = ResponseCache(
+            maxsize=settings.AI_CACHE_SIZE,
+            ttl=settings.AI_CACHE_TTL,
+            sqlite_path=settings.AI_CACHE_SQLITE_PATH,
+        )
+    store = (
+        SQLiteFlightStore(settings.AI_SINGLEFLIGHT_SQLITE_PATH)
+        if settings.AI_SINGLEFLIGHT_SQLITE_PATH
+        else None
+    )
+    _client = AIClient(
+        backend,
+        max_concurrency=settings.AI_MAX_CONCURRENCY,
+        timeout=settings.AI_TIMEOUT_S,
+        cache=cache,
+        flights=SingleFlight(store, lease_s=(settings.AI_TIMEOUT_S or 60.0) + 30.0),
+    )
+    return _client
+
+
+def get_ai_client() -> Optional[AIClient]:
+    return _client
+
+
+def shutdown_ai_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+# ── Legacy sync helper ──────────────────────────────────────────────────────────
+_backends: dict[tuple[str, str], GeminiBackend] = {}
+
+
+def chat_with_gemini(messages: List[dict], api_key: str, model_name: str) -> str:
+    """Blocking one-shot call (scripts / old callers); reuses a configured backend."""
+    backend = _backends.get((api_key, model_name))
+    if backend is None:
+        backend = _backends[(api_key, model_name)] = GeminiBackend(api_key, model_name)
+    return backend.generate(*split_messages(messages))
@@ -0,0 +1,363 @@
+# server/app/services/history.py
+"""
+Streaming export and import of training history (routers/history.py).
+
+Export is one query -- workouts LEFT JOIN sets, a workout's sets together --
+read `yield_per` rows at a time on its own connection and encoded as it
+goes (`Encoder`) into body chunks of about CHUNK_BYTES:
+  ndjson  one workout per line with its sets, the range_with_sets shape
+  csv     one row per set, CSV_COLUMNS; a workout without sets is one row
+          with the set columns empty
+Nothing holds more than YIELD_PER rows plus one chunk, however long the
+history.
+
+Import takes the same formats. `Decoder` parses the body as it arrives, and
+`Importer` writes every IMPORT_CHUNK rows (workouts + sets): the workouts in
+one INSERT ... RETURNING, their sets in one executemany, plus the weekly
+rollup deltas and week-cache days. Imported workouts always get new ids; ids
+and user_id in the input are ignored (CSV rows group into workouts by
+workout_id). The whole import is one transaction: a bad line rolls it back.
+
+    python -m server.app.services.history export [--user ID] [--format csv] > dump
+    python -m server.app.services.history import --user ID [--format csv] < dump
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Iterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..db import models, rollups, versions
+from ..schemas.history import HistoryWorkout
+from . import week_cache
+
+if TYPE_CHECKING:  # async driver stack only loads with DB_ASYNC
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+__all__ = [
+    "CSV_COLUMNS",
+    "FORMATS",
+    "Decoder",
+    "Encoder",
+    "HistoryFormatError",
+    "Importer",
+    "export_chunks",
+    "export_chunks_async",
+    "export_stmt",
+    "import_stream",
+]
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+YIELD_PER = 1000            # rows per fetch while exporting
+CHUNK_BYTES = 64 * 1024     # export body chunks
+IMPORT_CHUNK = 2000         # workouts + sets per insert batch
+
+W, S = models.WorkoutSession, models.ExerciseSet
+WORKOUT_FIELDS = ("title", "notes", "scheduled_for", "status", "started_at")
+SET_FIELDS = ("exercise", "reps", "weight", "rpe")
+CSV_COLUMNS = ("workout_id", "user_id", *WORKOUT_FIELDS, "set_id", *SET_FIELDS)
+
+
+class HistoryFormatError(ValueError):
+    """An import line that can't be read."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+# ── export ─────────────────────────────────────────────────────────────────────
+def export_stmt(user_id: Optional[int] = None, start: Optional[date] = None, end: Optional[date] = None):
+    """
+    Workouts (all users, or one; optionally scheduled in [start, end]) joined
+    to their sets. One user's come in date order straight off
+    ix_workout_sessions_user_scheduled, everyone's in id order: no sort step.
+    """
+    stmt = (
+        select(W.id, W.user_id, W.title, W.notes, W.scheduled_for, W.status, W.started_at,
+               S.id, S.exercise, S.reps, S.weight, S.rpe)
+        .outerjoin(S, S.workout_id == W.id)
+    )
+    if user_id is None:
+        stmt = stmt.order_by(W.id, S.id)
+    else:
+        stmt = stmt.where(W.user_id == user_id).order_by(W.scheduled_for, W.id, S.id)
+    if start is not None:
+        stmt = stmt.where(W.scheduled_for >= start)
+    if end is not None:
+        stmt = stmt.where(W.scheduled_for <= end)
+    return stmt.execution_options(yield_per=YIELD_PER)
+
+
+class Encoder:
+    """export_stmt rows -> body chunks of about CHUNK_BYTES."""
+
+    def __init__(self, fmt: str):
+        self._buf = io.StringIO()
+        self._csv = csv.writer(self._buf, lineterminator="\n") if fmt == "csv" else None
+        self._workout: Optional[dict] = None
+        if self._csv is not None:
+            self._csv.writerow(CSV_COLUMNS)
+
+    def feed(self, row) -> Optional[bytes]:
+        wid, uid, title, notes, day, status, started_at, sid, exercise, reps, weight, rpe = row
+        if self._csv is not None:
+            self._csv.writerow((wid, uid, title, notes, _iso(day), status, _iso(started_at),
+                                sid, exercise, reps, weight, rpe))
+        else:
+            w = self._workout
+            if w is None or w["id"] != wid:
+                if w is not None:
+                    self._write(w)
+                w = self._workout = {
+                    "title": title, "notes": notes, "scheduled_for": _iso(day), "status": status,
+                    "id": wid, "user_id": uid, "started_at": _iso(started_at), "sets": [],
+                }
+            if sid is not None:
+                w["sets"].append({"exercise": exercise, "reps": reps, "weight": weight, "rpe": rpe,
+                                  "id": sid, "workout_id": wid})
+        return self._take() if self._buf.tell() >= CHUNK_BYTES else None
+
+    def close(self) -> bytes:
+        if self._workout is not None:
+            self._write(self._workout)
+            self._workout = None
+        return self._take()
+
+    def _write(self, workout: dict) -> None:
+        self._buf.write(json.dumps(workout, separators=(",", ":")))
+        self._buf.write("\n")
+
+    def _take(self) -> bytes:
+        out = self._buf.getvalue().encode()
+        self._buf.seek(0)
+        self._buf.truncate()
+        return out
+
+
+def export_chunks(engine: Engine, fmt: str, user_id: Optional[int] = None,
+                  start: Optional[date] = None, end: Optional[date] = None) -> Iterator[bytes]:
+    """The export body, streamed off a connection of its own (it outlives the request's Session)."""
+    enc = Encoder(fmt)
+    with engine.connect() as conn:
+        for row in conn.execute(export_stmt(user_id, start, end)):
+            if (chunk := enc.feed(row)) is not None:
+                yield chunk
+    if tail := enc.close():
+        yield tail
+
+
+async def export_chunks_async(engine: AsyncEngine, fmt: str, user_id: Optional[int] = None,
+                              start: Optional[date] = None, end: Optional[date] = None) -> AsyncIterator[bytes]:
+    """export_chunks on an AsyncEngine (server-side cursor via stream())."""
+    enc = Encoder(fmt)
+    async with engine.connect() as conn:
+        result = await conn.stream(export_stmt(user_id, start, end))
+        async for row in result:
+            if (chunk := enc.feed(row)) is not None:
+                yield chunk
+    if tail := enc.close():
+        yield tail
+
+
+# ── import ─────────────────────────────────────────────────────────────────────
+class Decoder:
+    """Import body bytes, in whatever pieces they arrive -> HistoryWorkouts."""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.line = 0
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()   # spreadsheets add a BOM
+        self._tail = ""                     # incomplete last line
+        self._record: Optional[str] = None  # csv: a record whose quoted field spans lines
+        self._header: Optional[list[str]] = None
+        self._group: Optional[tuple[str, dict, int]] = None   # csv: (workout_id, workout, first line)
+
+    def feed(self, data: bytes) -> list[HistoryWorkout]:
+        *lines, self._tail = (self._tail + self._text.decode(data)).split("\n")
+        return self._lines(lines)
+
+    def close(self) -> list[HistoryWorkout]:
+        rest = self._tail + self._text.decode(b"", final=True)
+        self._tail = ""
+        out = self._lines([rest] if rest else [])
+        if self._record is not None:
+            raise HistoryFormatError(self.line, "unterminated quoted field")
+        if self._group is not None:
+            out.append(self._finish_group())
+        return out
+
+    def _lines(self, lines: list[str]) -> list[HistoryWorkout]:
+        out = []
+        for line in lines:
+            self.line += 1
+            if self.fmt == "csv":
+                if (w := self._csv_line(line)) is not None:
+                    out.append(w)
+            elif line.strip():
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    raise HistoryFormatError(self.line, "invalid JSON") from None
+                out.append(_validate(data, self.line))
+        return out
+
+    def _csv_line(self, line: str) -> Optional[HistoryWorkout]:
+        record = line if self._record is None else f"{self._record}\n{line}"
+        if record.count('"') % 2:
+            self._record = record
+            return None
+        self._record = None
+        if not record.strip():
+            return None
+        values = next(csv.reader([record]))
+        if self._header is None:
+            if "workout_id" not in values:
+                raise HistoryFormatError(self.line, "header has no workout_id column")
+            self._header = values
+            return None
+        if len(values) != len(self._header):
+            raise HistoryFormatError(self.line, f"{len(values)} fields, the header has {len(self._header)}")
+        row = dict(zip(self._header, values))
+        done = None
+        if self._group is not None and self._group[0] != row["workout_id"]:
+            done = self._finish_group()
+        if self._group is None:
+            fields = {k: row[k] for k in WORKOUT_FIELDS if row.get(k)}
+            self._group = (row["workout_id"], {**fields, "sets": []}, self.line)
+        if row.get("exercise"):
+            self._group[1]["sets"].append({k: row[k] for k in SET_FIELDS if row.get(k)})
+        return done
+
+    def _finish_group(self) -> HistoryWorkout:
+        _, data, line = self._group
+        self._group = None
+        return _validate(data, line)
+
+
+def _validate(data, line: int) -> HistoryWorkout:
+    try:
+        return HistoryWorkout.model_validate(data)
+    except ValidationError as e:
+        err = e.errors()[0]
+        raise HistoryFormatError(line, f"{'.'.join(map(str, err['loc'])) or 'workout'}: {err['msg']}") from None
+
+
+def _insert_workouts(db: Session, rows: list[dict]) -> list[int]:
+    """Ids of the inserted workout_sessions rows, in input order (as crud_sets.bulk_insert_sets)."""
+    dialect = db.get_bind().dialect
+    if dialect.insert_returning and dialect.use_insertmanyvalues:
+        table = W.__table__
+        # ids are assigned in VALUES order, so sorted ids line up with `rows`
+        return sorted(db.execute(insert(table).returning(table.c.id), rows).scalars())
+    objs = [W(**r) for r in rows]
+    db.add_all(objs)
+    db.flush()
+    ids = [o.id for o in objs]
+    for o in objs:
+        db.expunge(o)
+    return ids
+
+
+class Importer:
+    """Writes decoded workouts for one user, IMPORT_CHUNK rows at a time. Doesn't commit."""
+
+    def __init__(self, user_id: int, chunk: int = IMPORT_CHUNK):
+        self.user_id = user_id
+        self.chunk = chunk
+        self.pending: list[HistoryWorkout] = []
+        self.workouts = self.sets = self.chunks = 0
+        self._rows = 0
+
+    def add(self, workouts: Iterable[HistoryWorkout]) -> bool:
+        """Queue workouts; True once a chunk is due (call flush)."""
+        for w in workouts:
+            self.pending.append(w)
+            self._rows += 1 + len(w.sets)
+        return self._rows >= self.chunk
+
+    def flush(self, db: Session) -> None:
+        if not self.pending:
+            return
+        now = datetime.utcnow()
+        ids = _insert_workouts(db, [
+            {"user_id": self.user_id, "title": w.title, "notes": w.notes, "scheduled_for": w.scheduled_for,
+             "status": w.status, "started_at": w.started_at or now}
+            for w in self.pending
+        ])
+        sets = [
+            {"workout_id": wid, "exercise": s.exercise, "reps": s.reps, "weight": s.weight, "rpe": s.rpe}
+            for wid, w in zip(ids, self.pending)
+            for s in w.sets
+        ]
+        if sets:
+            db.execute(insert(S.__table__), sets)
+        rollups.add_rows(db, self.user_id, (
+            (w.scheduled_for, s.exercise, s.reps, s.weight, s.rpe)
+            for w in self.pending if w.scheduled_for is not None
+            for s in w.sets
+        ))
+        week_cache.touch(db, self.user_id, {w.scheduled_for for w in self.pending})
+        self.workouts += len(self.pending)
+        self.sets += len(sets)
+        self.chunks += 1
+        self.pending.clear()
+        self._rows = 0
+
+    def finish(self, db: Session) -> dict:
+        """Flush the rest and bump the user's data version; the counts so far."""
+        self.flush(db)
+        if self.workouts:
+            versions.bump(db, self.user_id)
+        return {"workouts": self.workouts, "sets": self.sets, "chunks": self.chunks}
+
+
+def import_stream(db: Session, user_id: int, fmt: str, pieces: Iterable[bytes]) -> dict:
+    """Decode and write a whole body given as byte pieces. Doesn't commit."""
+    decoder, importer = Decoder(fmt), Importer(user_id)
+    for data in pieces:
+        if importer.add(decoder.feed(data)):
+            importer.flush(db)
+    importer.add(decoder.close())
+    return importer.finish(db)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from ..db.database import SessionLocal, engine
+
+    ap = argparse.ArgumentParser(description="stream training history out as NDJSON/CSV, or back in")
+    ap.add_argument("command", choices=("export", "import"))
+    ap.add_argument("--user", type=int, help="export: only this user; import: the owner (required)")
+    ap.add_argument("--format", choices=tuple(FORMATS), default="ndjson")
+    args = ap.parse_args()
+    if args.command == "export":
+        for chunk in export_chunks(engine, args.format, args.user):
+            sys.stdout.buffer.write(chunk)
+    else:
+        if args.user is None:
+            ap.error("import needs --user")
+        # a shared (WEEK_CACHE_SQLITE_PATH) week cache hears of the import
+        week_cache.init_week_cache()
+        with SessionLocal() as db:
+            try:
+                counts = import_stream(db, args.user, args.format, iter(lambda: sys.stdin.buffer.read(CHUNK_BYTES), b""))
+            except HistoryFormatError as e:
+                ap.exit(1, f"{e}\n")
+            db.commit()
+        week_cache.shutdown_week_cache()
+        print(counts, file=sys.stderr)
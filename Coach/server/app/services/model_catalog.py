@@ -0,0 +1,230 @@
+# server/app/services/model_catalog.py
+"""
+Cached catalog of text-capable models for GET /ai/models and the AI_MODEL check.
+
+Listing models is a network round trip through the Gemini SDK, so the list is
+kept for AI_MODELS_TTL_S seconds. After that the next reader still gets the
+old list right away while one background thread fetches a new one
+(stale-while-revalidate). If a refresh fails, the old list keeps being served,
+and the next attempt waits AI_MODELS_RETRY_S seconds. Only a catalog that has
+never loaded makes the caller wait (and raises CatalogUnavailable if that load
+fails).
+
+Providers are anything with `list_models() -> list[str]`: GeminiBackend in
+production, `FakeCatalogProvider` for mock mode, tests and benchmarks.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional, Protocol
+
+__all__ = [
+    "CatalogProvider",
+    "CatalogSnapshot",
+    "CatalogUnavailable",
+    "FakeCatalogProvider",
+    "ModelCatalog",
+    "check_model",
+    "get_model_catalog",
+    "init_model_catalog",
+    "shutdown_model_catalog",
+]
+
+log = logging.getLogger("server.app.model_catalog")
+
+
+class CatalogProvider(Protocol):
+    def list_models(self) -> list[str]: ...
+
+
+class CatalogUnavailable(RuntimeError):
+    """The catalog has never loaded and the provider failed again."""
+
+
+class FakeCatalogProvider:
+    """Fixed model list; `fail` makes calls raise, `latency` makes them slow."""
+
+    def __init__(self, models: Iterable[str] = ("models/fake",), latency: float = 0.0, fail: bool = False):
+        self.models = list(models)
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    def list_models(self) -> list[str]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("model listing failed")
+        return list(self.models)
+
+
+def _short(name: str) -> str:
+    """'models/gemini-1.5-flash' and 'gemini-1.5-flash' name the same model."""
+    return name.removeprefix("models/")
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    models: tuple[str, ...]
+    fetched_at: float                    # clock() of the last successful load
+    stale: bool
+    error: Optional[str] = None          # last refresh failure, if it's newer than the data
+
+    def __contains__(self, name: str) -> bool:
+        short = _short(name)
+        return any(_short(m) == short for m in self.models)
+
+
+class ModelCatalog:
+    def __init__(
+        self,
+        provider: CatalogProvider,
+        ttl: float = 3600.0,
+        retry_s: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.provider = provider
+        self.ttl = ttl
+        self.retry_s = retry_s
+        self.clock = clock
+        self._models: Optional[tuple[str, ...]] = None
+        self._fetched_at = 0.0
+        self._error: Optional[str] = None
+        self._next_try = 0.0
+        self._lock = threading.Lock()          # guards the fields above
+        self._load_lock = threading.Lock()     # one provider call at a time
+        self._refresher: Optional[threading.Thread] = None
+        self.loads = 0
+        self.failures = 0
+
+    def refresh(self) -> bool:
+        """Fetch now (blocking). False when the provider failed; old data is kept."""
+        return self._load()
+
+    def _load(self, if_empty: bool = False) -> bool:
+        with self._load_lock:
+            if if_empty and self._models is not None:
+                return True              # another caller's first load finished meanwhile
+            try:
+                models = tuple(sorted(self.provider.list_models()))
+            except Exception as e:  # noqa: BLE001 - any SDK/network error keeps the old list
+                with self._lock:
+                    self.failures += 1
+                    self._error = f"{type(e).__name__}: {e}"
+                    self._next_try = self.clock() + self.retry_s
+                log.warning("model catalog refresh failed: %s", self._error)
+                return False
+            with self._lock:
+                self.loads += 1
+                self._models = models
+                self._fetched_at = self.clock()
+                self._error = None
+                self._next_try = 0.0
+            return True
+
+    def get(self) -> CatalogSnapshot:
+        """Current list; past its TTL it's returned as-is while a refresh runs."""
+        with self._lock:
+            models, fetched_at, error = self._models, self._fetched_at, self._error
+            now = self.clock()
+            if models is None and now < self._next_try:
+                raise CatalogUnavailable(error or "model catalog unavailable")
+            expired = models is not None and now - fetched_at >= self.ttl
+            if expired and now >= self._next_try:
+                self._start_refresh()
+
+        if models is None:
+            # first load: concurrent callers wait on one provider call
+            if not self._load(if_empty=True):
+                raise CatalogUnavailable(self._error or "model catalog unavailable")
+            return self.get()
+        return CatalogSnapshot(models, fetched_at, expired, error)
+
+    def _start_refresh(self) -> None:
+        # caller holds self._lock
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._next_try = self.clock() + self.retry_s
+        self._refresher = threading.Thread(target=self._load, name="model-catalog-refresh", daemon=True)
+        self._refresher.start()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Join a background refresh, if one is running (tests/shutdown)."""
+        t = self._refresher
+        if t is not None:
+            t.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": len(self._models or ()),
+                "age_s": round(self.clock() - self._fetched_at, 1) if self._models is not None else None,
+                "loads": self.loads,
+                "failures": self.failures,
+                "last_error": self._error,
+            }
+
+
+def check_model(catalog: ModelCatalog, name: str, mode: str) -> bool:
+    """
+    AI_MODEL_CHECK: is `name` in the catalog? "warn" logs, "raise" raises
+    ValueError when the catalog loaded and the model isn't there. A catalog
+    that can't be loaded only ever warns: startup shouldn't hinge on the
+    listing endpoint.
+    """
+    if mode == "off":
+        return True
+    if mode not in ("warn", "raise"):
+        raise ValueError(f"AI_MODEL_CHECK must be off, warn or raise, not {mode!r}")
+    try:
+        snap = catalog.get()
+    except CatalogUnavailable as e:
+        log.warning("can't check AI_MODEL=%s: %s", name, e)
+        return False
+    if name in snap:
+        return True
+    msg = f"AI_MODEL={name} is not in the model catalog ({len(snap.models)} models; see GET /ai/models)"
+    if mode == "raise":
+        raise ValueError(msg)
+    log.warning(msg)
+    return False
+
+
+# ── Shared catalog ─────────────────────────────────────────────────────────────
+_catalog: Optional[ModelCatalog] = None
+
+
+def init_model_catalog(provider: Optional[CatalogProvider] = None, cfg=None) -> ModelCatalog:
+    """
+    Build the shared catalog. Without a provider it lists models through the
+    shared AI client's backend, or serves just AI_MODEL when there is no live
+    client (mock mode / no key), so /ai/models answers offline.
+    """
+    global _catalog
+    from ..core.config import settings
+    from .ai_client import get_ai_client
+
+    cfg = cfg or settings
+
+    if provider is None:
+        client = get_ai_client()
+        backend = client.backend if client is not None else None
+        if hasattr(backend, "list_models"):
+            provider = backend
+        else:
+            provider = FakeCatalogProvider([f"models/{_short(cfg.AI_MODEL)}"])
+    _catalog = ModelCatalog(provider, ttl=cfg.AI_MODELS_TTL_S, retry_s=cfg.AI_MODELS_RETRY_S)
+    return _catalog
+
+
+def get_model_catalog() -> Optional[ModelCatalog]:
+    return _catalog
+
+
+def shutdown_model_catalog() -> None:
+    global _catalog
+    _catalog = None
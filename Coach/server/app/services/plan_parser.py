@@ -0,0 +1,342 @@
+# server/app/services/plan_parser.py
+"""
+Text scanning for /ai/plan/interpret.
+
+Everything in this module is compiled once at import. `scan_text` walks the
+conversation a single time with one combined regex and reports every
+<coach_plan> block, date token, split keyword and canonical exercise it sees,
+so the router never re-scans the text per alias.
+"""
+from __future__ import annotations
+
+# ── Standard library ────────────────────────────────────────────────────────────
+from array import array
+from dataclasses import dataclass, field, replace
+from datetime import date
+from typing import Optional, Sequence
+import hashlib
+import re
+
+# ── Local imports ──────────────────────────────────────────────────────────────
+from ..core.cache import TTLCache
+from ..core.config import settings
+
+__all__ = [
+    "CANONICAL",
+    "PLAN_TEMPLATE",
+    "ScanResult",
+    "scan_text",
+    "scan_conversation",
+    "iso_from_any",
+    "parse_plan_block",
+    "parse_sets_spec",
+]
+
+PLAN_TEMPLATE = (
+    "<coach_plan>\n"
+    "name: <workout title>\n"
+    "date: YYYY-MM-DD\n"
+    "workouts:\n"
+    "1. <exercise>\n"
+    "2. <exercise>\n"
+    "</coach_plan>"
+)
+
+# ── Lexicon ────────────────────────────────────────────────────────────────────
+# canonical exercise -> alias phrases (lowercase, words separated by one space).
+# order matters: interpret() reports exercises in this order.
+CANONICAL: dict[str, tuple[str, ...]] = {
+    "bench press": ("bench", "bench press"),
+    "incline dumbbell press": ("incline", "incline press", "incline dumbbell press"),
+    "overhead press": ("ohp", "overhead press", "shoulder press"),
+    "lateral raise": ("lateral raise", "lateral raises"),
+    "barbell row": ("barbell row", "barbell rows", "row", "rows"),
+    "dumbbell row": ("dumbbell row", "dumbbell rows"),
+    "lat pulldown": (
+        "lat pulldown", "lat pulldowns", "lat pull down", "lat pull downs",
+        "pulldown", "pulldowns", "pull down", "pull downs",
+    ),
+    "curl": ("curl", "curls", "bicep", "biceps"),
+    "triceps pushdown": ("pushdown", "pushdowns", "triceps pushdown", "triceps pushdowns"),
+    "squat": ("squat", "squats"),
+    "deadlift": ("deadlift", "deadlifts"),
+    "dip": ("dip", "dips"),
+}
+
+# split keyword (whole word) -> split label used for titles/defaults
+SPLIT_WORDS: dict[str, str] = {
+    "pull": "pull",
+    "push": "push",
+    "leg": "legs",
+    "legs": "legs",
+    "upper": "upper",
+    "lower": "lower",
+}
+
+# first word -> [(remaining text after the first word, canonical name)]
+_PHRASES: dict[str, list[tuple[str, str]]] = {}
+for _name, _aliases in CANONICAL.items():
+    for _alias in _aliases:
+        _first, _, _rest = _alias.partition(" ")
+        _PHRASES.setdefault(_first, []).append((" " + _rest if _rest else "", _name))
+
+
+def _trie_pattern(words) -> str:
+    """Prefix-factored alternation: bench|bent -> ben(?:ch|t). Much cheaper for sre."""
+    tree: dict = {}
+    for w in words:
+        node = tree
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        alts = []
+        optional = "" in node
+        for ch in sorted(k for k in node if k):
+            alts.append(re.escape(ch) + emit(node[ch]))
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if optional:
+            body = "(?:" + body + ")?"
+        return body
+
+    return emit(tree)
+
+
+_WORDS = set(_PHRASES) | set(SPLIT_WORDS)
+
+# One alternation for the whole scan, run over lowercased text. Each hit is a
+# single token, so adjacent aliases ("dumbbell rows" -> dumbbell row + row) are
+# all still seen; multi-word aliases are confirmed by peeking at the text right
+# after the first word. The leading lookahead lets sre skip positions that
+# cannot start any branch without trying each one.
+_FIRST_CHARS = "<0-9" + "".join(sorted({w[0] for w in _WORDS} | {"p"}))
+_SCAN_RE = re.compile(
+    rf"(?=[{_FIRST_CHARS}])(?:"
+    r"(?P<plan><coach_plan>(?P<body>.*?)</coach_plan>)"
+    r"|(?P<iso>\b(?P<iy>\d{4})[-/](?P<im>\d{2})[-/](?P<id>\d{2})\b)"
+    r"|(?P<mdy>\b(?P<mm>\d{1,2})[-/](?P<md>\d{1,2})[-/](?P<my>\d{2,4})\b)"
+    r"|\b(?P<word>" + _trie_pattern(_WORDS) + r")\b"
+    r"|(?P<sub>pu(?:ll|sh))"
+    r")",
+    re.S,
+)
+# case-preserving block lookup, only needed when lower() changes string length
+_PLAN_RE = re.compile(r"<coach_plan>(.*?)</coach_plan>", re.I | re.S)
+
+# plan block / sets spec helpers
+_ISO_RE = re.compile(r"^\s*(\d{4})[-/](\d{2})[-/](\d{2})\s*$")
+_MDY_RE = re.compile(r"^\s*(\d{1,2})[-/](\d{1,2})[-/](\d{2,4})\s*$")
+_NAME_RE = re.compile(r"(?im)^\s*name\s*:\s*(.+)\s*$")
+_DATE_RE = re.compile(r"(?im)^\s*date\s*:\s*(.+?)\s*$")
+_WORKOUTS_RE = re.compile(r"(?im)^\s*workouts\s*:\s*$")
+_ITEM_RE = re.compile(r"^\s*\d+[\.)]\s*(.+?)\s*$")
+_SETS_X_RE = re.compile(r"(\d+)\s*[xX]\s*(\d+)")
+_SETS_OF_RE = re.compile(r"(\d+)\s*sets?\s*of\s*(\d+)", re.I)
+
+
+def _safe_date(y: int, m: int, d: int) -> Optional[str]:
+    try:
+        return date(y, m, d).isoformat()
+    except ValueError:
+        return None
+
+
+@dataclass
+class ScanResult:
+    """What one pass over the conversation found (later hits win for dates/blocks)."""
+    plan_block: Optional[str] = None
+    iso_date: Optional[str] = None      # last valid yyyy-mm-dd / yyyy/mm/dd
+    mdy_date: Optional[str] = None      # last valid mm-dd-yy(yy) / mm/dd/yy(yy)
+    exercises: set[str] = field(default_factory=set)
+    splits: set[str] = field(default_factory=set)
+    mentions_pull: bool = False         # "pull" anywhere, even inside a word
+    mentions_push: bool = False
+
+    @property
+    def date(self) -> Optional[str]:
+        # numeric m/d/y dates beat ISO dates, matching the old two-loop scan
+        return self.mdy_date or self.iso_date
+
+    def ordered_exercises(self) -> list[str]:
+        return [name for name in CANONICAL if name in self.exercises]
+
+    def copy(self) -> "ScanResult":
+        return replace(self, exercises=set(self.exercises), splits=set(self.splits))
+
+
+def scan_text(text: str, into: Optional[ScanResult] = None) -> ScanResult:
+    """
+    Single pass over `text` (case-insensitive). Pass `into` to keep accumulating on an earlier
+    result (text scanned later counts as "later" in the conversation).
+    """
+    res = into if into is not None else ScanResult()
+    low = text.lower()
+    same_len = len(low) == len(text)
+    for m in _SCAN_RE.finditer(low):
+        kind = m.lastgroup
+        if kind == "word":
+            w = m.group("word")
+            split = SPLIT_WORDS.get(w)
+            if split:
+                res.splits.add(split)
+            if "pull" in w:
+                res.mentions_pull = True
+            if "push" in w:
+                res.mentions_push = True
+            end = m.end()
+            for tail, name in _PHRASES.get(w, ()):
+                if not tail:
+                    res.exercises.add(name)
+                    continue
+                stop = end + len(tail)
+                if low.startswith(tail, end) and (
+                    stop == len(low) or not (low[stop].isalnum() or low[stop] == "_")
+                ):
+                    res.exercises.add(name)
+        elif kind == "sub":
+            if m.group("sub") == "pull":
+                res.mentions_pull = True
+            else:
+                res.mentions_push = True
+        elif kind == "plan":
+            if same_len:
+                res.plan_block = text[m.start("body"):m.end("body")]
+            else:
+                res.plan_block = _PLAN_RE.findall(text)[-1]
+        elif kind == "iso":
+            iso = _safe_date(int(m.group("iy")), int(m.group("im")), int(m.group("id")))
+            if iso:
+                res.iso_date = iso
+        elif kind == "mdy":
+            yy = int(m.group("my"))
+            if yy < 100:
+                yy += 2000
+            iso = _safe_date(yy, int(m.group("mm")), int(m.group("md")))
+            if iso:
+                res.mdy_date = iso
+    return res
+
+
+# ── Incremental conversation scanning ───────────────────────────────────────────
+# prefix key -> ScanResult for exactly those messages (treat as read-only)
+_conversation_cache = TTLCache(
+    maxsize=settings.INTERPRET_CACHE_SIZE,
+    ttl=settings.INTERPRET_CACHE_TTL,
+)
+
+
+# how many trailing messages may be new since the last cached turn (a turn is
+# usually the assistant reply plus the next user message)
+_PROBE_DEPTH = 4
+
+
+def _prefix_keys(contents: Sequence[str], first: int) -> dict[int, bytes]:
+    """
+    Cache keys for contents[:k], k in first..len(contents). Everything before
+    `first` is hashed in one C-level update, so Python work stays proportional
+    to the trailing messages rather than the whole history.
+    """
+    lengths = array("q", map(len, contents))
+    text_h = hashlib.blake2b(digest_size=16)
+    len_h = hashlib.blake2b(digest_size=8)
+    text_h.update("".join(contents[:first]).encode("utf-8", "surrogatepass"))
+    len_h.update(lengths[:first].tobytes())
+    keys = {first: text_h.digest() + len_h.digest()}
+    for k in range(first, len(contents)):
+        text_h.update(contents[k].encode("utf-8", "surrogatepass"))
+        len_h.update(lengths[k:k + 1].tobytes())
+        keys[k + 1] = text_h.digest() + len_h.digest()
+    return keys
+
+
+def scan_conversation(contents: Sequence[str]) -> ScanResult:
+    """
+    Scan a conversation, reusing the state cached for a recent prefix of it.
+
+    The client resends the whole history every turn, so usually only the one or
+    two newest messages are scanned; everything older comes from the cache.
+    Messages are scanned one by one (a <coach_plan> block must sit inside a
+    single message), so the result never depends on what was cached.
+    """
+    n = len(contents)
+    keys = _prefix_keys(contents, max(0, n - _PROBE_DEPTH))
+
+    state: Optional[ScanResult] = None
+    start = 0
+    for k in range(n, max(0, n - _PROBE_DEPTH), -1):
+        cached = _conversation_cache.get(keys[k])
+        if cached is not None:
+            state, start = cached, k
+            break
+    if start == n and state is not None:
+        return state
+
+    state = state.copy() if state is not None else ScanResult()
+    for c in contents[start:]:
+        scan_text(c, into=state)
+    _conversation_cache.set(keys[n], state)
+    return state
+
+
+def conversation_cache_stats() -> dict:
+    return _conversation_cache.stats()
+
+
+# ── <coach_plan> block parsing ──────────────────────────────────────────────────
+def iso_from_any(s: str) -> Optional[str]:
+    s = s.strip()
+    # yyyy-mm-dd or yyyy/mm/dd
+    m = _ISO_RE.match(s)
+    if m:
+        y, mm, dd = map(int, m.groups())
+        return _safe_date(y, mm, dd)
+    # mm-dd-yyyy or mm/dd/[yy|yyyy]
+    m = _MDY_RE.match(s)
+    if m:
+        mm, dd, yy = map(int, m.groups())
+        if yy < 100:
+            yy += 2000
+        return _safe_date(yy, mm, dd)
+    return None
+
+
+def parse_plan_block(block: str) -> dict:
+    s = block.replace("\r\n", "\n")
+
+    m = _NAME_RE.search(s)
+    name = m.group(1).strip() if m else None
+
+    m = _DATE_RE.search(s)
+    iso_date = iso_from_any(m.group(1)) if m else None
+
+    items: list[str] = []
+    after = _WORKOUTS_RE.split(s, maxsplit=1)
+    search_region = after[1] if len(after) == 2 else s
+    for line in search_region.split("\n"):
+        mnum = _ITEM_RE.match(line)
+        if mnum:
+            txt = mnum.group(1).strip()
+            if txt:
+                items.append(txt)
+
+    return {"name": name, "iso_date": iso_date, "items": items}
+
+
+def parse_sets_spec(item: str) -> tuple[str, Optional[int], Optional[int]]:
+    """'bench 3x5' -> ('bench', reps=5, sets=3); no spec -> (item, None, None)."""
+    t = item.strip()
+    m = _SETS_X_RE.search(t)
+    if m:
+        a, b = map(int, m.groups())
+        sets, reps = (a, b) if a <= 8 else (b, a)
+        ex = _SETS_X_RE.sub("", t).strip(" -–—")
+        return ex or t, reps, sets
+    m = _SETS_OF_RE.search(t)
+    if m:
+        sets, reps = map(int, m.groups())
+        ex = _SETS_OF_RE.sub("", t).strip(" -–—")
+        return ex or t, reps, sets
+    return t, None, None
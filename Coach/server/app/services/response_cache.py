@@ -0,0 +1,148 @@
+# server/app/services/response_cache.py
+"""
+Reply cache in front of the Gemini client.
+
+Keys are built from the model name plus a normalized copy of the system prompt
+and message history (case, unicode form, whitespace and trailing punctuation
+don't matter), so "Bench tips?" and "bench tips" share an entry. Lookups hit an
+in-memory LRU+TTL first and, when AI_CACHE_SQLITE_PATH is set, a SQLite file
+that survives restarts and is shared by every worker on the host. Async callers
+use aget()/aset(), which do the SQLite tier's I/O in a thread.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+from threading import Lock
+from typing import List, Optional
+
+from ..core.cache import TTLCache
+
+__all__ = ["ResponseCache", "SQLiteTier", "cache_key", "normalize_text"]
+
+_WS_RE = re.compile(r"\s+")
+_EDGE_PUNCT = " \t\n.!?,;:…"
+
+
+def normalize_text(text: str) -> str:
+    t = unicodedata.normalize("NFKC", text).casefold()
+    return _WS_RE.sub(" ", t).strip(_EDGE_PUNCT)
+
+
+def cache_key(model_name: str, messages: List[dict]) -> str:
+    norm = [[m.get("role", ""), normalize_text(m.get("content") or "")] for m in messages]
+    raw = json.dumps([model_name, norm], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteTier:
+    """Persistent second tier: one table, expiry checked on read."""
+
+    def __init__(self, path: str, ttl: float):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, sqlite_path: Optional[str] = None):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk = SQLiteTier(sqlite_path, ttl) if sqlite_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self._from_disk(self.disk.get(key), key)
+        return self._counted(value)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for the event loop: the SQLite tier is read in a thread."""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self._from_disk(await asyncio.to_thread(self.disk.get, key), key)
+        return self._counted(value)
+
+    def _from_disk(self, value: Optional[str], key: str) -> Optional[str]:
+        if value is not None:
+            self.memory.set(key, value)
+            with self._lock:
+                self.disk_hits += 1
+        return value
+
+    def _counted(self, value: Optional[str]) -> Optional[str]:
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def aset(self, key: str, value: str) -> None:
+        """set() for the event loop: the SQLite tier is written in a thread."""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "memory_size": len(self.memory),
+            "persistent": self.disk is not None,
+        }
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
@@ -0,0 +1,155 @@
+# server/app/services/singleflight.py
+"""
+Request coalescing for identical in-flight AI calls.
+
+`SingleFlight.do(key, fn)` runs `fn` once per key at a time: callers that
+arrive while a call for the same key is running await that call's result
+instead of starting their own. Within one process this is a dict of asyncio
+tasks. For several uvicorn workers on one host, pass a `SQLiteFlightStore`:
+the first worker takes a lease row, the others poll for the published result
+(falling back to their own call if the lease expires).
+"""
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Awaitable, Callable, Optional, Protocol
+
+__all__ = ["FlightStore", "SQLiteFlightStore", "SingleFlight"]
+
+
+class FlightStore(Protocol):
+    """Cross-process coordination; values are strings (AI replies)."""
+
+    def try_acquire(self, key: str, lease_s: float) -> bool: ...
+
+    def publish(self, key: str, value: str) -> None: ...
+
+    def fetch(self, key: str) -> tuple[bool, Optional[str]]:
+        """(still running, published value or None)"""
+        ...
+
+    def release(self, key: str) -> None: ...
+
+
+class SQLiteFlightStore:
+    """Lease table in a local SQLite file shared by all workers on the host."""
+
+    def __init__(self, path: str, result_ttl: float = 30.0):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.result_ttl = result_ttl
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS flights ("
+            " key TEXT PRIMARY KEY, value TEXT, done INTEGER NOT NULL DEFAULT 0,"
+            " expires_at REAL NOT NULL)"
+        )
+
+    def try_acquire(self, key: str, lease_s: float) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM flights WHERE key = ? AND expires_at <= ?", (key, now))
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO flights (key, done, expires_at) VALUES (?, 0, ?)",
+                    (key, now + lease_s),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cur.rowcount == 1
+
+    def publish(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE flights SET value = ?, done = 1, expires_at = ? WHERE key = ?",
+                (value, time.time() + self.result_ttl, key),
+            )
+
+    def fetch(self, key: str) -> tuple[bool, Optional[str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, done, expires_at FROM flights WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[2] <= time.time():
+            return False, None
+        return (not row[1]), (row[0] if row[1] else None)
+
+    def release(self, key: str) -> None:
+        # failed leader: drop the lease so followers retry instead of waiting it out
+        with self._lock:
+            self._conn.execute("DELETE FROM flights WHERE key = ? AND done = 0", (key,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SingleFlight:
+    def __init__(self, store: Optional[FlightStore] = None, *, lease_s: float = 90.0, poll_s: float = 0.05):
+        self.store = store
+        self.lease_s = lease_s
+        self.poll_s = poll_s
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0         # waited on a call in this process
+        self.remote_coalesced = 0  # got the result another worker published
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._lead(key, fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        # shield: one impatient caller disconnecting must not cancel the shared call
+        return await asyncio.shield(task)
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        if self.store is None:
+            self.executed += 1
+            return await fn()
+
+        # another worker holds the lease: poll for its result; an expired or
+        # released lease lets the next try_acquire succeed
+        while not await asyncio.to_thread(self.store.try_acquire, key, self.lease_s):
+            running, value = await asyncio.to_thread(self.store.fetch, key)
+            if value is not None:
+                self.remote_coalesced += 1
+                return value
+            if running:
+                await asyncio.sleep(self.poll_s)
+
+        self.executed += 1
+        try:
+            value = await fn()
+        except BaseException:
+            await asyncio.to_thread(self.store.release, key)
+            raise
+        await asyncio.to_thread(self.store.publish, key, value)
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "remote_coalesced": self.remote_coalesced,
+            "in_flight": len(self._inflight),
+            "shared_store": self.store is not None,
+        }
+
+    def close(self) -> None:
+        close = getattr(self.store, "close", None)
+        if close:
+            close()
@@ -0,0 +1,490 @@
+# server/app/services/task_executor.py
+"""
+Runs approved AI tasks against the user's plan.
+
+`apply_proposal` turns one proposal payload (add/move/edit/upsert_sets/delete/
+bulk_plan) into writes on a Session without committing; callers own the
+transaction. `apply_proposals` does a whole list (POST /ai/proposals/apply).
+It and the executor below bump the user's data version (db/versions.py) once per
+transaction; apply_proposal alone doesn't. apply_proposal does note the days it
+changes for the week-view cache (services/week_cache.py), dropped on commit.
+`TaskExecutor` picks up `approved` tasks user by user (oldest first, off
+ix_ai_tasks_user_status), applies each user's batch in one
+transaction and marks the tasks `executed` with the workout ids they touched.
+If any task in the batch fails, the batch is rolled back and replayed one task
+per transaction so only the bad task ends up `failed`.
+
+`upsert_sets` payloads from /ai/plan/interpret carry `workout_id: 0`, meaning
+"the workout created by the add_workout/bulk_plan task just before this one";
+it is resolved from that task's stored result.
+
+Runs in-process (AI_EXECUTOR_ENABLED, started from the app lifespan) or alone:
+    python -m server.app.services.task_executor [--once] [--concurrency 4]
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import date
+from threading import Lock
+from typing import Callable, Optional
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import delete, distinct, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from ..db import models, rollups, versions
+from ..db.crud_sets import bulk_insert_sets
+from . import week_cache
+from ..schemas.ai_actions import (
+    AddWorkoutPayload,
+    BulkPlanPayload,
+    DeleteWorkoutPayload,
+    EditWorkoutPayload,
+    MoveWorkoutPayload,
+    UpsertSetsPayload,
+)
+
+__all__ = ["TaskError", "TaskExecutor", "apply_proposal", "apply_proposals", "get_executor", "start_executor", "stop_executor"]
+
+log = logging.getLogger(__name__)
+
+PAYLOADS: dict[str, type[BaseModel]] = {
+    "add_workout": AddWorkoutPayload,
+    "move_workout": MoveWorkoutPayload,
+    "edit_workout": EditWorkoutPayload,
+    "upsert_sets": UpsertSetsPayload,
+    "delete_workout": DeleteWorkoutPayload,
+    "bulk_plan": BulkPlanPayload,
+}
+CREATES_WORKOUTS = ("add_workout", "bulk_plan")
+PLACEHOLDER_ID = 0
+
+
+class TaskError(ValueError):
+    """A proposal that can't be applied (bad payload, missing workout, ...)."""
+
+
+# ── applying one proposal ─────────────────────────────────────────────────────
+# `resolve` maps the workout_id: 0 placeholder to a real id; it is only called
+# when the placeholder is present.
+
+def _owned_workout(db: Session, user_id: int, workout_id: int) -> models.WorkoutSession:
+    w = db.get(models.WorkoutSession, workout_id)
+    if w is None or w.user_id != user_id:
+        raise TaskError(f"workout {workout_id} not found")
+    return w
+
+
+def _day(value: str) -> date:
+    # the payload pattern only checks the shape: 2025-02-30 gets this far
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise TaskError(f"invalid date '{value}'") from None
+
+
+def _add(db: Session, user_id: int, p: AddWorkoutPayload) -> models.WorkoutSession:
+    w = models.WorkoutSession(
+        user_id=user_id,
+        title=p.title,
+        notes=p.notes or None,
+        scheduled_for=_day(p.date),
+        status="planned",
+    )
+    db.add(w)
+    return w
+
+
+def apply_proposal(
+    db: Session,
+    user_id: int,
+    intent: str,
+    payload: dict,
+    resolve: Optional[Callable[[], int]] = None,
+) -> list[int]:
+    """Apply one proposal (flushes, doesn't commit). Returns the workout ids it touched."""
+    model = PAYLOADS.get(intent)
+    if model is None:
+        raise TaskError(f"unknown intent '{intent}'")
+    try:
+        p = model(**payload)
+    except ValidationError as e:
+        raise TaskError(f"invalid payload for '{intent}': {e.errors()[0]['msg']}")
+
+    if intent == "add_workout":
+        w = _add(db, user_id, p)
+        db.flush()
+        week_cache.touch(db, user_id, [w.scheduled_for])
+        return [w.id]
+
+    if intent == "bulk_plan":
+        made = [_add(db, user_id, AddWorkoutPayload(date=d.date, title=d.title, notes=d.notes)) for d in p.days]
+        db.flush()
+        week_cache.touch(db, user_id, [w.scheduled_for for w in made])
+        return [w.id for w in made]
+
+    workout_id = p.workout_id
+    if workout_id == PLACEHOLDER_ID:
+        if resolve is None:
+            raise TaskError("workout_id 0 needs a preceding add_workout")
+        workout_id = resolve()
+    w = _owned_workout(db, user_id, workout_id)
+
+    if intent == "move_workout":
+        old_day = w.scheduled_for
+        w.scheduled_for = _day(p.new_date)
+        rollups.move_workout(db, user_id, old_day, w.scheduled_for)
+        week_cache.touch(db, user_id, [old_day, w.scheduled_for])
+    elif intent == "edit_workout":
+        for attr in ("title", "notes", "status"):
+            value = getattr(p, attr)
+            if value is not None:
+                setattr(w, attr, value)
+        week_cache.touch(db, user_id, [w.scheduled_for])
+    elif intent == "upsert_sets":
+        if p.mode == "replace":
+            db.execute(delete(models.ExerciseSet).where(models.ExerciseSet.workout_id == w.id))
+        rows = [
+            {"workout_id": w.id, "exercise": s.exercise, "reps": s.reps, "weight": s.weight, "rpe": None}
+            for s in p.sets
+            for _ in range(s.count)
+        ]
+        bulk_insert_sets(db, rows)
+        if p.mode == "replace":
+            rollups.refresh_weeks(db, user_id, [w.scheduled_for])
+        else:
+            rollups.add_sets(db, user_id, w.scheduled_for, rows)
+        week_cache.touch(db, user_id, [w.scheduled_for], sets_only=True)
+    elif intent == "delete_workout":
+        db.execute(delete(models.ExerciseSet).where(models.ExerciseSet.workout_id == w.id))
+        db.expunge(w)
+        db.execute(delete(models.WorkoutSession).where(models.WorkoutSession.id == w.id))
+        rollups.refresh_weeks(db, user_id, [w.scheduled_for])
+        week_cache.touch(db, user_id, [w.scheduled_for])
+    db.flush()
+    return [w.id]
+
+
+def apply_proposals(db: Session, user_id: int, proposals: list[dict]) -> list[int]:
+    """
+    Apply proposals in order (flushes, doesn't commit). workout_id 0 resolves to
+    the last workout created earlier in the same list. Returns the ids of the
+    workouts created or changed and still present, first-touched order.
+    """
+    created: list[int] = []
+    touched: dict[int, None] = {}
+
+    def resolve() -> int:
+        if not created:
+            raise TaskError("workout_id 0 but no add_workout precedes it")
+        return created[-1]
+
+    for i, p in enumerate(proposals):
+        intent = p["intent"]
+        try:
+            ids = apply_proposal(db, user_id, intent, p["payload"], resolve)
+        except TaskError as e:
+            raise TaskError(f"proposal {i} ({intent}): {e}") from None
+        if intent in CREATES_WORKOUTS:
+            created.extend(ids)
+        for wid in ids:
+            if intent == "delete_workout":
+                touched.pop(wid, None)
+            else:
+                touched[wid] = None
+    if proposals:
+        versions.bump(db, user_id)
+    return list(touched)
+
+
+# ── executing queued tasks ────────────────────────────────────────────────────
+
+def _resolve_from_previous(db: Session, task: models.AITask) -> Callable[[], int]:
+    def resolve() -> int:
+        t = models.AITask
+        prev = db.execute(
+            select(t.id, t.status, t.result)
+            .where(t.user_id == task.user_id, t.intent.in_(CREATES_WORKOUTS), t.id < task.id)
+            .order_by(t.id.desc())
+            .limit(1)
+        ).first()
+        if prev is None:
+            raise TaskError("workout_id 0 but no add_workout task precedes it")
+        if prev.status != "executed" or not (prev.result or {}).get("workout_ids"):
+            raise TaskError(f"workout_id 0 refers to task {prev.id}, which is {prev.status}")
+        return prev.result["workout_ids"][-1]
+    return resolve
+
+
+def _claim(db: Session, task_id: int, status: str, result: dict) -> bool:
+    # conditional flip: a task another worker already took (or the user
+    # rejected meanwhile) updates 0 rows and is skipped
+    t = models.AITask
+    res = db.execute(
+        update(t).where(t.id == task_id, t.status == "approved").values(status=status, result=result)
+    )
+    return res.rowcount == 1
+
+
+def _execute(db: Session, task: models.AITask) -> bool:
+    if not _claim(db, task.id, "executed", {}):
+        return False
+    ids = apply_proposal(db, task.user_id, task.intent, task.payload, _resolve_from_previous(db, task))
+    db.execute(update(models.AITask).where(models.AITask.id == task.id).values(result={"workout_ids": ids}))
+    return True
+
+
+@dataclass
+class ExecutorStats:
+    executed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    retries: int = 0         # batches left for the next poll after a lock error
+    batches: int = 0
+    fallbacks: int = 0       # batches replayed task by task after a failure
+    busy_s: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for k, v in counts.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def snapshot(self) -> dict:
+        done = self.executed + self.failed
+        return {
+            "executed": self.executed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "retries": self.retries,
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+            # per worker thread; overall throughput is roughly this x concurrency
+            "tasks_per_worker_s": round(done / self.busy_s, 1) if self.busy_s else None,
+            "uptime_s": round(time.monotonic() - self.started, 1),
+        }
+
+
+class TaskExecutor:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        *,
+        concurrency: int = 4,
+        batch_size: int = 50,
+        poll_s: float = 1.0,
+    ):
+        self.session_factory = session_factory
+        self.concurrency = max(1, concurrency)
+        self.batch_size = batch_size
+        self.poll_s = poll_s
+        self.stats = ExecutorStats()
+        self._running: set[int] = set()   # users being processed in this process
+        # SQLite has a single writer: threads racing for it through busy_timeout
+        # starve each other into "database is locked", so take turns instead
+        self._sqlite_writes = Lock()
+
+    def _writing(self, db: Session):
+        return self._sqlite_writes if db.get_bind().dialect.name == "sqlite" else nullcontext()
+
+    # one user's batch (runs in a worker thread)
+    def run_user(self, user_id: int) -> int:
+        """Execute up to batch_size approved tasks of one user. Returns how many ran."""
+        t0 = time.perf_counter()
+        t = models.AITask
+        with self.session_factory() as db:
+            tasks = db.scalars(
+                select(t).where(t.user_id == user_id, t.status == "approved").order_by(t.id).limit(self.batch_size)
+            ).all()
+            if not tasks:
+                return 0
+            ids = [task.id for task in tasks]
+            try:
+                with self._writing(db):
+                    ran = sum(_execute(db, task) for task in tasks)
+                    if ran:
+                        versions.bump(db, user_id)
+                    db.commit()
+                self.stats.add(executed=ran, skipped=len(tasks) - ran, batches=1)
+            except OperationalError as e:
+                # lock/serialization trouble: nothing was applied, the tasks
+                # are still approved and the next poll picks them up again
+                db.rollback()
+                self.stats.add(retries=1)
+                log.warning("task executor: batch for user %s deferred: %s", user_id, e.orig)
+                ran = 0
+            except Exception:
+                # a TaskError, or a bug one task trips over: find that task
+                db.rollback()
+                self.stats.add(batches=1, fallbacks=1)
+                ran = self._one_by_one(ids)
+        self.stats.add(busy_s=time.perf_counter() - t0)
+        return ran
+
+    def _one_by_one(self, ids: list[int]) -> int:
+        ran = 0
+        for task_id in ids:
+            with self.session_factory() as db:
+                task = db.get(models.AITask, task_id)
+                with self._writing(db):
+                    try:
+                        ok = _execute(db, task)
+                        if ok:
+                            versions.bump(db, task.user_id)
+                        db.commit()
+                        ran += ok
+                        self.stats.add(executed=int(ok), skipped=int(not ok))
+                    except OperationalError:
+                        raise
+                    except Exception as e:
+                        db.rollback()
+                        if not isinstance(e, TaskError):
+                            log.exception("task executor: task %s crashed", task_id)
+                        # fail it rather than retry it (and hold up the user's later tasks) forever
+                        if _claim(db, task_id, "failed", {"error": str(e)}):
+                            db.commit()
+                            self.stats.add(failed=1)
+                            ran += 1
+        return ran
+
+    def pending_users(self) -> list[int]:
+        t = models.AITask
+        with self.session_factory() as db:
+            return db.scalars(select(distinct(t.user_id)).where(t.status == "approved")).all()
+
+    def run_once(self) -> int:
+        """Drain everything approved right now, single-threaded. Returns tasks run."""
+        total = 0
+        while users := self.pending_users():
+            ran = sum(self.run_user(u) for u in users)
+            total += ran
+            if not ran:
+                break
+        return total
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Poll for approved tasks until `stop` is set; up to `concurrency` users at once."""
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def one(user_id: int) -> None:
+            async with sem:
+                try:
+                    await asyncio.to_thread(self.run_user, user_id)
+                except Exception:
+                    log.exception("task executor: batch for user %s crashed", user_id)
+                finally:
+                    self._running.discard(user_id)
+
+        pending: set[asyncio.Task] = set()
+        while not stop.is_set():
+            try:
+                users = [u for u in await asyncio.to_thread(self.pending_users) if u not in self._running]
+            except Exception:
+                log.exception("task executor: poll failed")
+                users = []
+            for u in users:
+                self._running.add(u)
+                job = asyncio.ensure_future(one(u))
+                pending.add(job)
+                job.add_done_callback(pending.discard)
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_s)
+            except asyncio.TimeoutError:
+                pass
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+# ── in-process worker (app lifespan) ──────────────────────────────────────────
+_executor: Optional[TaskExecutor] = None
+_worker: Optional[asyncio.Task] = None
+_stop: Optional[asyncio.Event] = None
+
+
+def get_executor() -> Optional[TaskExecutor]:
+    return _executor
+
+
+def start_executor(session_factory: Optional[Callable[[], Session]] = None) -> TaskExecutor:
+    global _executor, _worker, _stop
+    from ..core.config import settings
+    from ..db.database import SessionLocal
+
+    _executor = TaskExecutor(
+        session_factory or SessionLocal,
+        concurrency=settings.AI_EXECUTOR_CONCURRENCY,
+        batch_size=settings.AI_EXECUTOR_BATCH_SIZE,
+        poll_s=settings.AI_EXECUTOR_POLL_S,
+    )
+    _stop = asyncio.Event()
+    _worker = asyncio.ensure_future(_executor.run(_stop))
+    return _executor
+
+
+async def stop_executor() -> None:
+    global _worker, _stop
+    if _worker is not None:
+        _stop.set()
+        await _worker
+    _worker = _stop = None
+
+
+def main() -> None:
+    import argparse
+
+    from ..core.config import settings
+    from ..db.database import SessionLocal
+
+    ap = argparse.ArgumentParser(description="execute approved AI tasks")
+    ap.add_argument("--once", action="store_true", help="drain the current backlog and exit")
+    ap.add_argument("--concurrency", type=int, default=settings.AI_EXECUTOR_CONCURRENCY)
+    ap.add_argument("--batch-size", type=int, default=settings.AI_EXECUTOR_BATCH_SIZE)
+    ap.add_argument("--poll", type=float, default=settings.AI_EXECUTOR_POLL_S)
+    ap.add_argument("--report", type=float, default=10.0, help="seconds between throughput lines")
+    args = ap.parse_args()
+
+    # a shared (WEEK_CACHE_SQLITE_PATH) week cache hears of what this process applies
+    week_cache.init_week_cache()
+    try:
+        _serve(TaskExecutor(SessionLocal, concurrency=args.concurrency, batch_size=args.batch_size, poll_s=args.poll), args)
+    finally:
+        week_cache.shutdown_week_cache()
+
+
+def _serve(ex: TaskExecutor, args) -> None:
+    if args.once:
+        t0 = time.perf_counter()
+        n = ex.run_once()
+        dt = time.perf_counter() - t0
+        print(f"ran {n} tasks in {dt:.2f}s ({n / dt if dt else 0:.0f}/s)", ex.stats.snapshot())
+        return
+
+    async def serve() -> None:
+        stop = asyncio.Event()
+        worker = asyncio.ensure_future(ex.run(stop))
+        try:
+            last = 0
+            while True:
+                await asyncio.sleep(args.report)
+                snap = ex.stats.snapshot()
+                done = snap["executed"] + snap["failed"]
+                print(f"{(done - last) / args.report:.1f} tasks/s", snap, flush=True)
+                last = done
+        finally:
+            stop.set()
+            await worker
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print(ex.stats.snapshot())
+
+
+if __name__ == "__main__":
+    main()
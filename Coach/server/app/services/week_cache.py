@@ -0,0 +1,407 @@
+# server/app/services/week_cache.py
+"""
+Read-through cache for the calendar views: GET /workouts/by_user/{id}/range,
+/range_with_sets and /on/{day}.
+
+Entries are the finished JSON body (plus the next-page cursor), keyed by view,
+user and parameters, and remember the date window they cover. Writes
+invalidate precisely: `touch(db, user_id, days)` notes on the Session which
+days of which user a write changes, and when that Session commits, every
+cached window of the user covering one of those days is dropped
+(`sets_only=True` spares the views that don't include sets). A rolled-back
+write drops nothing.
+
+Invalidating after the commit leaves one race: a read that queried before the
+commit can finish after the invalidation and store what it saw. So each user
+has a generation that every invalidation bumps; readers note it before they
+query, and a store whose generation is outdated is refused. The ETag views
+(range, range_with_sets) also put the user's data version (db/versions.py) in
+their key, so a body can't go out under a newer ETag than its data.
+
+The stores are synchronous; aread() and acommit() (what the async routers
+commit with) run SQLiteStore calls in a thread.
+
+Stores:
+  MemoryStore  bounded LRU + TTL (core/cache.TTLCache), per process (default)
+  SQLiteStore  one SQLite file shared by every worker on the host
+               (WEEK_CACHE_SQLITE_PATH). Use it with several workers: a
+               per-process cache would never hear of other workers' writes.
+The TTL bounds how long an entry can outlive a missed invalidation (e.g. a
+process killed between commit and invalidation).
+"""
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import time
+from collections import Counter as Tally
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from threading import Lock
+from typing import Awaitable, Callable, Iterable, Optional, Protocol
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..core.cache import TTLCache
+from ..core.metrics import count_week_cache
+
+__all__ = [
+    "Entry",
+    "MemoryStore",
+    "SQLiteStore",
+    "WeekCache",
+    "acommit",
+    "get_week_cache",
+    "init_week_cache",
+    "shutdown_week_cache",
+    "touch",
+]
+
+# views that embed sets; the others survive set-only writes
+WITH_SETS = frozenset({"range_with_sets"})
+
+
+@dataclass(frozen=True)
+class Entry:
+    body: bytes                        # JSON, as sent
+    next_cursor: Optional[str] = None
+
+
+class WeekStore(Protocol):
+    def get(self, key: str) -> Optional[Entry]: ...
+    def generation(self, user_id: int) -> int: ...
+    def put(self, key: str, view: str, user_id: int, first: date, last: date, gen: int, entry: Entry) -> bool: ...
+    def invalidate(self, user_id: int, days: set[date], sets_only: bool) -> Tally: ...
+    def clear(self) -> None: ...
+    def size(self) -> int: ...
+
+
+class MemoryStore:
+    """Per-process LRU + TTL with a per-user index of the windows cached."""
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self._index: dict[int, dict[str, tuple[str, date, date]]] = {}
+        self._indexed = 0
+        self._gens: dict[int, int] = {}
+        self._lock = Lock()            # gen check + store, and invalidation, are atomic
+
+    def get(self, key: str) -> Optional[Entry]:
+        return self.entries.get(key)
+
+    def generation(self, user_id: int) -> int:
+        return self._gens.get(user_id, 0)
+
+    def put(self, key: str, view: str, user_id: int, first: date, last: date, gen: int, entry: Entry) -> bool:
+        with self._lock:
+            if self._gens.get(user_id, 0) != gen:
+                return False
+            self.entries.set(key, entry)
+            self._index.setdefault(user_id, {})[key] = (view, first, last)
+            self._indexed += 1
+            if self._indexed > 2 * self.entries.maxsize:
+                self._prune()
+        return True
+
+    def _prune(self) -> None:
+        # drop index items whose entry the LRU already evicted
+        for user_id in list(self._index):
+            keys = {k: v for k, v in self._index[user_id].items() if k in self.entries}
+            if keys:
+                self._index[user_id] = keys
+            else:
+                del self._index[user_id]
+        self._indexed = sum(len(v) for v in self._index.values())
+
+    def invalidate(self, user_id: int, days: set[date], sets_only: bool) -> Tally:
+        dropped: Tally = Tally()
+        with self._lock:
+            self._gens[user_id] = self._gens.get(user_id, 0) + 1
+            index = self._index.get(user_id, {})
+            for key, (view, first, last) in list(index.items()):
+                if sets_only and view not in WITH_SETS:
+                    continue
+                if any(first <= d <= last for d in days):
+                    del index[key]
+                    if self.entries.pop(key) is not None:
+                        dropped[view] += 1
+        return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self._index.clear()
+            self._indexed = 0
+
+    def size(self) -> int:
+        return len(self.entries)
+
+
+class SQLiteStore:
+    """One SQLite file for every worker; expiry checked on read, trimmed to about maxsize."""
+
+    TRIM_EVERY = 256    # puts between size checks
+
+    def __init__(self, path: str, maxsize: int = 4096, ttl: float = 300.0):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._puts = 0
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS week_cache ("
+            " key TEXT PRIMARY KEY, view TEXT NOT NULL, user_id INTEGER NOT NULL,"
+            " first TEXT NOT NULL, last TEXT NOT NULL,"
+            " body BLOB NOT NULL, next_cursor TEXT, expires_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS ix_week_cache_user ON week_cache (user_id, first);"
+            "CREATE TABLE IF NOT EXISTS week_cache_gen (user_id INTEGER PRIMARY KEY, gen INTEGER NOT NULL);"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, next_cursor, expires_at FROM week_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[2] <= time.time():
+            return None
+        return Entry(row[0], row[1])
+
+    def generation(self, user_id: int) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT gen FROM week_cache_gen WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def put(self, key: str, view: str, user_id: int, first: date, last: date, gen: int, entry: Entry) -> bool:
+        with self._lock:
+            # one statement: the generation check and the insert can't interleave
+            # with another worker's invalidation
+            cur = self._conn.execute(
+                "INSERT OR REPLACE INTO week_cache (key, view, user_id, first, last, body, next_cursor, expires_at)"
+                " SELECT ?, ?, ?, ?, ?, ?, ?, ?"
+                " WHERE coalesce((SELECT gen FROM week_cache_gen WHERE user_id = ?), 0) = ?",
+                (key, view, user_id, first.isoformat(), last.isoformat(), entry.body, entry.next_cursor,
+                 time.time() + self.ttl, user_id, gen),
+            )
+            self._puts += 1
+            if self._puts % self.TRIM_EVERY == 0:
+                self._trim()
+            self._conn.commit()
+        return cur.rowcount == 1
+
+    def _trim(self) -> None:
+        self._conn.execute("DELETE FROM week_cache WHERE expires_at <= ?", (time.time(),))
+        # same TTL for every entry: the soonest to expire are the oldest stores
+        self._conn.execute(
+            "DELETE FROM week_cache WHERE key IN (SELECT key FROM week_cache ORDER BY expires_at"
+            " LIMIT max(0, (SELECT count(*) FROM week_cache) - ?))",
+            (self.maxsize,),
+        )
+
+    def invalidate(self, user_id: int, days: set[date], sets_only: bool) -> Tally:
+        dropped: Tally = Tally()
+        views = " AND view IN (%s)" % ",".join("?" * len(WITH_SETS)) if sets_only else ""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO week_cache_gen (user_id, gen) VALUES (?, 1)"
+                " ON CONFLICT (user_id) DO UPDATE SET gen = gen + 1",
+                (user_id,),
+            )
+            for d in days:
+                day = d.isoformat()
+                rows = self._conn.execute(
+                    "DELETE FROM week_cache WHERE user_id = ? AND first <= ? AND last >= ?" + views
+                    + " RETURNING view",
+                    (user_id, day, day, *(sorted(WITH_SETS) if sets_only else ())),
+                ).fetchall()
+                dropped.update(r[0] for r in rows)
+            self._conn.commit()
+        return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM week_cache")
+            self._conn.commit()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM week_cache").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class WeekCache:
+    def __init__(self, store: WeekStore):
+        self.store = store
+        self.counts: Tally = Tally()    # (view, event) -> n
+        self._lock = Lock()
+
+    def _count(self, view: str, what: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[view, what] += n
+        count_week_cache(view, what, n)
+
+    def read(
+        self, view: str, user_id: int, first: date, last: date, key: str, build: Callable[[], Entry]
+    ) -> Entry:
+        """The cached entry, or build() it (and store it unless a write landed meanwhile)."""
+        gen = self.store.generation(user_id)      # before querying: see the module docstring
+        entry = self.store.get(key)
+        if entry is not None:
+            self._count(view, "hit")
+            return entry
+        self._count(view, "miss")
+        entry = build()
+        self._put(view, user_id, first, last, key, gen, entry)
+        return entry
+
+    async def aread(
+        self, view: str, user_id: int, first: date, last: date, key: str, build: Callable[[], Awaitable[Entry]]
+    ) -> Entry:
+        """read() with a coroutine builder (AsyncSession routes)."""
+        gen, entry = await self._off_loop(self._lookup, user_id, key)
+        if entry is not None:
+            self._count(view, "hit")
+            return entry
+        self._count(view, "miss")
+        entry = await build()
+        await self._off_loop(self._put, view, user_id, first, last, key, gen, entry)
+        return entry
+
+    def _lookup(self, user_id: int, key: str) -> tuple[int, Optional[Entry]]:
+        return self.store.generation(user_id), self.store.get(key)
+
+    async def _off_loop(self, fn, *args):
+        # a SQLiteStore call is file I/O and can wait out another worker's
+        # write lock: run it in a thread, as singleflight does its lease store
+        if isinstance(self.store, MemoryStore):
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    def _put(self, view: str, user_id: int, first: date, last: date, key: str, gen: int, entry: Entry) -> None:
+        stored = self.store.put(key, view, user_id, first, last, gen, entry)
+        self._count(view, "store" if stored else "refused")
+
+    def invalidate(self, user_id: int, days: Iterable[date], sets_only: bool = False) -> int:
+        days = set(days)
+        if not days:
+            return 0
+        dropped = self.store.invalidate(user_id, days, sets_only)
+        for view, n in dropped.items():
+            self._count(view, "invalidated", n)
+        return sum(dropped.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        views = sorted({v for v, _ in counts})
+        out: dict = {"size": self.store.size(), "store": type(self.store).__name__, "views": {}}
+        for v in views:
+            hits, misses = counts.get((v, "hit"), 0), counts.get((v, "miss"), 0)
+            out["views"][v] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+                "refused": counts.get((v, "refused"), 0),
+                "invalidated": counts.get((v, "invalidated"), 0),
+            }
+        hits = sum(n for (_, e), n in counts.items() if e == "hit")
+        lookups = hits + sum(n for (_, e), n in counts.items() if e == "miss")
+        out["hit_rate"] = round(hits / lookups, 4) if lookups else None
+        return out
+
+
+# ── write side: invalidate once the writer's transaction commits ───────────────
+_PENDING = "week_cache_pending"
+
+
+def touch(db, user_id: int, days: Iterable[Optional[date]], sets_only: bool = False) -> None:
+    """
+    Note that this Session's transaction changes `days` (None skipped) of the
+    user's calendar; the cached views covering them are dropped after commit.
+    Takes a Session or AsyncSession; no I/O.
+    """
+    if _cache is None:
+        return
+    session = getattr(db, "sync_session", db)
+    pending: dict = session.info.setdefault(_PENDING, {})
+    pending.setdefault((user_id, sets_only), set()).update(d for d in days if d is not None)
+
+
+_DEFERRED = "week_cache_deferred"
+
+
+def _invalidate(cache: WeekCache, pending: dict) -> None:
+    for (user_id, sets_only), days in pending.items():
+        cache.invalidate(user_id, days, sets_only)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if session.info.get(_DEFERRED) is not None:
+        session.info[_DEFERRED] = pending       # acommit() takes it from here
+    elif pending and _cache is not None:
+        _invalidate(_cache, pending)
+
+
+async def acommit(db) -> None:
+    """
+    await db.commit() for an AsyncSession, then drop what it touch()ed. The
+    after_commit event runs on the event loop; this does the invalidation
+    itself, in a thread for SQLiteStore (as aread() does its reads).
+    """
+    info = db.sync_session.info
+    info[_DEFERRED] = {}
+    try:
+        await db.commit()
+        pending = info.get(_DEFERRED)
+    finally:
+        info.pop(_DEFERRED, None)
+    if pending and _cache is not None:
+        await _cache._off_loop(_invalidate, _cache, pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+# ── Shared cache ───────────────────────────────────────────────────────────────
+_cache: Optional[WeekCache] = None
+
+
+def init_week_cache(cfg=None, store: Optional[WeekStore] = None) -> Optional[WeekCache]:
+    """Build the shared cache from WEEK_CACHE_* settings (None when disabled)."""
+    global _cache
+    from ..core.config import settings
+
+    cfg = cfg or settings
+    shutdown_week_cache()
+    if store is None:
+        if not cfg.WEEK_CACHE_ENABLED:
+            return None
+        if cfg.WEEK_CACHE_SQLITE_PATH:
+            store = SQLiteStore(cfg.WEEK_CACHE_SQLITE_PATH, cfg.WEEK_CACHE_SIZE, cfg.WEEK_CACHE_TTL_S)
+        else:
+            store = MemoryStore(cfg.WEEK_CACHE_SIZE, cfg.WEEK_CACHE_TTL_S)
+    _cache = WeekCache(store)
+    return _cache
+
+
+def get_week_cache() -> Optional[WeekCache]:
+    return _cache
+
+
+def shutdown_week_cache() -> None:
+    global _cache
+    if _cache is not None and hasattr(_cache.store, "close"):
+        _cache.store.close()
+    _cache = None
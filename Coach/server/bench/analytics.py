@@ -0,0 +1,135 @@
+# server/bench/analytics.py
+"""
+Benchmark: /analytics over one heavy user.
+
+Seeds a single user with ~100k sets (--weeks x --workouts-per-week x
+--sets-per-workout) and times, over the whole history:
+  load        services.analytics.load_sets: two Core queries -> NumPy columns
+  summary     summary() on those arrays (totals, best set, e1RM, trends)
+  weekly      weekly() on those arrays
+  rollups     what GET .../weekly does: weekly_exercise_rollups rows + JSON body
+  endpoint    load + summary + JSON body, what GET .../summary does
+  orm loop    the same per-exercise totals, e1RM and RPE from ORM ExerciseSet
+              objects in a Python loop (the baseline)
+Best of --repeat runs. Per-exercise sets/tonnage/e1RM of the two approaches
+are checked to agree, and the rollup weeks against weekly(); exits non-zero if `endpoint` misses --budget-ms.
+
+Run from Coach/:
+    python -m server.bench.analytics [--weeks 520 --workouts-per-week 6 --sets-per-workout 33 --repeat 5]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from ..app.db import models
+from ..app.db.database import make_engine
+from ..app.services import analytics
+from .seed import seed
+
+START = date(2015, 1, 5)
+
+
+def orm_loop(db: Session, user_id: int, start: date, end: date) -> dict:
+    W, S = models.WorkoutSession, models.ExerciseSet
+    rows = (
+        db.query(S, W.scheduled_for)
+        .join(W, S.workout_id == W.id)
+        .filter(W.user_id == user_id, W.scheduled_for >= start, W.scheduled_for <= end)
+        .all()
+    )
+    out: dict = defaultdict(lambda: {"sets": 0, "reps": 0, "tonnage": 0.0, "e1rm": None, "rpe": [], "weeks": defaultdict(float)})
+    for s, day in rows:
+        ex = out[" ".join(s.exercise.split()).lower()]
+        ex["sets"] += 1
+        ex["reps"] += s.reps
+        if s.weight:
+            ex["tonnage"] += s.reps * s.weight
+            if 1 <= s.reps <= analytics.E1RM_MAX_REPS:
+                e1rm = s.weight if s.reps == 1 else s.weight * (1 + s.reps / 30)
+                ex["e1rm"] = e1rm if ex["e1rm"] is None else max(ex["e1rm"], e1rm)
+                week = day - timedelta(days=day.weekday())
+                ex["weeks"][week] = max(ex["weeks"][week], e1rm)
+        if s.rpe is not None:
+            ex["rpe"].append(s.rpe)
+    db.expunge_all()
+    return out
+
+
+def best_of(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--weeks", type=int, default=520)
+    ap.add_argument("--workouts-per-week", type=int, default=6)
+    ap.add_argument("--sets-per-workout", type=int, default=33)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=1000.0, help="fail if the endpoint path is slower")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{Path(tmp) / 'analytics.db'}")
+        counts = seed(
+            engine, users=1, weeks=args.weeks, workouts_per_week=args.workouts_per_week,
+            sets_per_workout=args.sets_per_workout, start=START,
+        )
+        end = START + timedelta(weeks=args.weeks)
+        print(f"{counts['sets']} sets in {counts['workouts']} workouts, {START} .. {end}")
+
+        with Session(engine) as db:
+            uid = db.query(models.User.id).scalar()
+            t_load, arr = best_of(lambda: analytics.load_sets(db, uid, START, end), args.repeat)
+            t_sum, summary = best_of(lambda: analytics.summary(arr, START, end), args.repeat)
+            t_week, weeks = best_of(lambda: analytics.weekly(arr, START, end), args.repeat)
+            t_roll, _ = best_of(
+                lambda: json.dumps(analytics.weekly_from_rollups(
+                    analytics.load_weekly_rollups(db, uid, START, end), START, end)).encode(),
+                args.repeat,
+            )
+            from_rollups = analytics.weekly_from_rollups(analytics.load_weekly_rollups(db, uid, START, end), START, end)
+            t_end, _ = best_of(
+                lambda: json.dumps(analytics.summary(analytics.load_sets(db, uid, START, end), START, end)).encode(),
+                args.repeat,
+            )
+            t_orm, baseline = best_of(lambda: orm_loop(db, uid, START, end), max(1, args.repeat // 2))
+        engine.dispose()
+
+    for ex in summary["exercises"]:
+        b = baseline[ex["exercise"]]
+        assert ex["sets"] == b["sets"] and ex["reps"] == b["reps"], ex["exercise"]
+        assert abs(ex["tonnage"] - b["tonnage"]) < 0.1, (ex["exercise"], ex["tonnage"], b["tonnage"])
+        assert abs(ex["e1rm"] - b["e1rm"]) < 0.06, (ex["exercise"], ex["e1rm"], b["e1rm"])
+    assert len(summary["exercises"]) == len(baseline)
+    assert weeks["sets"] == from_rollups["sets"]
+    for ex, rx in zip(weeks["exercises"], from_rollups["exercises"], strict=True):
+        assert ex["exercise"] == rx["exercise"] and len(ex["weeks"]) == len(rx["weeks"]), ex["exercise"]
+        for a, b in zip(ex["weeks"], rx["weeks"]):
+            assert (a["week"], a["sets"], a["reps"]) == (b["week"], b["sets"], b["reps"]), (a, b)
+            assert abs(a["tonnage"] - b["tonnage"]) < 0.2 and abs(a["e1rm"] - b["e1rm"]) < 0.2, (a, b)
+
+    print(f"  {'load':<10} {t_load * 1000:8.1f} ms")
+    print(f"  {'summary':<10} {t_sum * 1000:8.1f} ms")
+    print(f"  {'weekly':<10} {t_week * 1000:8.1f} ms")
+    print(f"  {'rollups':<10} {t_roll * 1000:8.1f} ms   (weekly endpoint, {t_load / t_roll:.0f}x faster than load alone)")
+    print(f"  {'endpoint':<10} {t_end * 1000:8.1f} ms   (budget {args.budget_ms:.0f} ms)")
+    print(f"  {'orm loop':<10} {t_orm * 1000:8.1f} ms   ({t_orm / t_end:.1f}x the endpoint, no trends/weekly)")
+    ok = t_end * 1000 <= args.budget_ms
+    print("OK" if ok else "OVER BUDGET")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# server/bench/async_db.py
+"""
+Benchmark: sync (threadpool + Session) vs async (AsyncSession) routers.
+
+Builds the API twice on one seeded database -- routers/ with get_db and
+routers/aio with get_async_db -- and drives each in-process with N concurrent
+clients over a read-heavy mix (week range, range_with_sets, sets by workout,
+workout detail, plus 1 in 10 requests creating a set). Reports req/s and
+p50/p99 per concurrency level.
+
+Sync handlers keep their session's connection while the response is validated
+in the threadpool, so once in-flight requests outnumber pool connections the
+sync column shows pool timeouts (counted as errors) where async just queues.
+
+Run from Coach/:
+    python -m server.bench.async_db [--requests 2000 --concurrency 1,16,64,256]
+    python -m server.bench.async_db --url postgresql+psycopg://u:p@host/db
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from ..app.db import models
+from ..app.db.database import get_async_db, get_db, make_async_engine, make_engine
+from ..app.routers import ai_tasks, sets, users, workouts
+from ..app.routers.aio import ai_tasks as aai_tasks, sets as asets, users as ausers, workouts as aworkouts
+from .seed import seed
+
+USERS, WEEKS = 20, 26
+START = date(2024, 1, 1)
+
+
+def build(url: str, use_async: bool) -> tuple[FastAPI, object]:
+    """The API on `url` with either router set (mirrors main.include_routers)."""
+    app = FastAPI()
+    mods = (ausers, aworkouts, asets, aai_tasks) if use_async else (users, workouts, sets, ai_tasks)
+    for m in mods:
+        app.include_router(m.router)
+    if use_async:
+        engine = make_async_engine(url)
+        factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+        async def _db():
+            async with factory() as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = _db
+    else:
+        engine = make_engine(url)
+        factory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+        def _db():
+            db = factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = _db
+    return app, engine
+
+
+def _request(rng: random.Random, user_ids: list[int], workout_ids: list[int]) -> tuple[str, str, dict | None]:
+    uid = rng.choice(user_ids)
+    monday = START + timedelta(weeks=rng.randrange(WEEKS))
+    week = f"start={monday.isoformat()}&end={(monday + timedelta(days=6)).isoformat()}"
+    roll = rng.random()
+    if roll < 0.1:
+        return "POST", "/sets/", {"workout_id": rng.choice(workout_ids), "exercise": "squat", "reps": 5, "weight": 100.0}
+    if roll < 0.4:
+        return "GET", f"/workouts/by_user/{uid}/range?{week}", None
+    if roll < 0.7:
+        return "GET", f"/workouts/by_user/{uid}/range_with_sets?{week}", None
+    if roll < 0.85:
+        return "GET", f"/sets/by_workout/{rng.choice(workout_ids)}", None
+    return "GET", f"/workouts/{rng.choice(workout_ids)}/detail", None
+
+
+async def drive(app: FastAPI, n_requests: int, concurrency: int, user_ids, workout_ids) -> dict:
+    rng = random.Random(concurrency)
+    queue = iter([_request(rng, user_ids, workout_ids) for _ in range(n_requests)])
+    lat: list[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://bench") as client:
+        async def worker():
+            nonlocal errors
+            for method, path, body in queue:
+                t0 = time.perf_counter()
+                r = await client.request(method, path, json=body)
+                lat.append(time.perf_counter() - t0)
+                if r.status_code >= 400:
+                    errors += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+    lat.sort()
+    return {
+        "rps": len(lat) / elapsed,
+        "p50_ms": statistics.median(lat) * 1000,
+        "p99_ms": lat[max(0, int(len(lat) * 0.99) - 1)] * 1000,
+        "errors": errors,
+    }
+
+
+async def run(url: str, n_requests: int, levels: list[int], user_ids, workout_ids) -> None:
+    for mode in ("sync", "async"):
+        app, engine = build(url, mode == "async")
+        print(mode)
+        for c in levels:
+            r = await drive(app, n_requests, c, user_ids, workout_ids)
+            print(f"  c={c:<4} {r['rps']:8.0f} req/s  p50 {r['p50_ms']:7.2f} ms  p99 {r['p99_ms']:8.2f} ms  errors {r['errors']}")
+        if mode == "async":
+            await engine.dispose()
+        else:
+            engine.dispose()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="database URL (default: temp SQLite file); bench rows are added to it")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", default="1,16,64,256")
+    args = ap.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{Path(tmp) / 'async.db'}"
+        engine = make_engine(url)
+        seed(engine, users=USERS, weeks=WEEKS, start=START)
+        with engine.connect() as conn:
+            user_ids = conn.execute(select(models.User.id)).scalars().all()
+            workout_ids = conn.execute(select(models.WorkoutSession.id)).scalars().all()
+        engine.dispose()
+        asyncio.run(run(url, args.requests, levels, user_ids, workout_ids))
+
+
+if __name__ == "__main__":
+    main()
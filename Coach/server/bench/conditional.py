@@ -0,0 +1,202 @@
+# server/bench/conditional.py
+"""
+Benchmark: polling the calendar with and without If-None-Match.
+
+Seeds --users x --weeks of history and has --clients pollers each re-read one
+(user, week) `range_with_sets` view --polls times, while a set is added for
+one of the polled users every --write-every polls, so some views really do go
+stale. Run twice: plain polling, then conditional polling that sends back the
+last ETag. Prints per run the 200/304 split, bytes received, SQL statements
+per request (polls plus the writes, which are the same in both runs), how many
+of them touched workout_sessions / exercise_sets, and poll latency.
+
+Then a sequential check: every 304 must stand for exactly what a fresh read
+returns at that moment, and every write must change the ETag. Exits non-zero
+on a stale 304.
+
+Run from Coach/:
+    python -m server.bench.conditional [--users 20 --weeks 26 --clients 8 --polls 200 --write-every 25] [--async]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from ..app.db import crud_workouts, models
+from ..app.db.database import make_engine
+from .load import build_app
+from .seed import seed
+
+START = date(2024, 1, 1)
+MAIN_TABLES = ("workout_sessions", "exercise_sets")
+
+
+class Statements:
+    def __init__(self, engine):
+        self.total = 0
+        self.main = 0
+        event.listen(engine, "before_cursor_execute", self._seen)
+
+    def _seen(self, conn, cursor, statement, params, context, executemany) -> None:
+        self.total += 1
+        self.main += any(t in statement for t in MAIN_TABLES)
+
+
+def views(rng: random.Random, users: list[int], weeks: int, n: int) -> list[tuple[int, str]]:
+    out = []
+    for _ in range(n):
+        monday = START + timedelta(weeks=rng.randrange(weeks))
+        out.append((rng.choice(users), f"start={monday}&end={monday + timedelta(days=6)}"))
+    return out
+
+
+async def poll(client, stmts: Statements, targets: dict, views_: list, polls: int, write_every: int,
+               conditional: bool, rng: random.Random) -> dict:
+    lat: list[float] = []
+    codes = {200: 0, 304: 0}
+    received = 0
+    counter = iter(range(len(views_) * polls))
+    t_before, m_before = stmts.total, stmts.main
+    writes = 0
+
+    async def client_loop(uid: int, query: str) -> None:
+        nonlocal received, writes
+        url = f"/workouts/by_user/{uid}/range_with_sets?{query}"
+        etag = None
+        for _ in range(polls):
+            if next(counter) % write_every == write_every - 1:
+                wuid = rng.choice(list(targets))
+                await client.post("/sets/", json={"workout_id": rng.choice(targets[wuid]), "exercise": "curl", "reps": 10, "weight": 15})
+                writes += 1
+            headers = {"If-None-Match": etag} if conditional and etag else {}
+            t0 = time.perf_counter()
+            r = await client.get(url, headers=headers)
+            lat.append(time.perf_counter() - t0)
+            codes[r.status_code] = codes.get(r.status_code, 0) + 1
+            received += len(r.content)
+            etag = r.headers.get("ETag", etag)
+
+    await asyncio.gather(*(client_loop(uid, q) for uid, q in views_))
+    return {
+        "polls": len(lat),
+        "writes": writes,
+        "200": codes.get(200, 0),
+        "304": codes.get(304, 0),
+        "kb": received / 1024,
+        "statements": stmts.total - t_before,
+        "main": stmts.main - m_before,
+        "per_request": (stmts.total - t_before) / (len(lat) + writes),
+        "p50_ms": statistics.median(lat) * 1000,
+        "p95_ms": statistics.quantiles(lat, n=20)[-1] * 1000,
+    }
+
+
+def fresh(engine, uid: int, query: str) -> list:
+    params = dict(p.split("=") for p in query.split("&"))
+    with Session(engine) as db:
+        body, _ = crud_workouts.range_with_sets(
+            db, uid, date.fromisoformat(params["start"]), date.fromisoformat(params["end"]), 1000, None,
+        )
+    return body
+
+
+async def verify(client, engine, targets: dict, views_: list, rounds: int, rng: random.Random) -> list[str]:
+    """Sequential: a 304 must match a fresh read; a write must change the ETag of its user's views."""
+    problems = []
+    seen: dict[str, tuple[str, list]] = {}
+    for i in range(rounds):
+        uid, query = views_[i % len(views_)]
+        url = f"/workouts/by_user/{uid}/range_with_sets?{query}"
+        etag, body = seen.get(url, (None, None))
+        r = await client.get(url, headers={"If-None-Match": etag} if etag else {})
+        if r.status_code == 304:
+            if body != fresh(engine, uid, query):
+                problems.append(f"stale 304 for {url}")
+        else:
+            if etag is not None and r.headers["ETag"] == etag:
+                problems.append(f"200 with an unchanged ETag for {url}")
+            seen[url] = (r.headers["ETag"], r.json())
+        if i % 5 == 4:
+            wuid = rng.choice([u for u, _ in views_])
+            before = {u: seen[u][0] for u in seen if f"/by_user/{wuid}/" in u}
+            await client.post("/sets/", json={"workout_id": rng.choice(targets[wuid]), "exercise": "curl", "reps": 8, "weight": 12})
+            for u, tag in before.items():
+                r = await client.get(u, headers={"If-None-Match": tag})
+                if r.status_code == 304:
+                    problems.append(f"304 after a write for {u}")
+                seen[u] = (r.headers["ETag"], r.json())
+    return problems
+
+
+async def run(args, url: str) -> int:
+    app, engine = build_app(url, args.use_async)
+    sync_engine = engine.sync_engine if args.use_async else engine
+    stmts = Statements(sync_engine)
+    check_engine = make_engine(url)
+    rng = random.Random(args.seed)
+    with Session(check_engine) as db:
+        users = db.scalars(select(models.User.id).order_by(models.User.id)).all()
+    vs = views(rng, users, args.weeks, args.clients)
+    with Session(check_engine) as db:
+        W = models.WorkoutSession
+        targets = {uid: db.scalars(select(W.id).where(W.user_id == uid).limit(50)).all() for uid, _ in vs}
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://poll", timeout=60)
+    try:
+        results = {}
+        for name, conditional in (("plain", False), ("if-none-match", True)):
+            results[name] = await poll(client, stmts, targets, vs, args.polls, args.write_every, conditional, rng)
+        problems = await verify(client, check_engine, targets, vs, args.verify, rng)
+    finally:
+        await client.aclose()
+        check_engine.dispose()
+        if args.use_async:
+            await engine.dispose()
+        else:
+            engine.dispose()
+
+    print(f"{'':<14}{'polls':>7}{'200':>7}{'304':>7}{'KiB':>9}{'stmts/req':>12}{'main tbl':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<14}{r['polls']:>7}{r['200']:>7}{r['304']:>7}{r['kb']:>9.0f}{r['per_request']:>12.2f}"
+              f"{r['main']:>10}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}")
+    plain, cond = results["plain"], results["if-none-match"]
+    print(f"conditional polling: {cond['kb'] / plain['kb']:.0%} of the bytes, "
+          f"{cond['main'] / plain['main']:.0%} of the statements on {'/'.join(MAIN_TABLES)} "
+          f"({cond['writes']} writes each run)")
+    for p in problems[:10]:
+        print("  problem:", p)
+    print("OK" if not problems else f"FAIL: {len(problems)} stale read(s)")
+    return 1 if problems else 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--weeks", type=int, default=26)
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--polls", type=int, default=200, help="polls per client")
+    ap.add_argument("--write-every", type=int, default=25, help="one write per this many polls")
+    ap.add_argument("--verify", type=int, default=300, help="rounds of the sequential stale-read check")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--async", dest="use_async", action="store_true", help="use the DB_ASYNC routers")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'poll.db'}"
+        engine = make_engine(url)
+        seed(engine, users=args.users, weeks=args.weeks, start=START)
+        engine.dispose()
+        sys.exit(asyncio.run(run(args, url)))
+
+
+if __name__ == "__main__":
+    main()
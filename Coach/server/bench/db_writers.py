@@ -0,0 +1,197 @@
+# server/bench/db_writers.py
+"""
+Load test: concurrent writers against each engine profile.
+
+Each of --threads workers runs --tx transactions through its own Session:
+insert a workout, insert its sets, commit; every fourth transaction is a
+read-modify-write (load a workout, flip its status, commit) like PATCH
+/workouts/{id}. Reports committed tx/s, p50/p99 commit latency and errors
+(e.g. "database is locked").
+
+Then two writers race on one user's week of rollups (db/rollups.py), as POST
+/sets/ and PATCH/DELETE /sets/{id} do, --tx rounds of: one adds a set to a
+workout (add_sets deltas) while the other edits or deletes a set of another
+workout that week (refresh_weeks recomputes). rollups.check runs after every
+round; exits non-zero on any drift.
+
+Run from Coach/:
+    python -m server.bench.db_writers                      # SQLite: stock vs tuned
+    python -m server.bench.db_writers --url postgresql+psycopg://u:p@host/db
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ..app.db import models, rollups, versions
+from ..app.db.database import make_engine
+from ..app.db.migrations import run_migrations
+
+
+def _worker(SessionLocal, user_id: int, n_tx: int, sets: int, lat: list, errors: list) -> None:
+    last_id = None
+    for i in range(n_tx):
+        t0 = time.perf_counter()
+        db = SessionLocal()
+        try:
+            if i % 4 == 3 and last_id is not None:
+                w = db.get(models.WorkoutSession, last_id)
+                w.status = "done" if w.status != "done" else "planned"
+            else:
+                w = models.WorkoutSession(user_id=user_id, title="load", status="planned")
+                db.add(w)
+                db.flush()
+                db.add_all(models.ExerciseSet(workout_id=w.id, exercise="squat", reps=5, weight=100.0) for _ in range(sets))
+            db.commit()
+            last_id = w.id
+            lat.append(time.perf_counter() - t0)
+        except Exception as e:
+            db.rollback()
+            errors.append(type(e).__name__ + ": " + str(e).splitlines()[0][:80])
+        finally:
+            db.close()
+
+
+def run(engine, threads: int, n_tx: int, sets: int) -> dict:
+    run_migrations(engine)
+    with engine.begin() as conn:
+        user_ids = [
+            conn.execute(models.User.__table__.insert().values(username=f"load-{time.time_ns()}-{i}")).inserted_primary_key[0]
+            for i in range(threads)
+        ]
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    lat: list[float] = []
+    errors: list[str] = []
+    workers = [
+        threading.Thread(target=_worker, args=(SessionLocal, uid, n_tx, sets, lat, errors))
+        for uid in user_ids
+    ]
+    t0 = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat.sort()
+    return {
+        "tx_s": len(lat) / elapsed,
+        "p50_ms": statistics.median(lat) * 1000 if lat else None,
+        "p99_ms": lat[int(len(lat) * 0.99) - 1] * 1000 if lat else None,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else "",
+    }
+
+
+def _rollup_tx(SessionLocal, user_id: int, workout_id: int, i: int, recompute: bool, errors: list) -> None:
+    db = SessionLocal()
+    try:
+        w = db.get(models.WorkoutSession, workout_id)
+        if recompute:
+            # PATCH /sets/{id} and DELETE /sets/{id}: refresh_weeks
+            sets = w.sets
+            if i % 3 == 2 and len(sets) > 1:
+                db.delete(sets[0])
+            elif sets:
+                sets[-1].reps = 1 + i % 12
+            rollups.refresh_weeks(db, user_id, [w.scheduled_for])
+        else:
+            # POST /sets/: add_sets deltas into the same bucket
+            s = models.ExerciseSet(workout_id=workout_id, exercise="squat", reps=5, weight=100.0 + i % 10)
+            db.add(s)
+            db.flush()
+            rollups.add_sets(db, user_id, w.scheduled_for, [s])
+        versions.bump(db, user_id)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        errors.append(type(e).__name__ + ": " + str(e).splitlines()[0][:80])
+    finally:
+        db.close()
+
+
+def rollup_race(engine, rounds: int) -> tuple[list[str], list[str]]:
+    """
+    (rollup drift found by rollups.check, writer errors). Each round runs one
+    add and one recompute at once and is checked before the next: a later
+    recompute would repair what an earlier one lost.
+    """
+    run_migrations(engine)
+    W, S = models.WorkoutSession.__table__, models.ExerciseSet.__table__
+    with engine.begin() as conn:
+        uid = conn.execute(models.User.__table__.insert().values(username=f"rollups-{time.time_ns()}")).inserted_primary_key[0]
+        added, edited = (
+            conn.execute(W.insert().values(user_id=uid, title=t, status="planned", scheduled_for=d)).inserted_primary_key[0]
+            for t, d in (("adds", date(2024, 3, 4)), ("edits", date(2024, 3, 6)))
+        )
+        conn.execute(S.insert(), [{"workout_id": edited, "exercise": "squat", "reps": 5, "weight": 100.0}] * rounds)
+    with engine.begin() as conn:
+        rollups.rebuild(conn, uid)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    errors: list[str] = []
+    for i in range(rounds):
+        workers = [
+            threading.Thread(target=_rollup_tx, args=(SessionLocal, uid, wid, i, recompute, errors))
+            for wid, recompute in ((added, False), (edited, True))
+        ]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        with engine.connect() as conn:
+            drift = rollups.check(conn, uid, limit=5)
+        if drift:
+            return [f"round {i}: {d}" for d in drift], errors
+    return [], errors
+
+
+def _report(name: str, r: dict) -> None:
+    p50 = f"{r['p50_ms']:7.2f}" if r["p50_ms"] is not None else "      -"
+    p99 = f"{r['p99_ms']:7.2f}" if r["p99_ms"] is not None else "      -"
+    print(f"{name:<14} {r['tx_s']:9.0f} tx/s  p50 {p50} ms  p99 {p99} ms  errors {r['errors']}  {r['first_error']}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="benchmark this database with the configured profile (skips the SQLite comparison)")
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--tx", type=int, default=200, help="transactions per thread")
+    ap.add_argument("--sets", type=int, default=6, help="sets inserted per new workout")
+    args = ap.parse_args()
+    print(f"{args.threads} writers x {args.tx} tx, {args.sets} sets per workout")
+
+    problems: list[str] = []
+    if args.url:
+        engine = make_engine(args.url)
+        _report(engine.dialect.name, run(engine, args.threads, args.tx, args.sets))
+        problems += _race(engine, args.tx)
+        engine.dispose()
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            stock = create_engine(f"sqlite:///{Path(tmp) / 'stock.db'}", connect_args={"check_same_thread": False})
+            tuned = make_engine(f"sqlite:///{Path(tmp) / 'tuned.db'}")
+            for name, engine in (("sqlite stock", stock), ("sqlite tuned", tuned)):
+                _report(name, run(engine, args.threads, args.tx, args.sets))
+            problems += _race(tuned, args.tx)
+            stock.dispose()
+            tuned.dispose()
+    for p in problems:
+        print("  problem:", p)
+    print("OK" if not problems else f"FAIL: {len(problems)} problem(s)")
+    sys.exit(1 if problems else 0)
+
+
+def _race(engine, rounds: int) -> list[str]:
+    drift, errors = rollup_race(engine, rounds)
+    print(f"rollup race    {rounds} rounds of add + recompute on one week  errors {len(errors)}  {errors[0] if errors else ''}")
+    return [f"rollups: {d}" for d in drift]
+
+
+if __name__ == "__main__":
+    main()
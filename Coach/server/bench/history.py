@@ -0,0 +1,234 @@
+# server/bench/history.py
+"""
+Benchmark: streaming history export/import against materializing it.
+
+Seeds one user with --weeks of history, and another database with a history
+--scale times shorter, and measures (tracemalloc peak of Python memory, and
+time) for each:
+  export ndjson   GET /history/by_user/{id}/export, body drained as it streams
+  export csv      the same with format=csv
+  import          POST /history/by_user/{id}/import of the NDJSON export into
+                  a new user, sent in 64 KiB pieces
+  materialize     the user's workouts with their sets loaded at once and
+                  serialized as WorkoutWithSets (paging through /with_sets
+                  ends up holding the same), the baseline
+Requests go straight through the ASGI app: httpx's ASGI transport would
+buffer whole bodies.
+
+Then round trips: the NDJSON and CSV exports, imported into fresh users,
+export again to the same workouts and sets (ids aside), and their weekly
+rollups match raw sets. Exits non-zero when a round trip differs or the long
+history's export/import peak exceeds --flat x the short one's.
+
+Run from Coach/:
+    python -m server.bench.history [--weeks 520 --scale 10 --flat 2] [--async]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from ..app.db import models, rollups
+from ..app.db.database import make_engine
+from ..app.schemas.workout import WorkoutWithSets
+from .load import build_app
+from .seed import seed
+
+START = date(2015, 1, 5)
+PIECE = 64 * 1024
+
+
+async def asgi(app, method: str, url: str, pieces: Iterable[bytes] = (),
+               sink: Optional[Callable[[bytes], None]] = None) -> int:
+    """One request through the ASGI app; the response body goes to `sink`, nothing is kept."""
+    path, _, query = url.partition("?")
+    body = iter(pieces)
+    sent_all = False
+    done = asyncio.Event()
+    status = 0
+
+    async def receive():
+        nonlocal sent_all
+        if not sent_all:
+            piece = next(body, None)
+            if piece is not None:
+                return {"type": "http.request", "body": piece, "more_body": True}
+            sent_all = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            if sink is not None:
+                sink(message.get("body", b""))
+            if not message.get("more_body"):
+                done.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    await app(scope, receive, send)
+    return status
+
+
+async def measured(coro) -> tuple[float, float, object]:
+    """(peak MiB above the start, seconds, result)."""
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    result = await coro
+    elapsed = time.perf_counter() - t0
+    return (tracemalloc.get_traced_memory()[1] - base) / 2**20, elapsed, result
+
+
+async def export_to(app, uid: int, fmt: str, out: Path) -> int:
+    with out.open("wb") as f:
+        status = await asgi(app, "GET", f"/history/by_user/{uid}/export?format={fmt}", sink=f.write)
+    if status != 200:
+        raise SystemExit(f"export {fmt} -> {status}")
+    return out.stat().st_size
+
+
+async def import_from(app, uid: int, fmt: str, src: Path) -> dict:
+    reply: list[bytes] = []
+
+    def pieces():
+        with src.open("rb") as f:
+            while piece := f.read(PIECE):
+                yield piece
+
+    status = await asgi(app, "POST", f"/history/by_user/{uid}/import?format={fmt}", pieces(), reply.append)
+    if status != 200:
+        raise SystemExit(f"import {fmt} -> {status}: {b''.join(reply)[:300]!r}")
+    return json.loads(b"".join(reply))
+
+
+async def new_user(app, name: str) -> int:
+    reply: list[bytes] = []
+    body = json.dumps({"username": name}).encode()
+    await asgi(app, "POST", "/users/", [body], reply.append)
+    return json.loads(b"".join(reply))["id"]
+
+
+def materialize(engine, uid: int) -> int:
+    W = models.WorkoutSession
+    with Session(engine) as db:
+        workouts = db.scalars(select(W).options(selectinload(W.sets)).where(W.user_id == uid)).all()
+        adapter = TypeAdapter(list[WorkoutWithSets])
+        return len(adapter.dump_json(adapter.validate_python(workouts, from_attributes=True)))
+
+
+def canonical(line: bytes) -> tuple:
+    w = json.loads(line)
+    sets = tuple((s["exercise"], s["reps"], s["weight"], s["rpe"]) for s in w["sets"])
+    return (w["scheduled_for"], w["title"], w["notes"], w["status"], w["started_at"], sets)
+
+
+def same_history(a: Path, b: Path) -> Optional[str]:
+    with a.open("rb") as fa, b.open("rb") as fb:
+        for n, (la, lb) in enumerate(zip(fa, fb), 1):
+            if canonical(la) != canonical(lb):
+                return f"workout {n} differs"
+        if fa.readline() or fb.readline():
+            return "different number of workouts"
+    return None
+
+
+async def run(url: str, tmp: Path, use_async: bool, label: str) -> dict:
+    app, engine = build_app(url, use_async)
+    check_engine = make_engine(url)
+    out: dict = {"label": label}
+    try:
+        with Session(check_engine) as db:
+            uid = db.scalars(select(models.User.id)).first()
+        nd, cs = tmp / f"{label}.ndjson", tmp / f"{label}.csv"
+        out["export ndjson"] = await measured(export_to(app, uid, "ndjson", nd))
+        out["export csv"] = await measured(export_to(app, uid, "csv", cs))
+        target = await new_user(app, f"import-{label}")
+        out["import"] = await measured(import_from(app, target, "ndjson", nd))
+        out["materialize"] = await measured(asyncio.to_thread(materialize, check_engine, uid))
+
+        # round trips: NDJSON (above) and CSV imports re-export to the same history
+        problems = []
+        csv_user = await new_user(app, f"import-csv-{label}")
+        await import_from(app, csv_user, "csv", cs)
+        for name, user in (("ndjson", target), ("csv", csv_user)):
+            again = tmp / f"{label}-{name}-again.ndjson"
+            await export_to(app, user, "ndjson", again)
+            if (diff := same_history(nd, again)) is not None:
+                problems.append(f"{label} {name} round trip: {diff}")
+            with check_engine.connect() as conn:
+                problems += [f"{label} {name} rollups: {p}" for p in rollups.check(conn, user, limit=5)]
+        out["problems"] = problems
+    finally:
+        check_engine.dispose()
+        if use_async:
+            await engine.dispose()
+        else:
+            engine.dispose()
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--weeks", type=int, default=520)
+    ap.add_argument("--workouts-per-week", type=int, default=4)
+    ap.add_argument("--sets-per-workout", type=int, default=12)
+    ap.add_argument("--scale", type=int, default=10, help="the short history is this many times shorter")
+    ap.add_argument("--flat", type=float, default=2.0, help="max long/short peak memory for export and import")
+    ap.add_argument("--async", dest="use_async", action="store_true", help="use the DB_ASYNC routers")
+    args = ap.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for label, weeks in (("short", max(1, args.weeks // args.scale)), ("long", args.weeks)):
+            url = f"sqlite:///{tmp / f'{label}.db'}"
+            engine = make_engine(url)
+            counts = seed(engine, users=1, weeks=weeks, workouts_per_week=args.workouts_per_week,
+                          sets_per_workout=args.sets_per_workout, start=START)
+            engine.dispose()
+            tracemalloc.start()
+            try:
+                r = asyncio.run(run(url, tmp, args.use_async, label))
+            finally:
+                tracemalloc.stop()
+            r["sets"] = counts["sets"]
+            results.append(r)
+
+    print(f"{'':<16}" + "".join(f"{r['label'] + ' (' + str(r['sets']) + ' sets)':>34}" for r in results))
+    for step in ("export ndjson", "export csv", "import", "materialize"):
+        cells = "".join(f"{f'{r[step][0]:.1f} MiB  {r[step][1]:.2f} s':>34}" for r in results)
+        print(f"{step:<16}{cells}")
+    short, long_ = results
+    problems = short["problems"] + long_["problems"]
+    for step in ("export ndjson", "export csv", "import"):
+        ratio = long_[step][0] / max(short[step][0], 0.01)
+        if ratio > args.flat:
+            problems.append(f"{step}: peak grew {ratio:.1f}x for {args.scale}x the history")
+    print(f"long history: export peak {long_['export ndjson'][0]:.1f} MiB vs "
+          f"{long_['materialize'][0]:.1f} MiB materialized")
+    for p in problems:
+        print("  problem:", p)
+    print("OK" if not problems else f"FAIL: {len(problems)} problem(s)")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
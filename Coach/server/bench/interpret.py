@@ -0,0 +1,79 @@
+# server/bench/interpret.py
+"""
+Micro-benchmark: /ai/plan/interpret cost vs. conversation length.
+
+"cold" scans every message (empty parse cache); "next turn" is the usual case
+where the previous request's prefix is cached and one new message arrives.
+
+Run from Coach/:
+    python -m server.bench.interpret [--repeat 200]
+"""
+import argparse
+import asyncio
+import time
+
+from ..app.routers.ai import ChatRequest, interpret
+from ..app.services import plan_parser
+
+TURNS = [
+    ("user", "can you plan a push day for friday? bench 3x5, ohp and some lateral raises"),
+    ("assistant", "Sure — want incline dumbbell press too, or keep it to three lifts?"),
+    ("user", "add triceps pushdowns and dips, 4 sets of 10. call it Heavy Push"),
+    ("assistant", "Got it. I can put that on 2025-10-17 unless you want another day."),
+]
+
+
+def _conversation(n_messages: int) -> list[dict]:
+    return [
+        {"role": TURNS[i % len(TURNS)][0], "content": TURNS[i % len(TURNS)][1]}
+        for i in range(n_messages)
+    ]
+
+
+def _per_call_us(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def _next_turn_us(contents: list[str], repeat: int) -> float:
+    total = 0.0
+    for _ in range(repeat):
+        plan_parser._conversation_cache.clear()
+        plan_parser.scan_conversation(contents[:-1])
+        t0 = time.perf_counter()
+        plan_parser.scan_conversation(contents)
+        total += time.perf_counter() - t0
+    return total / repeat * 1e6
+
+
+def _cold(fn):
+    def run():
+        plan_parser._conversation_cache.clear()
+        fn()
+    return run
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200, 1000])
+    args = ap.parse_args()
+
+    loop = asyncio.new_event_loop()
+    print(f"{'messages':>9} {'chars':>9} {'cold scan µs':>13} {'next turn µs':>13} {'cold interpret µs':>18}")
+    for n in args.sizes:
+        msgs = _conversation(n)
+        contents = [m["content"] for m in msgs]
+        req = ChatRequest(messages=msgs)
+        cold_us = _per_call_us(_cold(lambda: plan_parser.scan_conversation(contents)), args.repeat)
+        turn_us = _next_turn_us(contents, args.repeat)
+        req_us = _per_call_us(_cold(lambda: loop.run_until_complete(interpret(req))), args.repeat)
+        chars = sum(map(len, contents))
+        print(f"{n:>9} {chars:>9} {cold_us:>13.1f} {turn_us:>13.1f} {req_us:>18.1f}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+# server/bench/load.py
+"""
+End-to-end load test: every API route at fixed concurrency.
+
+Seeds a database (temp SQLite file unless --url) with --users x --weeks of
+synthetic history, builds the API in-process (sync routers, or the aio ones
+with --async) and has --concurrency clients send --requests requests drawn
+from a weighted mix: users, workout week/range_with_sets/with_sets/detail
+reads, workout moves, set CRUD and bulk, 12-week analytics, AI chat / stream / interpret /
+model list, task queue/approve and proposal apply. AI routes run their mock replies (no client
+is started; the model catalog uses a fake provider), so the run is fully
+offline. In-process runs use the in-memory week-view cache as the app does
+(--no-week-cache to measure without it). With --base-url the same mix goes
+over HTTP to a running server instead (start it with AI_MOCK=true on a seeded
+database).
+
+Prints req/s and p50/p95/p99 per scenario and overall, the week-view cache
+hit rate, then checks the weekly
+rollups against raw sets (in-process runs; drift is reported and fails the
+run), and writes the run to
+server/bench/results/load/<time>-<commit>.json; the previous run with the
+same parameters (or --compare FILE) is shown alongside.
+
+Run from Coach/:
+    python -m server.bench.load [--users 50 --weeks 26 --requests 5000 --concurrency 16] [--async]
+    python -m server.bench.load --base-url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from ..app.db import rollups
+from ..app.db.database import get_async_db, get_db, make_async_engine, make_engine
+from ..app.main import include_routers
+from ..app.services.ai_client import shutdown_ai_client
+from ..app.services.model_catalog import FakeCatalogProvider, init_model_catalog
+from ..app.services.week_cache import MemoryStore, get_week_cache, init_week_cache, shutdown_week_cache
+from .seed import seed
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results" / "load"
+START = date(2024, 1, 1)
+PROMPTS = [
+    "push day tomorrow: bench 3x5, incline press 3x8, dips 3x10",
+    "leg day on friday, squat 5x5 and lunges 3 sets of 12",
+    "what should i do for pull day?",
+    "bench felt heavy today, should i deload?",
+]
+
+
+# ── run state shared by the workers ────────────────────────────────────────────
+@dataclass
+class State:
+    rng: random.Random
+    weeks: int
+    user_ids: list[int]
+    workout_ids: list[int]
+    set_ids: list[int]
+    new_sets: list[int] = field(default_factory=list)     # created by this run; safe to delete
+    queued: list[int] = field(default_factory=list)       # task ids waiting for approval
+    serial: int = 0
+
+    def uid(self) -> int:
+        return self.rng.choice(self.user_ids)
+
+    def wid(self) -> int:
+        return self.rng.choice(self.workout_ids)
+
+    def week(self) -> str:
+        monday = START + timedelta(weeks=self.rng.randrange(self.weeks))
+        return f"start={monday.isoformat()}&end={(monday + timedelta(days=6)).isoformat()}"
+
+    def window(self) -> str:
+        """The analytics view: the 12 weeks up to a random week."""
+        end = START + timedelta(weeks=self.rng.randrange(self.weeks), days=6)
+        return f"start={(end - timedelta(weeks=12, days=-1)).isoformat()}&end={end.isoformat()}"
+
+    def next(self) -> int:
+        self.serial += 1
+        return self.serial
+
+
+Request = tuple[str, str, Optional[dict | list]]
+Handler = Callable[[State, httpx.Response], None]
+
+
+def _chat(s: State) -> dict:
+    return {"messages": [{"role": "user", "content": s.rng.choice(PROMPTS)}]}
+
+
+def _new_set(s: State, r: httpx.Response) -> None:
+    s.new_sets.append(r.json()["id"])
+
+
+def _queued(s: State, r: httpx.Response) -> None:
+    s.queued.extend(t["id"] for t in r.json() if t["status"] == "queued")
+
+
+def _approve(s: State) -> Request:
+    if not s.queued:
+        return _queue(s)
+    return "POST", f"/ai/tasks/{s.queued.pop()}/approve", None
+
+
+def _day(s: State) -> str:
+    return (START + timedelta(days=s.rng.randrange(s.weeks * 7))).isoformat()
+
+
+def _queue(s: State) -> Request:
+    day = _day(s)
+    n = s.next()
+    return "POST", "/ai/tasks/queue", [
+        {"user_id": s.uid(), "intent": "add_workout", "payload": {"date": day, "title": "Push"}, "dedupe_key": f"load-{n}-a"},
+        {"user_id": s.uid(), "intent": "upsert_sets", "dedupe_key": f"load-{n}-b",
+         "payload": {"workout_id": 0, "sets": [{"exercise": "bench press", "reps": 5, "count": 3}]}},
+    ]
+
+
+def _pop_new_set(s: State) -> Request:
+    if not s.new_sets:
+        return "GET", f"/sets/{s.rng.choice(s.set_ids)}", None
+    return "DELETE", f"/sets/{s.new_sets.pop()}", None
+
+
+# (name, weight, request builder, optional response hook)
+SCENARIOS: list[tuple[str, int, Callable[[State], Request], Optional[Handler]]] = [
+    ("users.list", 2, lambda s: ("GET", "/users/?limit=50", None), None),
+    ("users.create", 1, lambda s: ("POST", "/users/", {"username": f"load-{time.time_ns()}-{s.next()}"}), None),
+    ("workouts.by_user", 4, lambda s: ("GET", f"/workouts/by_user/{s.uid()}?limit=20", None), None),
+    ("workouts.range", 15, lambda s: ("GET", f"/workouts/by_user/{s.uid()}/range?{s.week()}", None), None),
+    ("workouts.range_with_sets", 15, lambda s: ("GET", f"/workouts/by_user/{s.uid()}/range_with_sets?{s.week()}", None), None),
+    ("workouts.with_sets", 4, lambda s: ("GET", f"/workouts/by_user/{s.uid()}/with_sets?limit=20", None), None),
+    ("workouts.detail", 10, lambda s: ("GET", f"/workouts/{s.wid()}/detail", None), None),
+    ("workouts.move", 2, lambda s: ("PATCH", f"/workouts/{s.wid()}", {"scheduled_for": _day(s)}), None),
+    ("sets.by_workout", 8, lambda s: ("GET", f"/sets/by_workout/{s.wid()}", None), None),
+    ("sets.get", 4, lambda s: ("GET", f"/sets/{s.rng.choice(s.set_ids)}", None), None),
+    ("sets.create", 6, lambda s: ("POST", "/sets/", {"workout_id": s.wid(), "exercise": "squat", "reps": 5, "weight": 100.0}), _new_set),
+    ("sets.patch", 3, lambda s: ("PATCH", f"/sets/{s.rng.choice(s.set_ids)}", {"reps": s.rng.randint(3, 12)}), None),
+    ("sets.delete", 2, _pop_new_set, None),
+    ("sets.bulk", 3, lambda s: ("POST", "/sets/bulk", {"workout_id": s.wid(), "items": [
+        {"exercise": "bench press", "reps": 5, "count": 3}, {"exercise": "dip", "reps": 10, "count": 3}]}), None),
+    ("analytics.summary", 2, lambda s: ("GET", f"/analytics/by_user/{s.uid()}/summary?{s.window()}", None), None),
+    ("analytics.weekly", 2, lambda s: ("GET", f"/analytics/by_user/{s.uid()}/weekly?{s.window()}", None), None),
+    ("ai.chat", 6, lambda s: ("POST", "/ai/chat", _chat(s)), None),
+    ("ai.chat_stream", 2, lambda s: ("POST", "/ai/chat/stream", _chat(s)), None),
+    ("ai.interpret", 6, lambda s: ("POST", "/ai/plan/interpret", _chat(s)), None),
+    ("ai.models", 1, lambda s: ("GET", "/ai/models", None), None),
+    ("ai.tasks_queue", 4, _queue, _queued),
+    ("ai.tasks_approve", 3, _approve, None),
+    ("ai.proposals_apply", 2, lambda s: ("POST", "/ai/proposals/apply", {"user_id": s.uid(), "proposals": [
+        {"intent": "add_workout", "payload": {"date": "2025-06-02", "title": "Push"}},
+        {"intent": "upsert_sets", "payload": {"workout_id": 0, "sets": [{"exercise": "bench press", "reps": 5, "count": 3}]}},
+    ]}), None),
+]
+
+
+# ── driving ────────────────────────────────────────────────────────────────────
+def _pct(sorted_s: list[float], p: float) -> Optional[float]:
+    if not sorted_s:
+        return None
+    return round(sorted_s[min(len(sorted_s) - 1, int(p * len(sorted_s)))] * 1000, 2)
+
+
+def _summary(lat: list[float], errors: int, elapsed: float) -> dict:
+    lat = sorted(lat)
+    return {
+        "requests": len(lat),
+        "errors": errors,
+        "rps": round(len(lat) / elapsed, 1) if elapsed else None,
+        "mean_ms": round(sum(lat) / len(lat) * 1000, 2) if lat else None,
+        "p50_ms": _pct(lat, 0.50),
+        "p95_ms": _pct(lat, 0.95),
+        "p99_ms": _pct(lat, 0.99),
+    }
+
+
+async def discover(client: httpx.AsyncClient, rng: random.Random, weeks: int, max_users: int) -> State:
+    """Ids to aim at, fetched through the API (works in-process and over HTTP)."""
+    users = (await client.get(f"/users/?limit={max_users}")).json()
+    user_ids = [u["id"] for u in users]
+    workout_ids: list[int] = []
+    for uid in user_ids[:20]:
+        workout_ids += [w["id"] for w in (await client.get(f"/workouts/by_user/{uid}?limit=200&fields=id")).json()]
+    set_ids: list[int] = []
+    for wid in rng.sample(workout_ids, min(50, len(workout_ids))):
+        set_ids += [x["id"] for x in (await client.get(f"/sets/by_workout/{wid}")).json()]
+    if not (user_ids and workout_ids and set_ids):
+        raise SystemExit("no seeded data found; seed the database first (python -m server.bench.seed)")
+    return State(rng=rng, weeks=weeks, user_ids=user_ids, workout_ids=workout_ids, set_ids=set_ids)
+
+
+async def drive(client: httpx.AsyncClient, state: State, n_requests: int, concurrency: int) -> dict:
+    names = [s[0] for s in SCENARIOS]
+    plan = iter(state.rng.choices(range(len(SCENARIOS)), weights=[s[1] for s in SCENARIOS], k=n_requests))
+    lat: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    samples: dict[str, str] = {}
+
+    async def worker() -> None:
+        for i in plan:
+            name, _, build, hook = SCENARIOS[i]
+            method, path, body = build(state)
+            t0 = time.perf_counter()
+            r = await client.request(method, path, json=body)
+            await r.aread()
+            lat[name].append(time.perf_counter() - t0)
+            if r.status_code >= 400:
+                errors[name] += 1
+                samples.setdefault(name, f"{method} {path} -> {r.status_code} {r.text[:120]}")
+            elif hook is not None:
+                hook(state, r)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    every = [x for v in lat.values() for x in v]
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "overall": _summary(every, sum(errors.values()), elapsed),
+        "scenarios": {n: _summary(lat[n], errors[n], elapsed) for n in names if lat[n]},
+        "error_samples": samples,
+    }
+
+
+def build_app(url: str, use_async: bool, week_cache: bool = True) -> tuple[FastAPI, object]:
+    """The API as main.py mounts it, on `url`, with no AI client (mock replies)."""
+    shutdown_ai_client()
+    init_model_catalog(FakeCatalogProvider(["models/gemini-1.5-flash", "models/gemini-1.5-pro"]))
+    if week_cache:
+        init_week_cache(store=MemoryStore())
+    else:
+        shutdown_week_cache()
+    app = FastAPI()
+    include_routers(app, use_async)
+    if use_async:
+        engine = make_async_engine(url)
+        factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+        async def _db():
+            async with factory() as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = _db
+    else:
+        engine = make_engine(url)
+        factory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+        def _db():
+            db = factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = _db
+    return app, engine
+
+
+# ── results ────────────────────────────────────────────────────────────────────
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def commit_id() -> str:
+    sha = _git("rev-parse", "--short", "HEAD") or "nogit"
+    return sha + ("-dirty" if _git("status", "--porcelain", "--untracked-files=no") else "")
+
+
+def previous(params: dict) -> Optional[Path]:
+    """Most recent stored run with the same parameters."""
+    for path in sorted(RESULTS_DIR.glob("*.json"), reverse=True):
+        try:
+            if json.loads(path.read_text()).get("params") == params:
+                return path
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def report(result: dict, before: Optional[dict]) -> None:
+    def delta(now, then) -> str:
+        if now is None or not then:
+            return ""
+        return f" ({(now - then) / then * 100:+.0f}%)"
+
+    old = (before or {}).get("scenarios", {})
+    print(f"{'scenario':<26}{'n':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}   vs previous p50 / p99")
+    rows = list(result["scenarios"].items()) + [("OVERALL", result["overall"])]
+    for name, s in rows:
+        then = (before or {}).get("overall", {}) if name == "OVERALL" else old.get(name, {})
+        print(f"{name:<26}{s['requests']:>6}{s['errors']:>5}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}"
+              f"   {delta(s['p50_ms'], then.get('p50_ms'))}{delta(s['p99_ms'], then.get('p99_ms'))}")
+    o = result["overall"]
+    print(f"\n{o['rps']:.0f} req/s over {result['elapsed_s']:.1f}s{delta(o['rps'], (before or {}).get('overall', {}).get('rps'))}")
+    if cache := result.get("week_cache"):
+        views = ", ".join(f"{v} {s['hit_rate']:.0%}" for v, s in cache["views"].items() if s["hit_rate"] is not None)
+        print(f"week cache: {cache['hit_rate'] or 0:.0%} hits ({views}), {cache['size']} entries")
+    for name, sample in result["error_samples"].items():
+        print(f"  error in {name}: {sample}")
+
+
+async def run(args, url: Optional[str]) -> dict:
+    rng = random.Random(args.seed)
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+        engine = None
+        stats = (await client.get("/ai/stats")).json()
+        if not stats.get("mock"):
+            raise SystemExit("the server has a live AI client; restart it with AI_MOCK=true")
+    else:
+        app, engine = build_app(url, args.use_async, not args.no_week_cache)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+                                   base_url="http://load", timeout=60)
+    try:
+        state = await discover(client, rng, args.weeks, args.users)
+        if args.warmup:
+            await drive(client, state, args.warmup, args.concurrency)
+        if (cache := get_week_cache()) is not None:
+            cache.counts.clear()
+        result = await drive(client, state, args.requests, args.concurrency)
+        if cache is not None:
+            result["week_cache"] = cache.stats()
+        return result
+    finally:
+        await client.aclose()
+        shutdown_week_cache()
+        if engine is not None:
+            if args.use_async:
+                await engine.dispose()
+            else:
+                engine.dispose()
+
+
+def rollup_drift(url: str) -> list[str]:
+    """rollups.check over the whole database after the run."""
+    engine = make_engine(url)
+    try:
+        with engine.connect() as conn:
+            return rollups.check(conn, limit=1000)
+    finally:
+        engine.dispose()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="database URL to seed and use (default: temp SQLite file)")
+    ap.add_argument("--base-url", help="drive a running server over HTTP instead of in-process")
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--weeks", type=int, default=26)
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--warmup", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--async", dest="use_async", action="store_true", help="use the DB_ASYNC routers")
+    ap.add_argument("--no-seed", action="store_true", help="--url is already seeded")
+    ap.add_argument("--no-week-cache", action="store_true", help="in-process runs without the week-view cache")
+    ap.add_argument("--compare", type=Path, help="result file to compare with (default: last matching run)")
+    ap.add_argument("--no-save", action="store_true")
+    args = ap.parse_args()
+
+    params = {k: getattr(args, k) for k in ("users", "weeks", "requests", "concurrency", "seed", "use_async")}
+    if not args.base_url and args.no_week_cache:
+        params["week_cache"] = False
+    params["target"] = "http" if args.base_url else ("url" if args.url else "sqlite-temp")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{Path(tmp) / 'load.db'}"
+        if not args.base_url and not args.no_seed:
+            engine = make_engine(url)
+            t0 = time.perf_counter()
+            counts = seed(engine, users=args.users, weeks=args.weeks, start=START)
+            engine.dispose()
+            print(f"seeded {counts} in {time.perf_counter() - t0:.1f}s")
+        result = asyncio.run(run(args, url))
+        drift = None if args.base_url else rollup_drift(url)
+
+    result = {
+        "commit": commit_id(),
+        "at": datetime.now().isoformat(timespec="seconds"),
+        "params": params,
+        "env": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "machine": platform.machine()},
+        **result,
+    }
+    prev = args.compare or previous(params)
+    before = json.loads(prev.read_text()) if prev else None
+    if before:
+        print(f"previous: {prev.name} ({before.get('commit')})")
+    report(result, before)
+    if drift is not None:
+        for p in drift[:10]:
+            print("  rollup drift:", p)
+        print(f"rollups: {'OK' if not drift else f'{len(drift)} problem(s)'}")
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        out = RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json"
+        out.write_text(json.dumps(result, indent=2))
+        print(f"saved {out}")
+    if drift:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# server/bench/query_budgets.py
+"""
+Query-budget / N+1 check for every API route.
+
+Builds the API (sync routers, then the DB_ASYNC ones) on a seeded throwaway
+SQLite database with the budget check from core/query_budget.py in the
+middleware, calls every route once or more, and prints the most statements
+each route ran against its budget. Exits non-zero if a route went over
+budget, repeated a query shape (N+1), has no budget, or was never called.
+
+Run from Coach/:
+    python -m server.bench.query_budgets [-v]
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from ..app.core.metrics import MetricsMiddleware, RequestStats, instrument_engine
+from ..app.core.query_budget import BUDGETS, check_request
+from ..app.db import models
+from ..app.db.database import get_async_db, get_db, make_async_engine, make_engine
+from ..app.routers import ai, ai_tasks, analytics, history, sets, users, workouts
+from ..app.routers.aio import (
+    ai_tasks as aai_tasks, analytics as aanalytics, history as ahistory, sets as asets, users as ausers,
+    workouts as aworkouts,
+)
+from ..app.services.model_catalog import FakeCatalogProvider, init_model_catalog
+from .seed import seed
+
+START = date(2024, 1, 1)
+# routes this offline run can't call, and why
+SKIP: dict[str, str] = {}
+
+
+class Recorder:
+    def __init__(self):
+        self.max_queries: dict[str, int] = defaultdict(int)
+        self.problems: list[str] = []
+
+    def __call__(self, method: str, route: str, stats: RequestStats) -> None:
+        key = f"{method} {route}"
+        self.max_queries[key] = max(self.max_queries[key], stats.queries)
+        self.problems += check_request(key, stats)
+
+
+def build(url: str, use_async: bool, recorder: Recorder) -> tuple[FastAPI, object]:
+    app = FastAPI()
+    mods = ((ausers, aworkouts, asets, aai_tasks, aanalytics, ahistory) if use_async
+            else (users, workouts, sets, ai_tasks, analytics, history))
+    for m in mods + (ai,):
+        app.include_router(m.router)
+    app.add_middleware(MetricsMiddleware, check=recorder)
+    init_model_catalog(FakeCatalogProvider())
+    if use_async:
+        engine = make_async_engine(url)
+        instrument_engine(engine.sync_engine)
+        factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+        async def _db():
+            async with factory() as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = _db
+    else:
+        engine = make_engine(url)
+        instrument_engine(engine)
+        factory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+        def _db():
+            db = factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = _db
+    return app, engine
+
+
+async def exercise(app: FastAPI, uid: int, wid: int) -> None:
+    """One pass over every route, with data shaped like real use."""
+    week = "start=2024-01-01&end=2024-01-07"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://budget") as c:
+        async def call(method: str, path: str, body=None, headers=None, content=None) -> httpx.Response:
+            r = await c.request(method, path, json=body, headers=headers, content=content)
+            if r.status_code >= 400:
+                raise SystemExit(f"{method} {path} -> {r.status_code}: {r.text[:200]}")
+            return r
+
+        await call("GET", "/users/")
+        new_uid = (await call("POST", "/users/", {"username": f"budget-{id(app)}"})).json()["id"]
+        await call("GET", "/workouts/")
+        await call("GET", f"/workouts/by_user/{uid}")
+        await call("GET", f"/workouts/{wid}/detail")
+        await call("GET", f"/workouts/by_user/{uid}/with_sets")
+        etag = (await call("GET", f"/workouts/by_user/{uid}/range?{week}")).headers["ETag"]
+        if (await call("GET", f"/workouts/by_user/{uid}/range?{week}", headers={"If-None-Match": etag})).status_code != 304:
+            raise SystemExit("range: If-None-Match with the current ETag didn't get a 304")
+        await call("GET", f"/workouts/by_user/{uid}/on/2024-01-02")
+        etag = (await call("GET", f"/workouts/by_user/{uid}/range_with_sets?{week}")).headers["ETag"]
+        await call("GET", f"/workouts/by_user/{uid}/range_with_sets?{week}", headers={"If-None-Match": etag})
+        await call("PATCH", f"/workouts/{wid}", {"title": "Renamed"})
+        await call("PATCH", f"/workouts/{wid}/", {"notes": "again"})
+
+        await call("GET", f"/analytics/by_user/{uid}/summary?start=2024-01-01&end=2024-01-28")
+        await call("GET", f"/analytics/by_user/{uid}/weekly?start=2024-01-01&end=2024-01-28&exercise=squat")
+
+        await call("GET", "/sets/")
+        await call("GET", f"/sets/by_workout/{wid}")
+        sid = (await call("POST", "/sets/", {"workout_id": wid, "exercise": "squat", "reps": 5, "weight": 100})).json()["id"]
+        await call("GET", f"/sets/{sid}")
+        await call("PATCH", f"/sets/{sid}", {"reps": 6})
+        await call("DELETE", f"/sets/{sid}")
+        await call("POST", "/sets/bulk", {"workout_id": wid, "items": [
+            {"exercise": "squat", "reps": 5, "count": 5}, {"exercise": "lunge", "reps": 10, "count": 3}]})
+
+        tmp = (await call("POST", "/workouts/", {"user_id": new_uid, "title": "Temp", "scheduled_for": "2024-02-01"})).json()["id"]
+        await call("POST", "/sets/bulk", {"workout_id": tmp, "exercise": "row", "reps": 8, "count": 4})
+        await call("PATCH", f"/workouts/{tmp}", {"scheduled_for": "2024-02-12"})   # moves its rollup week
+        await call("DELETE", f"/workouts/{tmp}")
+
+        tasks = (await call("POST", "/ai/tasks/queue", [
+            {"user_id": new_uid, "intent": "add_workout", "payload": {"date": "2024-02-02", "title": "Push"}, "dedupe_key": "a"},
+            {"user_id": new_uid, "intent": "add_workout", "payload": {"date": "2024-02-03", "title": "Pull"}, "dedupe_key": "b"},
+        ])).json()
+        await call("POST", "/ai/tasks/queue", [
+            {"user_id": new_uid, "intent": "add_workout", "payload": {"date": "2024-02-02", "title": "Push"}, "dedupe_key": "a"}])
+        await call("GET", f"/ai/tasks?user_id={new_uid}")
+        await call("POST", f"/ai/tasks/{tasks[0]['id']}/approve")
+        await call("POST", f"/ai/tasks/{tasks[1]['id']}/reject")
+        await call("POST", "/ai/proposals/apply", {"user_id": new_uid, "proposals": [
+            {"intent": "add_workout", "payload": {"date": "2024-02-05", "title": "Legs"}},
+            {"intent": "upsert_sets", "payload": {"workout_id": 0, "sets": [
+                {"exercise": "squat", "reps": 5, "count": 3}, {"exercise": "lunge", "reps": 8, "count": 3}]}},
+            {"intent": "add_workout", "payload": {"date": "2024-02-07", "title": "Upper"}},
+            {"intent": "upsert_sets", "payload": {"workout_id": 0, "sets": [{"exercise": "bench", "reps": 5, "count": 3}]}},
+        ]})
+        # the payload pattern only checks the date's shape; an impossible one is the caller's mistake
+        r = await c.post("/ai/proposals/apply", json={"user_id": new_uid, "proposals": [
+            {"intent": "add_workout", "payload": {"date": "2025-02-30", "title": "Nope"}}]})
+        if r.status_code != 422:
+            raise SystemExit(f"proposals/apply with date 2025-02-30 -> {r.status_code}, expected 422")
+
+        dump = (await call("GET", f"/history/by_user/{uid}/export?start=2024-01-01&end=2024-01-28")).content
+        await call("GET", f"/history/by_user/{uid}/export?format=csv&start=2024-01-01&end=2024-01-28")
+        await call("POST", f"/history/by_user/{new_uid}/import", content=dump)
+
+        chat = {"messages": [{"role": "user", "content": "push day tomorrow: bench 3x5, dips 3x10"}]}
+        await call("POST", "/ai/chat", chat)
+        await call("POST", "/ai/chat/stream", chat)
+        await call("POST", "/ai/plan/interpret", chat)
+        await call("GET", "/ai/stats")
+        await call("GET", "/ai/models")
+
+
+async def run(url: str, uid: int, wid: int, verbose: bool) -> int:
+    failures = 0
+    for mode in ("sync", "async"):
+        recorder = Recorder()
+        app, engine = build(url, mode == "async", recorder)
+        await exercise(app, uid, wid)
+        if mode == "async":
+            await engine.dispose()
+        else:
+            engine.dispose()
+
+        routes = {f"{m} {r.path}" for r in app.routes if isinstance(r, APIRoute) for m in r.methods}
+        print(mode)
+        for key in sorted(routes):
+            n = recorder.max_queries.get(key)
+            budget = BUDGETS.get(key)
+            if key in SKIP:
+                print(f"  {'skipped':>12}  {'-':>3} / {budget if budget is not None else '-':<3} {key} ({SKIP[key]})")
+                continue
+            flag = "never called" if n is None else ("OVER" if budget is None or n > budget else "ok")
+            if verbose or flag != "ok":
+                print(f"  {flag:>12}  {n if n is not None else '-':>3} / {budget if budget is not None else '-':<3} {key}")
+            failures += flag != "ok"
+        for p in dict.fromkeys(recorder.problems):
+            print("  problem:", p)
+        failures += len(recorder.problems)
+        print(f"  {len(routes)} routes checked")
+    return failures
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-v", "--verbose", action="store_true", help="list every route, not just failures")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'budget.db'}"
+        engine = make_engine(url)
+        seed(engine, users=3, weeks=4, start=START)
+        with engine.connect() as conn:
+            uid = conn.execute(select(models.User.id).order_by(models.User.id)).scalars().first()
+            wid = conn.execute(
+                select(models.WorkoutSession.id).where(models.WorkoutSession.user_id == uid).limit(1)
+            ).scalar()
+        engine.dispose()
+        failures = asyncio.run(run(url, uid, wid, args.verbose))
+    print("FAIL" if failures else "OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# server/bench/query_plans.py
+"""
+Query-plan regression check for the hot read paths.
+
+Seeds a throwaway SQLite database, calls the route functions directly, captures
+every SELECT they issue and runs EXPLAIN QUERY PLAN on it. Exits non-zero if a
+hot query full-scans a table or needs a temp b-tree to sort.
+
+Run from Coach/:
+    python -m server.bench.query_plans [--users 20 --weeks 52] [-v]
+"""
+import argparse
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+from typing import Callable
+
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..app.db.pagination import PageParams, encode_cursor
+from ..app.routers import sets, users, workouts
+from .seed import seed
+
+
+SORT = "TEMP B-TREE"
+
+
+def _page(limit: int = 200, cursor=None, fields=None) -> PageParams:
+    return PageParams(limit=limit, cursor=cursor, fields=fields)
+
+
+def _request(path: str) -> Request:
+    """Enough of a request for the conditional (ETag) routes: a path and no If-None-Match."""
+    return Request({"type": "http", "method": "GET", "scheme": "http", "server": ("plans", 80),
+                    "path": path, "query_string": b"", "headers": []})
+
+
+# (name, call, accepted plan steps). Admin-style listings that walk a whole
+# table by primary key are expected to scan it; a one-day lookup may sort its
+# handful of rows.
+CASES: list[tuple[str, Callable[[Session], object], set[str]]] = [
+    ("workouts.range", lambda db: workouts.list_workouts_in_range(
+        user_id=2, request=_request("/workouts/by_user/2/range"), start=date(2024, 3, 4), end=date(2024, 3, 10), page=_page(), db=db), set()),
+    ("workouts.range:cursor", lambda db: workouts.list_workouts_in_range(
+        user_id=2, request=_request("/workouts/by_user/2/range"), start=date(2024, 1, 1), end=date(2024, 12, 31),
+        page=_page(cursor=encode_cursor(date(2024, 6, 1), 1)), db=db), set()),
+    ("workouts.range_with_sets", lambda db: workouts.list_workouts_in_range_with_sets(
+        user_id=2, request=_request("/workouts/by_user/2/range_with_sets"), start=date(2024, 3, 4), end=date(2024, 3, 10), page=_page(), db=db), set()),
+    ("workouts.on_day", lambda db: workouts.list_workouts_on_day(user_id=2, day=date(2024, 3, 5), db=db), {SORT}),
+    ("workouts.by_user", lambda db: workouts.list_workouts_by_user(
+        user_id=2, response=Response(), page=_page(limit=50), db=db), set()),
+    ("workouts.by_user:cursor", lambda db: workouts.list_workouts_by_user(
+        user_id=2, response=Response(), page=_page(limit=50, cursor=encode_cursor("2024-06-01T00:00:00", 10**9)), db=db), set()),
+    ("workouts.by_user:fields", lambda db: workouts.list_workouts_by_user(
+        user_id=2, response=Response(), page=_page(limit=50, fields="id,title"), db=db), set()),
+    ("workouts.with_sets", lambda db: workouts.list_user_workouts_with_sets(
+        user_id=2, response=Response(), page=_page(limit=50), db=db), set()),
+    ("workouts.detail", lambda db: workouts.get_workout_detail(workout_id=5, db=db).sets, set()),
+    ("sets.by_workout", lambda db: sets.list_sets_by_workout(workout_id=5, db=db), set()),
+    ("sets.list", lambda db: sets.list_sets(response=Response(), page=_page(), db=db), {"exercise_sets"}),
+    ("workouts.list", lambda db: workouts.list_workouts(response=Response(), page=_page(), db=db), {"workout_sessions"}),
+    ("users.list", lambda db: users.list_users(response=Response(), page=_page(), db=db), {"users"}),
+]
+
+
+def _problems(plan: list[str], allowed: set[str]) -> list[str]:
+    bad = []
+    for detail in plan:
+        if detail.startswith("SCAN "):
+            table = detail.split()[1]
+            if table not in allowed:
+                bad.append(detail)
+        elif "USE TEMP B-TREE" in detail and SORT not in allowed:
+            bad.append(detail)
+    return bad
+
+
+def check(engine, verbose: bool = False) -> int:
+    captured: list[tuple[str, object]] = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    failures = 0
+    for name, call, allowed in CASES:
+        captured.clear()
+        with SessionLocal() as db:
+            call(db)
+        statements = list(captured)
+        with engine.connect() as conn:
+            for sql, params in statements:
+                plan = [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)]
+                bad = _problems(plan, allowed)
+                status = "FAIL" if bad else "ok  "
+                if bad:
+                    failures += 1
+                if bad or verbose:
+                    print(f"{status} {name}")
+                    print("     " + " ".join(sql.split())[:200])
+                    for line in plan:
+                        print("       " + line)
+        if not statements:
+            print(f"???  {name}: issued no SELECT")
+    event.remove(engine, "before_cursor_execute", _capture)
+    print(f"{len(CASES)} cases, {failures} degraded quer{'y' if failures == 1 else 'ies'}")
+    return failures
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--weeks", type=int, default=52)
+    ap.add_argument("-v", "--verbose", action="store_true", help="print every plan, not just failures")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'plans.db'}")
+        seed(engine, users=args.users, weeks=args.weeks)
+        failures = check(engine, verbose=args.verbose)
+        engine.dispose()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
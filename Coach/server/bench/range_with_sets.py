@@ -0,0 +1,92 @@
+# server/bench/range_with_sets.py
+"""
+Benchmark: /workouts/by_user/{id}/range_with_sets serialization throughput.
+
+Seeds one user with ~10k sets and times building the full JSON body three ways:
+  joinedload  the original query (join fan-out + ORM de-dup) + WorkoutWithSets
+  selectin    ORM entities via selectinload + WorkoutWithSets
+  columnar    crud_workouts.range_with_sets: two column queries, dicts, json
+Rows = workouts + sets returned. The three bodies are checked to be identical.
+
+Run from Coach/:
+    python -m server.bench.range_with_sets [--weeks 209 --repeat 5]
+"""
+import argparse
+import json
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import joinedload, selectinload, sessionmaker
+
+from ..app.db import crud_workouts, models
+from ..app.schemas.workout import WorkoutWithSets
+from .seed import seed
+
+START, END = date(2024, 1, 1), date(2028, 12, 31)
+ADAPTER = TypeAdapter(list[WorkoutWithSets])
+
+
+def _orm(db, loader, user_id: int, limit: int) -> bytes:
+    W = models.WorkoutSession
+    rows = (
+        db.query(W)
+        .options(loader(W.sets))
+        .filter(W.user_id == user_id, W.scheduled_for >= START, W.scheduled_for <= END)
+        .order_by(W.scheduled_for, W.id)
+        .limit(limit)
+        .all()
+    )
+    # what FastAPI does with a response_model: validate, then dump
+    return ADAPTER.dump_json(ADAPTER.validate_python(rows, from_attributes=True))
+
+
+def joined(db, user_id, limit):
+    return _orm(db, joinedload, user_id, limit)
+
+
+def selectin(db, user_id, limit):
+    return _orm(db, selectinload, user_id, limit)
+
+
+def columnar(db, user_id, limit):
+    body, _ = crud_workouts.range_with_sets(db, user_id, START, END, limit)
+    return json.dumps(body, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--weeks", type=int, default=209, help="4 workouts x 12 sets per week; 209 weeks ~ 10k sets")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'range.db'}")
+        counts = seed(engine, users=1, weeks=args.weeks)
+        print(f"seeded {counts['workouts']} workouts, {counts['sets']} sets")
+        SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+        limit = counts["workouts"]
+        rows = counts["workouts"] + counts["sets"]
+
+        reference = None
+        for name, fn in (("joinedload", joined), ("selectin", selectin), ("columnar", columnar)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                with SessionLocal() as db:
+                    t0 = time.perf_counter()
+                    body = fn(db, 1, limit)
+                    best = min(best, time.perf_counter() - t0)
+            parsed = json.loads(body)
+            if reference is None:
+                reference = parsed
+            elif parsed != reference:
+                raise SystemExit(f"{name}: body differs from joinedload")
+            print(f"{name:<11} {best * 1000:8.1f} ms  {rows / best:12,.0f} rows/s")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
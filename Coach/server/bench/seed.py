@@ -0,0 +1,109 @@
+# server/bench/seed.py
+"""
+Deterministic synthetic training history for benchmarks and plan checks.
+
+    python -m server.bench.seed --db /tmp/coach.db --users 50 --weeks 52
+"""
+import argparse
+import random
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import Engine
+
+from ..app.db import models, rollups
+from ..app.db.migrations import run_migrations
+
+EXERCISES = [
+    "bench press", "overhead press", "incline dumbbell press", "lateral raise",
+    "barbell row", "lat pulldown", "curl", "triceps pushdown", "squat", "deadlift", "dip",
+]
+TITLES = ["Push Day", "Pull Day", "Leg Day", "Upper Day", "Lower Day"]
+
+
+def seed(
+    engine: Engine,
+    *,
+    users: int = 10,
+    weeks: int = 52,
+    workouts_per_week: int = 4,
+    sets_per_workout: int = 12,
+    start: date = date(2024, 1, 1),
+    seed_value: int = 7,
+    batch: int = 5000,
+) -> dict:
+    """Create schema (if needed), insert users -> workouts -> sets, rebuild the weekly rollups. Returns row counts."""
+    run_migrations(engine)
+    rng = random.Random(seed_value)
+    counts = {"users": 0, "workouts": 0, "sets": 0}
+    with engine.begin() as conn:
+        uid0 = conn.execute(insert(models.User.__table__).returning(models.User.__table__.c.id), [
+            {"username": f"bench-{seed_value}-{i}-{rng.random():.8f}", "created_at": datetime(2024, 1, 1)}
+            for i in range(users)
+        ]).scalars().all()
+        counts["users"] = len(uid0)
+
+        wtable = models.WorkoutSession.__table__
+        stable = models.ExerciseSet.__table__
+        for uid in uid0:
+            workouts = []
+            for week in range(weeks):
+                for d in rng.sample(range(7), workouts_per_week):
+                    day = start + timedelta(days=week * 7 + d)
+                    workouts.append({
+                        "user_id": uid,
+                        "title": rng.choice(TITLES),
+                        "notes": None,
+                        "started_at": datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randint(6, 20)),
+                        "scheduled_for": day,
+                        "status": "done" if day < date.today() else "planned",
+                    })
+            wids = conn.execute(insert(wtable).returning(wtable.c.id), workouts).scalars().all()
+            counts["workouts"] += len(wids)
+
+            pending = []
+            for wid in wids:
+                for ex in rng.sample(EXERCISES, max(1, sets_per_workout // 3)):
+                    base = rng.uniform(20, 140)
+                    for _ in range(3):
+                        pending.append({
+                            "workout_id": wid,
+                            "exercise": ex,
+                            "reps": rng.randint(3, 12),
+                            "weight": round(base + rng.uniform(-5, 5), 1),
+                            "rpe": round(rng.uniform(6, 10), 1),
+                        })
+                if len(pending) >= batch:
+                    conn.execute(insert(stable), pending)
+                    counts["sets"] += len(pending)
+                    pending = []
+            if pending:
+                conn.execute(insert(stable), pending)
+                counts["sets"] += len(pending)
+        counts["rollups"] = rollups.rebuild(conn)
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("ANALYZE")
+    return counts
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default="/tmp/coach-bench.db", help="SQLite path or full SQLAlchemy URL")
+    ap.add_argument("--users", type=int, default=10)
+    ap.add_argument("--weeks", type=int, default=52)
+    ap.add_argument("--workouts-per-week", type=int, default=4)
+    ap.add_argument("--sets-per-workout", type=int, default=12)
+    args = ap.parse_args()
+    url = args.db if "://" in args.db else f"sqlite:///{args.db}"
+    counts = seed(
+        create_engine(url),
+        users=args.users,
+        weeks=args.weeks,
+        workouts_per_week=args.workouts_per_week,
+        sets_per_workout=args.sets_per_workout,
+    )
+    print(counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# server/bench/startup.py
+"""
+Cold-start cost of the API process.
+
+Each run is a fresh interpreter (so nothing is already imported or cached)
+pointed at an empty temp SQLite database, and times:
+  import     `import server.app.main` (module-level app included)
+  startup    lifespan startup: migrations on the empty database, AI client
+  first      first request through the app (GET /workouts/by_user/1/range)
+  total      interpreter start -> first response
+Prints the median of --runs runs; --imports N adds the N slowest modules by
+cumulative import time from `python -X importtime`.
+
+Run from Coach/:
+    python -m server.bench.startup [--runs 7] [--imports 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+COACH_DIR = Path(__file__).resolve().parents[2]
+
+PROBE = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import server.app.main as main
+t1 = time.perf_counter()
+import httpx
+
+async def run():
+    app = main.app
+    async with app.router.lifespan_context(app):
+        t2 = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as c:
+            r = await c.get("/workouts/by_user/1/range?start=2024-01-01&end=2024-01-07")
+            r.raise_for_status()
+        t3 = time.perf_counter()
+    return t2, t3
+
+t2, t3 = asyncio.run(run())
+print(json.dumps({"import": t1 - t0, "startup": t2 - t1, "first": t3 - t2}))
+"""
+
+
+def _env(tmp: Path, i: int) -> dict:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=f"sqlite:///{tmp / f'startup-{i}.db'}",
+        AI_MOCK="true",
+        AI_EXECUTOR_ENABLED="false",
+    )
+    return env
+
+
+def one_run(tmp: Path, i: int) -> dict:
+    t0 = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=COACH_DIR, env=_env(tmp, i), capture_output=True, text=True
+    )
+    total = time.perf_counter() - t0
+    if out.returncode:
+        raise SystemExit(out.stderr[-2000:])
+    row = json.loads(out.stdout.strip().splitlines()[-1])
+    row["total"] = total
+    return row
+
+
+def slowest_imports(tmp: Path, n: int) -> list[tuple[float, str]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server.app.main"],
+        cwd=COACH_DIR, env=_env(tmp, -1), capture_output=True, text=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]) / 1e6, parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=7)
+    ap.add_argument("--imports", type=int, default=0, help="also list the N slowest imports")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        one_run(tmp, 0)  # warm the OS file cache and .pyc files; not counted
+        runs = [one_run(tmp, i) for i in range(1, args.runs + 1)]
+        print(f"median of {len(runs)} cold starts (ms)")
+        for key in ("import", "startup", "first", "total"):
+            vals = [r[key] * 1000 for r in runs]
+            print(f"  {key:<8} {statistics.median(vals):8.1f}   (min {min(vals):.1f}, max {max(vals):.1f})")
+        if args.imports:
+            print("slowest imports (cumulative ms)")
+            for seconds, name in slowest_imports(tmp, args.imports):
+                print(f"  {seconds * 1000:8.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# server/bench/task_executor.py
+"""
+Benchmark: approved-task executor throughput.
+
+Queues --users x --pairs (add_workout + upsert_sets with the workout_id 0
+placeholder) approved tasks, then drains them with TaskExecutor.run() at each
+concurrency level and reports tasks/s. Every --fail-every'th upsert points at
+a missing workout to exercise the batch -> one-by-one fallback.
+
+Then checks the standalone executor (python -m server.app.services.task_executor)
+invalidates a week cache shared through WEEK_CACHE_SQLITE_PATH: /on/{day}
+reads cached by the API must show the workout it adds and the one it moves
+once it has run. Exits non-zero if they don't.
+
+Run from Coach/:
+    python -m server.bench.task_executor [--users 20 --pairs 50 --concurrency 1,4,8]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+import httpx
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from ..app.db import models
+from ..app.db.database import make_engine
+from ..app.db.migrations import run_migrations
+from ..app.services.task_executor import TaskExecutor
+from ..app.services.week_cache import SQLiteStore, init_week_cache, shutdown_week_cache
+from .load import build_app
+
+
+def queue(engine, users: int, pairs: int, fail_every: int) -> int:
+    rows = []
+    with engine.begin() as conn:
+        uids = conn.execute(
+            insert(models.User.__table__).returning(models.User.__table__.c.id),
+            [{"username": f"exec-{time.time_ns()}-{i}"} for i in range(users)],
+        ).scalars().all()
+        for uid in uids:
+            for i in range(pairs):
+                day = f"2025-{1 + i // 28:02d}-{1 + i % 28:02d}"
+                bad = fail_every and (i + 1) % fail_every == 0
+                rows.append({"user_id": uid, "intent": "add_workout", "payload": {"date": day, "title": "Push"}})
+                rows.append({"user_id": uid, "intent": "upsert_sets", "payload": {
+                    "workout_id": 10**9 if bad else 0, "mode": "append",
+                    "sets": [{"exercise": "bench press", "reps": 5, "count": 3}, {"exercise": "dip", "reps": 10, "count": 3}],
+                }})
+        for r in rows:
+            r.update(summary="", confidence=0.9, requires_confirmation=True,
+                     requires_super_confirmation=False, status="approved")
+        conn.execute(insert(models.AITask.__table__), rows)
+    return len(rows)
+
+
+async def drain(ex: TaskExecutor, total: int) -> float:
+    stop = asyncio.Event()
+    t0 = time.perf_counter()
+    worker = asyncio.ensure_future(ex.run(stop))
+    while ex.stats.executed + ex.stats.failed < total:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await worker
+    return elapsed
+
+
+async def on_days(app, uid: int, days: list[date]) -> dict:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://exec") as c:
+        out = {}
+        for d in days:
+            r = await c.get(f"/workouts/by_user/{uid}/on/{d}")
+            r.raise_for_status()
+            out[d] = sorted(w["title"] for w in r.json())
+        return out
+
+
+def separate_process(tmp: Path) -> list[str]:
+    """The API caches /on/{day}; the executor runs in its own process; the API must see its writes."""
+    url = f"sqlite:///{tmp / 'separate.db'}"
+    cache_path = tmp / "week_cache.db"
+    added, moved_from, moved_to = date(2025, 3, 3), date(2025, 3, 4), date(2025, 3, 5)
+    engine = make_engine(url)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        uid = conn.execute(insert(models.User.__table__).returning(models.User.__table__.c.id),
+                           {"username": "exec-separate"}).scalar()
+        wid = conn.execute(insert(models.WorkoutSession.__table__).returning(models.WorkoutSession.__table__.c.id),
+                           {"user_id": uid, "title": "Legs", "scheduled_for": moved_from}).scalar()
+        conn.execute(insert(models.AITask.__table__), [
+            {"user_id": uid, "intent": intent, "payload": payload, "summary": "", "confidence": 0.9,
+             "requires_confirmation": True, "requires_super_confirmation": False, "status": "approved"}
+            for intent, payload in (
+                ("add_workout", {"date": added.isoformat(), "title": "Push"}),
+                ("move_workout", {"workout_id": wid, "new_date": moved_to.isoformat()}),
+            )
+        ])
+    engine.dispose()
+
+    days = [added, moved_from, moved_to]
+    app, api_engine = build_app(url, False)
+    init_week_cache(store=SQLiteStore(str(cache_path)))
+    try:
+        asyncio.run(on_days(app, uid, days))     # now cached
+        env = {**os.environ, "DATABASE_URL": url, "WEEK_CACHE_SQLITE_PATH": str(cache_path)}
+        subprocess.run([sys.executable, "-m", "server.app.services.task_executor", "--once"],
+                       env=env, check=True, capture_output=True)
+        seen = asyncio.run(on_days(app, uid, days))
+    finally:
+        shutdown_week_cache()
+        api_engine.dispose()
+    want = {added: ["Push"], moved_from: [], moved_to: ["Legs"]}
+    return [f"on/{d} shows {seen[d]} after the executor ran, expected {want[d]}" for d in days if seen[d] != want[d]]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--pairs", type=int, default=50)
+    ap.add_argument("--batch-size", type=int, default=50)
+    ap.add_argument("--fail-every", type=int, default=0)
+    ap.add_argument("--concurrency", default="1,4,8")
+    args = ap.parse_args()
+
+    for c in (int(x) for x in args.concurrency.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = make_engine(f"sqlite:///{Path(tmp) / 'exec.db'}")
+            run_migrations(engine)
+            total = queue(engine, args.users, args.pairs, args.fail_every)
+            ex = TaskExecutor(sessionmaker(bind=engine, autoflush=False), concurrency=c,
+                              batch_size=args.batch_size, poll_s=0.05)
+            elapsed = asyncio.run(drain(ex, total))
+            with engine.connect() as conn:
+                sets = conn.execute(select(func.count()).select_from(models.ExerciseSet)).scalar()
+            s = ex.stats.snapshot()
+            print(f"concurrency {c}: {total} tasks in {elapsed:.2f}s = {total / elapsed:,.0f} tasks/s "
+                  f"(executed {s['executed']}, failed {s['failed']}, fallbacks {s['fallbacks']}, retries {s['retries']}, sets {sets})")
+            engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        problems = separate_process(Path(tmp))
+    for p in problems:
+        print("  problem:", p)
+    print("separate executor process and shared week cache:", "OK" if not problems else "FAIL")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# server/bench/week_cache.py
+"""
+Stress test: the week-view cache never serves a read older than a finished write.
+
+Seeds --users x --weeks of history and picks --hot users x --hot-weeks weeks
+as the working set. --writers clients each own a disjoint share of the hot
+workouts and keep changing them through every write path that must
+invalidate: POST/PATCH/DELETE /sets, POST /sets/bulk, PATCH /workouts (moves
+between hot days and title edits) and /ai/proposals/apply (upsert_sets and
+move_workout). After each write the writer records its workout's committed
+state (date, title, set ids and reps), read straight from the database --
+only that writer ever changes that workout, so this is the full history.
+Meanwhile --readers clients hammer /range, /range_with_sets and /on/{day} for
+the hot weeks.
+
+Every request is stamped from one global event counter: readers before
+sending, writers after their write returned. Once everything stops, each read
+is checked per workout: it must show a state no older than the last one whose
+write finished before the read started (later or in-flight states are fine).
+Anything else is a stale read; the run exits 1.
+
+    --store memory|sqlite      the cache store under test (default: memory)
+    --break-invalidation       negative control: writes stop invalidating, so
+                               the check should FAIL
+
+Run from Coach/:
+    python -m server.bench.week_cache [--writers 4 --readers 12 --ops 150 --reads 400] [--async] [--store sqlite]
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import tempfile
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..app.db import models
+from ..app.db.database import make_engine
+from ..app.services.week_cache import MemoryStore, SQLiteStore, get_week_cache, init_week_cache
+from .load import build_app
+from .seed import seed
+
+START = date(2024, 1, 1)
+W, S = models.WorkoutSession, models.ExerciseSet
+
+
+@dataclass(frozen=True)
+class State:
+    day: date
+    title: str
+    sets: frozenset             # (set id, reps)
+
+
+@dataclass
+class History:
+    user_id: int
+    ticks: list = field(default_factory=list)     # tick at which states[i] was known committed
+    states: list = field(default_factory=list)
+
+    def allowed(self, tick: int) -> list[State]:
+        """States a read started at `tick` may show: the last finished before it, and anything after."""
+        i = bisect_left(self.ticks, tick)
+        return self.states[max(0, i - 1):]
+
+
+@dataclass
+class Read:
+    tick: int
+    view: str
+    user_id: int
+    first: date
+    last: date
+    seen: dict                  # workout id -> (day, title, sets or None)
+
+
+def load_state(engine, workout_id: int) -> State:
+    with Session(engine) as db:
+        w = db.execute(select(W.scheduled_for, W.title).where(W.id == workout_id)).one()
+        sets = db.execute(select(S.id, S.reps).where(S.workout_id == workout_id)).all()
+    return State(w.scheduled_for, w.title, frozenset((i, r) for i, r in sets))
+
+
+def project(state: State, first: date, last: date, with_sets: bool):
+    if not first <= state.day <= last:
+        return None
+    return (state.day, state.title, state.sets if with_sets else None)
+
+
+async def writer(client, engine, tick, mine: list[int], hist: dict, days: list[date], ops: int,
+                 rng: random.Random, counts: dict) -> None:
+    my_sets: dict[int, list[int]] = {wid: [i for i, _ in hist[wid].states[-1].sets] for wid in mine}
+    for n in range(ops):
+        wid = rng.choice(mine)
+        uid = hist[wid].user_id
+        op = rng.choice(("set.create", "set.create", "set.patch", "set.delete", "set.bulk",
+                         "workout.move", "workout.title", "proposal.sets", "proposal.move"))
+        if op in ("set.patch", "set.delete") and not my_sets[wid]:
+            op = "set.create"
+        if op == "set.create":
+            r = await client.post("/sets/", json={"workout_id": wid, "exercise": "squat", "reps": rng.randint(1, 12), "weight": 100.0})
+        elif op == "set.patch":
+            r = await client.patch(f"/sets/{rng.choice(my_sets[wid])}", json={"reps": rng.randint(1, 12)})
+        elif op == "set.delete":
+            r = await client.delete(f"/sets/{my_sets[wid].pop(rng.randrange(len(my_sets[wid])))}")
+        elif op == "set.bulk":
+            r = await client.post("/sets/bulk", json={"workout_id": wid, "items": [{"exercise": "row", "reps": 8, "count": 2}]})
+        elif op == "workout.move":
+            r = await client.patch(f"/workouts/{wid}", json={"scheduled_for": rng.choice(days).isoformat()})
+        elif op == "workout.title":
+            r = await client.patch(f"/workouts/{wid}", json={"title": f"w{wid}-{n}"})
+        elif op == "proposal.sets":
+            r = await client.post("/ai/proposals/apply", json={"user_id": uid, "proposals": [
+                {"intent": "upsert_sets", "payload": {"workout_id": wid, "sets": [{"exercise": "dip", "reps": 10, "count": 2}]}}]})
+        else:
+            r = await client.post("/ai/proposals/apply", json={"user_id": uid, "proposals": [
+                {"intent": "move_workout", "payload": {"workout_id": wid, "new_date": rng.choice(days).isoformat()}}]})
+        if r.status_code >= 400:
+            raise RuntimeError(f"{op} on workout {wid}: {r.status_code} {r.text[:200]}")
+        counts[op] += 1
+        state = await asyncio.to_thread(load_state, engine, wid)
+        my_sets[wid] = [i for i, _ in state.sets]
+        h = hist[wid]
+        h.ticks.append(next(tick))
+        h.states.append(state)
+
+
+async def reader(client, tick, windows: list, reads: int, rng: random.Random, out: list) -> None:
+    for _ in range(reads):
+        uid, monday = rng.choice(windows)
+        view = rng.choice(("range", "range_with_sets", "on_day"))
+        if view == "on_day":
+            first = last = monday + timedelta(days=rng.randrange(7))
+            url = f"/workouts/by_user/{uid}/on/{first}"
+        else:
+            first, last = monday, monday + timedelta(days=6)
+            url = f"/workouts/by_user/{uid}/{view}?start={first}&end={last}&limit=1000"
+        t = next(tick)
+        r = await client.get(url)
+        r.raise_for_status()
+        seen = {
+            w["id"]: (date.fromisoformat(w["scheduled_for"]), w["title"],
+                      frozenset((s["id"], s["reps"]) for s in w["sets"]) if view == "range_with_sets" else None)
+            for w in r.json()
+        }
+        out.append(Read(t, view, uid, first, last, seen))
+
+
+def _show(p) -> str:
+    return f"{p[0]} {p[1]!r}" if p else "absent"
+
+
+def verify(reads: list[Read], hist: dict, by_user: dict) -> list[str]:
+    problems = []
+    for rd in reads:
+        with_sets = rd.view == "range_with_sets"
+        for wid in by_user[rd.user_id]:
+            got = rd.seen.get(wid)
+            ok = {project(s, rd.first, rd.last, with_sets) for s in hist[wid].allowed(rd.tick)}
+            if got not in ok:
+                want = sorted({_show(p) for p in ok})
+                stale_sets = got is not None and got[:2] in {p[:2] for p in ok if p}
+                problems.append(
+                    f"{rd.view} user {rd.user_id} {rd.first}..{rd.last} at tick {rd.tick}: workout {wid} shown as "
+                    f"{_show(got)}{' with old sets' if stale_sets else ''}, expected {' | '.join(want[:4])}"
+                    f"{' | ...' if len(want) > 4 else ''}"
+                )
+        for wid in rd.seen.keys() - set(by_user[rd.user_id]):
+            problems.append(f"{rd.view} user {rd.user_id}: unexpected workout {wid}")
+    return problems
+
+
+async def run(args, url: str, tmp: Path) -> int:
+    app, engine = build_app(url, args.use_async)
+    if args.store == "sqlite":
+        init_week_cache(store=SQLiteStore(str(tmp / "week_cache.db")))
+    else:
+        init_week_cache(store=MemoryStore())
+    cache = get_week_cache()
+    if args.break_invalidation:
+        cache.invalidate = lambda *a, **k: 0
+    check_engine = make_engine(url)
+    rng = random.Random(args.seed)
+
+    hot_weeks = [START + timedelta(weeks=w) for w in range(args.hot_weeks)]
+    days = [wk + timedelta(days=d) for wk in hot_weeks for d in range(7)]
+    with Session(check_engine) as db:
+        users = db.scalars(select(models.User.id).order_by(models.User.id)).all()[: args.hot]
+        rows = db.execute(
+            select(W.id, W.user_id).where(W.user_id.in_(users), W.scheduled_for.between(days[0], days[-1])).order_by(W.id)
+        ).all()
+    hist = {wid: History(uid) for wid, uid in rows}
+    by_user: dict[int, list[int]] = defaultdict(list)
+    for wid, uid in rows:
+        by_user[uid].append(wid)
+    tick = itertools.count()
+    for wid in hist:
+        hist[wid].ticks.append(next(tick))
+        hist[wid].states.append(load_state(check_engine, wid))
+    shares = [list(hist)[i::args.writers] for i in range(args.writers)]
+    windows = [(u, wk) for u in users for wk in hot_weeks]
+    counts: dict = defaultdict(int)
+    reads: list[Read] = []
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stress", timeout=60)
+    t0 = time.perf_counter()
+    try:
+        await asyncio.gather(
+            *(writer(client, check_engine, tick, share, hist, days, args.ops, random.Random(rng.random()), counts)
+              for share in shares if share),
+            *(reader(client, tick, windows, args.reads, random.Random(rng.random()), reads) for _ in range(args.readers)),
+        )
+    finally:
+        await client.aclose()
+        if args.use_async:
+            await engine.dispose()
+        else:
+            engine.dispose()
+    elapsed = time.perf_counter() - t0
+    problems = verify(reads, hist, by_user)
+    check_engine.dispose()
+
+    stats = cache.stats()
+    writes = sum(counts.values())
+    print(f"{len(hist)} hot workouts of {len(users)} users over {args.hot_weeks} weeks; "
+          f"{writes} writes, {len(reads)} reads in {elapsed:.1f}s ({'async' if args.use_async else 'sync'}, {stats['store']})")
+    print("  writes: " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())))
+    for view, s in stats["views"].items():
+        print(f"  {view:<16} hits {s['hits']:>5}  misses {s['misses']:>5}  hit rate {s['hit_rate'] or 0:>5.0%}"
+              f"  invalidated {s['invalidated']:>5}  refused {s['refused']:>3}")
+    print(f"  overall hit rate {stats['hit_rate'] or 0:.0%}")
+    for p in problems[:10]:
+        print("  stale:", p)
+    print("OK" if not problems else f"FAIL: {len(problems)} stale read(s)")
+    return 1 if problems else 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=10)
+    ap.add_argument("--weeks", type=int, default=12)
+    ap.add_argument("--hot", type=int, default=2, help="users in the working set")
+    ap.add_argument("--hot-weeks", type=int, default=2, help="weeks in the working set (from the first)")
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=12)
+    ap.add_argument("--ops", type=int, default=150, help="writes per writer")
+    ap.add_argument("--reads", type=int, default=400, help="reads per reader")
+    ap.add_argument("--store", choices=("memory", "sqlite"), default="memory")
+    ap.add_argument("--break-invalidation", action="store_true", help="negative control; should FAIL")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--async", dest="use_async", action="store_true", help="use the DB_ASYNC routers")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'stress.db'}"
+        engine = make_engine(url)
+        seed(engine, users=args.users, weeks=args.weeks, start=START)
+        engine.dispose()
+        sys.exit(asyncio.run(run(args, url, Path(tmp))))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 // src/lib/api.js
 const BASE_URL = "http://127.0.0.1:8000";
 
-export async function fetchJSON(path, { method = "GET", body } = {}) {
+async function request(path, { method = "GET", body } = {}) {
   const res = await fetch(`${BASE_URL}${path}`, {
     method,
     headers: { "Content-Type": "application/json" },
@@ -18,7 +18,25 @@ export async function fetchJSON(path, { method = "GET", body } = {}) {
     } catch {}
     throw new Error(message);
   }
-  return await res.json();
+  return res;
+}
+
+export async function fetchJSON(path, options) {
+  return await (await request(path, options)).json();
+}
+
+// list endpoints send one page (200 rows unless ?limit=) and the next page's
+// cursor in X-Next-Cursor; follow it to the end for the whole list
+export async function fetchAllPages(path) {
+  const sep = path.includes("?") ? "&" : "?";
+  const rows = [];
+  let cursor = null;
+  do {
+    const res = await request(cursor ? `${path}${sep}cursor=${encodeURIComponent(cursor)}` : path);
+    rows.push(...(await res.json()));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return rows;
 }
 
 export function ping() {
@@ -26,12 +44,12 @@ export function ping() {
 }
 
 export function listWorkoutsByUser(userId) {
-  return fetchJSON(`/workouts/by_user/${userId}/with_sets`);
+  return fetchAllPages(`/workouts/by_user/${userId}/with_sets`);
 }
 
 export function listWorkoutsInRange(userId, start, end) {
   const params = new URLSearchParams({ start, end }).toString();
-  return fetchJSON(`/workouts/by_user/${userId}/range?${params}`);
+  return fetchAllPages(`/workouts/by_user/${userId}/range?${params}`);
 }
 
 export function listWorkoutsOnDay(userId, day) {
@@ -78,7 +96,7 @@ export function deleteSet(setId) {
 
 export function listWorkoutsInRangeWithSets(userId, start, end) {
   const params = new URLSearchParams({ start, end }).toString();
-  return fetchJSON(`/workouts/by_user/${userId}/range_with_sets?${params}`);
+  return fetchAllPages(`/workouts/by_user/${userId}/range_with_sets?${params}`);
 }
 
 export function createSetsBulk({ workout_id, exercise, reps, count, weight = null }) {